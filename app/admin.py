@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Patient, Appointment, Tooth, ToothCondition, Treatment, UserProfile, TreatmentHistory, Payment, PaymentItem
+from .models import Patient, Appointment, Tooth, ToothCondition, Treatment, UserProfile, TreatmentHistory, Payment, PaymentItem, PatientBalance, SeedVersion
 
 # Register your models here.
 @admin.register(UserProfile)
@@ -58,3 +58,14 @@ class PaymentItemAdmin(admin.ModelAdmin):
     list_display = ('payment', 'description', 'amount', 'treatment')
     list_filter = ('payment__payment_date',)
     search_fields = ('description', 'payment__patient__name')
+
+@admin.register(PatientBalance)
+class PatientBalanceAdmin(admin.ModelAdmin):
+    list_display = ('patient', 'total_billed', 'total_paid', 'balance_due', 'payment_count', 'updated_at')
+    search_fields = ('patient__name',)
+    readonly_fields = ('patient', 'total_billed', 'total_paid', 'payment_count', 'updated_at')
+
+@admin.register(SeedVersion)
+class SeedVersionAdmin(admin.ModelAdmin):
+    list_display = ('name', 'version', 'applied_at')
+    readonly_fields = ('name', 'version', 'applied_at')
@@ -0,0 +1,306 @@
+"""
+Appointment calendar data.
+
+A calendar range of any length is read with one query (patients and
+dentists joined in) and then grouped by day, and by dentist for the column
+layout, in Python. Weeks start on Monday.
+
+The JSON feed (get_feed) comes with an ETag computed by a single aggregate
+query, so polling clients can be answered 304 Not Modified without the rows
+being read.
+
+The appointment list is read one keyset page at a time; pages are cached
+per filter combination and cursor, as the values the list shows.
+"""
+import calendar
+import hashlib
+from collections import namedtuple
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count, Max
+from .caching import bump_version, cache_get, get_version, versioned_key
+from .models import Appointment, Patient
+from .pagination import KeysetPage, keyset_paginate
+
+CALENDAR_VIEWS = ('week', 'month', 'dentists')
+
+
+def week_start_for(day):
+    """Return the Monday of the week containing day."""
+    return day - timedelta(days=day.weekday())
+
+
+def get_range(view, anchor):
+    """
+    Return (first_day, last_day) shown by a calendar view around anchor.
+
+    Month views are padded to whole weeks so the grid has no gaps.
+    """
+    if view == 'month':
+        weeks = calendar.Calendar().monthdatescalendar(anchor.year, anchor.month)
+        return weeks[0][0], weeks[-1][-1]
+    start = week_start_for(anchor)
+    return start, start + timedelta(days=6)
+
+
+def step_anchor(view, anchor, direction):
+    """Move anchor one calendar page forwards (1) or backwards (-1)."""
+    if view == 'month':
+        month = anchor.month - 1 + direction
+        year = anchor.year + month // 12
+        return anchor.replace(year=year, month=month % 12 + 1, day=1)
+    return anchor + timedelta(days=7 * direction)
+
+
+def get_range_appointments(start, end, dentist_ids=None):
+    """Fetch every appointment between start and end with one query."""
+    appointments = Appointment.objects.filter(
+        date__range=[start, end]
+    ).select_related('patient', 'dentist').order_by('date', 'start_time', 'id')
+    if dentist_ids:
+        appointments = appointments.filter(dentist_id__in=dentist_ids)
+    return list(appointments)
+
+
+def group_by_day(appointments, start, end):
+    """Return a dict mapping every day from start to end to its appointments."""
+    days = {}
+    day = start
+    while day <= end:
+        days[day] = []
+        day += timedelta(days=1)
+    for appointment in appointments:
+        days[appointment.date].append(appointment)
+    return days
+
+
+def split_weeks(days):
+    """Split an ordered {day: appointments} dict into a list of 7-day dicts."""
+    items = list(days.items())
+    return [dict(items[i:i + 7]) for i in range(0, len(items), 7)]
+
+
+def get_calendar_dentists(appointments):
+    """
+    Return the dentists to show as columns: every user with the dentist role
+    plus anyone else with an appointment in range (one query).
+    """
+    dentists = {dentist.pk: dentist for dentist in User.objects.filter(profile__role='dentist')}
+    for appointment in appointments:
+        dentists.setdefault(appointment.dentist_id, appointment.dentist)
+    return sorted(dentists.values(), key=lambda d: (d.get_full_name() or d.username).lower())
+
+
+def group_by_dentist(days, dentists):
+    """
+    Turn {day: appointments} into rows for the per-dentist column layout.
+
+    Returns a list of (day, [appointments for each dentist, in the order of
+    dentists]) tuples.
+    """
+    rows = []
+    for day, appointments in days.items():
+        columns = {dentist.pk: [] for dentist in dentists}
+        for appointment in appointments:
+            columns[appointment.dentist_id].append(appointment)
+        rows.append((day, [columns[dentist.pk] for dentist in dentists]))
+    return rows
+
+
+# Bumped when a user's name changes, since the feed shows dentist names
+DENTIST_NAME_SCOPE = 'dentist-names'
+
+# Columns of each appointment tuple in the JSON calendar feed
+FEED_FIELDS = ('id', 'date', 'start', 'end', 'status', 'dentist_id', 'patient_id', 'patient_name')
+
+
+def _feed_queryset(start, end, dentist_ids=None):
+    appointments = Appointment.objects.filter(date__range=[start, end])
+    if dentist_ids:
+        appointments = appointments.filter(dentist_id__in=dentist_ids)
+    return appointments
+
+
+def invalidate_dentist_names():
+    """Change the feed ETags after a user's name changes."""
+    bump_version(DENTIST_NAME_SCOPE)
+
+
+def get_feed_etag(start, end, dentist_ids=None):
+    """
+    Return a strong ETag for the feed of a date range, from one aggregate query.
+
+    It changes whenever an appointment in range (or its patient) is saved,
+    since updated_at moves forward, and whenever one is added or removed,
+    since the row count changes. Users have no updated_at, so renaming a
+    dentist is tracked by the DENTIST_NAME_SCOPE version (see app.signals).
+    """
+    stats = _feed_queryset(start, end, dentist_ids).aggregate(
+        count=Count('id'),
+        last_updated=Max('updated_at'),
+        patient_updated=Max('patient__updated_at'),
+    )
+    key = '|'.join(str(part) for part in (
+        start, end, sorted(dentist_ids or []),
+        stats['count'], stats['last_updated'], stats['patient_updated'], get_version(DENTIST_NAME_SCOPE),
+    ))
+    return '"%s"' % hashlib.sha1(key.encode()).hexdigest()
+
+
+def get_feed(start, end, dentist_ids=None):
+    """
+    Build the calendar feed for a date range with one query.
+
+    Returns a dict with the appointment tuples (see FEED_FIELDS), ordered by
+    date and start time, and a map of the dentists they reference.
+    """
+    rows = _feed_queryset(start, end, dentist_ids).order_by('date', 'start_time', 'id').values_list(
+        'id', 'date', 'start_time', 'end_time', 'status', 'dentist_id', 'patient_id', 'patient__name',
+        'dentist__first_name', 'dentist__last_name', 'dentist__username',
+    )
+
+    appointments = []
+    dentists = {}
+    for (pk, day, start_time, end_time, status, dentist_id, patient_id, patient_name,
+         first_name, last_name, username) in rows:
+        appointments.append([
+            pk, day.isoformat(), start_time.strftime('%H:%M'), end_time.strftime('%H:%M'),
+            status, dentist_id, patient_id, patient_name,
+        ])
+        dentists.setdefault(str(dentist_id), f'{first_name} {last_name}'.strip() or username)
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'fields': FEED_FIELDS,
+        'appointments': appointments,
+        'dentists': dentists,
+    }
+
+
+# Appointment list
+LIST_SCOPE = 'appointment-list'
+LIST_CACHE_TIMEOUT = 60
+
+
+class AppointmentFilters(namedtuple('AppointmentFilters', ['date_from', 'date_to', 'dentist_id', 'status'])):
+    """
+    The appointment list filters, normalized so that equal filter
+    combinations compare, hash and serialize the same way. None means the
+    filter is not applied.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_request(cls, request, today):
+        """
+        Read the filters from a request's GET parameters.
+
+        A missing parameter gets its default (today, the logged-in dentist,
+        scheduled appointments); an empty one means "all". A single ?date=
+        is the same as date_from and date_to both set to it.
+        """
+        params = request.GET
+
+        def parse_date(name, default):
+            value = params.get(name, default)
+            if not value:
+                return None
+            try:
+                return datetime.strptime(value, '%Y-%m-%d').date()
+            except (TypeError, ValueError):
+                return today
+
+        if 'date_from' in params or 'date_to' in params:
+            date_from = parse_date('date_from', None)
+            date_to = parse_date('date_to', None)
+        else:
+            date_from = date_to = parse_date('date', today.strftime('%Y-%m-%d'))
+        if date_from and date_to and date_to < date_from:
+            date_from, date_to = date_to, date_from
+
+        dentist_id = params.get('dentist')
+        if dentist_id is None:
+            profile = getattr(request.user, 'profile', None)
+            dentist_id = request.user.id if profile is not None and profile.role == 'dentist' else None
+        try:
+            dentist_id = int(dentist_id) if dentist_id else None
+        except ValueError:
+            dentist_id = None
+
+        status = params.get('status', 'scheduled')
+        if status not in dict(Appointment.STATUS_CHOICES):
+            status = None
+        return cls(date_from, date_to, dentist_id, status)
+
+    def apply(self, queryset):
+        if self.date_from:
+            queryset = queryset.filter(date__gte=self.date_from)
+        if self.date_to:
+            queryset = queryset.filter(date__lte=self.date_to)
+        if self.dentist_id:
+            queryset = queryset.filter(dentist_id=self.dentist_id)
+        if self.status:
+            queryset = queryset.filter(status=self.status)
+        return queryset
+
+    def querystring(self):
+        """Canonical query string for these filters; empty values mean "all"."""
+        return urlencode([
+            ('date_from', self.date_from.isoformat() if self.date_from else ''),
+            ('date_to', self.date_to.isoformat() if self.date_to else ''),
+            ('dentist', self.dentist_id or ''),
+            ('status', self.status or ''),
+        ])
+
+
+# Columns of each cached appointment list row. Pages are cached as these
+# values rather than as model instances, so no user row (password hash,
+# last_login) ends up in the cache.
+LIST_FIELDS = (
+    'id', 'date', 'start_time', 'end_time', 'status', 'notes',
+    'patient_id', 'patient__name', 'dentist_id', 'dentist__first_name', 'dentist__last_name', 'dentist__username',
+)
+
+
+def _list_appointment(row):
+    """Rebuild an Appointment, with its patient and dentist, from a cached row; only LIST_FIELDS are set."""
+    (pk, day, start_time, end_time, status, notes,
+     patient_id, patient_name, dentist_id, first_name, last_name, username) = row
+    appointment = Appointment(
+        id=pk, date=day, start_time=start_time, end_time=end_time, status=status, notes=notes,
+        patient_id=patient_id, dentist_id=dentist_id,
+    )
+    appointment.patient = Patient(id=patient_id, name=patient_name)
+    appointment.dentist = User(id=dentist_id, first_name=first_name, last_name=last_name, username=username)
+    return appointment
+
+
+def invalidate_appointment_lists():
+    """Make every cached appointment list page stale."""
+    bump_version(LIST_SCOPE)
+
+
+def get_appointment_page(filters, cursor=None, page_size=50):
+    """
+    Return a KeysetPage of appointments ordered by date, start time and id.
+
+    Each page is one query with the patient and dentist names joined in,
+    whatever its position, and is cached for LIST_CACHE_TIMEOUT seconds
+    under its filters and cursor. Any appointment or patient change, and a
+    change to a user's name, invalidates all cached pages (see app.signals).
+    Only LIST_FIELDS are loaded on the appointments, patients and dentists.
+    Raises InvalidCursor for a bad cursor.
+    """
+    key = versioned_key(
+        'appointments:list', LIST_SCOPE,
+        hashlib.sha1(f'{filters.querystring()}|{cursor or ""}|{page_size}'.encode()).hexdigest(),
+    )
+    page = cache_get('appointments:list', key)
+    if page is None:
+        rows = filters.apply(Appointment.objects.all()).values_list(*LIST_FIELDS, named=True)
+        page = keyset_paginate(rows, ('date', 'start_time', 'id'), cursor=cursor, page_size=page_size)
+        page = KeysetPage([tuple(row) for row in page], page.next_cursor)
+        cache.set(key, page, LIST_CACHE_TIMEOUT)
+    return KeysetPage([_list_appointment(row) for row in page], page.next_cursor)
@@ -0,0 +1,268 @@
+"""
+Appointment slot availability.
+
+All scheduling code paths (the appointment form, the create/update views and
+the time-slot API) use this module. A dentist's day is read with a single
+narrow query, the booked intervals are sorted and merged, and slots are then
+checked against the merged list in one pass, so a day costs O(n log n) in the
+number of appointments instead of comparing every slot to every booking.
+
+Times are handled as minutes since midnight. Working hours and slot length
+default to the CLINIC_DAY_START, CLINIC_DAY_END and APPOINTMENT_SLOT_MINUTES
+settings.
+
+find_free_slots searches many dentists over many days. It keeps each
+dentist-day's merged busy intervals in the Django cache under the
+dentist-day's version (see app.caching); app.signals bumps the version
+whenever one of that dentist's appointments on that day changes.
+"""
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import time, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from .caching import (
+    cache_get_many, dentist_day_scope, get_versions, invalidate_dentist_day, versioned_key,
+)
+from .models import Appointment
+
+MINUTES_PER_DAY = 24 * 60
+
+# Appointment statuses that block a dentist's time
+BLOCKING_STATUSES = ('scheduled',)
+
+Slot = namedtuple('Slot', ['start', 'end', 'available'])
+
+FreeSlot = namedtuple('FreeSlot', ['dentist_id', 'date', 'start', 'end'])
+
+
+def to_minutes(value):
+    """Convert a time to minutes since midnight."""
+    return value.hour * 60 + value.minute
+
+
+def from_minutes(minutes):
+    """Convert minutes since midnight to a time."""
+    minutes = min(minutes, MINUTES_PER_DAY - 1)
+    return time(minutes // 60, minutes % 60)
+
+
+def get_working_hours():
+    """Return (day_start, day_end, slot_minutes) from settings."""
+    return (
+        getattr(settings, 'CLINIC_DAY_START', time(9, 0)),
+        getattr(settings, 'CLINIC_DAY_END', time(17, 0)),
+        getattr(settings, 'APPOINTMENT_SLOT_MINUTES', 30),
+    )
+
+
+def interval_minutes(start_time, end_time):
+    """
+    Return (start, end) in minutes for an appointment.
+
+    An end time at or before the start means the appointment runs past
+    midnight, so it is clamped to the end of the day.
+    """
+    start = to_minutes(start_time)
+    end = to_minutes(end_time)
+    if end <= start:
+        end = MINUTES_PER_DAY
+    return start, end
+
+
+def _booked_appointments(dentist_id, day, exclude_id=None):
+    appointments = Appointment.objects.filter(
+        dentist_id=dentist_id,
+        date=day,
+        status__in=BLOCKING_STATUSES
+    )
+    if exclude_id:
+        appointments = appointments.exclude(pk=exclude_id)
+    return appointments
+
+
+def get_booked_intervals(dentist_id, day, exclude_id=None):
+    """
+    Fetch a dentist's booked (start, end) intervals for a day, in minutes.
+
+    Runs one query that reads only the two time columns.
+    """
+    appointments = _booked_appointments(dentist_id, day, exclude_id=exclude_id)
+    return [
+        interval_minutes(start, end)
+        for start, end in appointments.order_by().values_list('start_time', 'end_time')
+    ]
+
+
+async def aget_booked_intervals(dentist_id, day, exclude_id=None):
+    """Async version of get_booked_intervals."""
+    appointments = _booked_appointments(dentist_id, day, exclude_id=exclude_id)
+    return [
+        interval_minutes(start, end)
+        async for start, end in appointments.order_by().values_list('start_time', 'end_time')
+    ]
+
+
+def merge_intervals(intervals):
+    """Sort intervals and merge any that overlap or touch."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def is_free(merged, start, end):
+    """
+    Check whether [start, end) is clear of a merged interval list.
+
+    Uses binary search, so each check is O(log n).
+    """
+    # The only interval that can overlap is the last one starting before `end`
+    i = bisect_right(merged, (end, -1)) - 1
+    return i < 0 or merged[i][1] <= start
+
+
+def build_slots(busy, day_start=None, day_end=None, slot_minutes=None):
+    """
+    Split the working day into slots and mark the ones that overlap busy time.
+
+    busy is a list of (start, end) intervals in minutes, in any order.
+    Returns a list of Slot tuples with start and end as times.
+    """
+    default_start, default_end, default_length = get_working_hours()
+    day_start = to_minutes(day_start or default_start)
+    day_end = to_minutes(day_end or default_end)
+    slot_minutes = slot_minutes or default_length
+
+    merged = merge_intervals(busy)
+    slots = []
+    i = 0
+    for start in range(day_start, day_end, slot_minutes):
+        end = start + slot_minutes
+        # Skip busy intervals that finish before this slot begins; slots are
+        # visited in order so the pointer only moves forward
+        while i < len(merged) and merged[i][1] <= start:
+            i += 1
+        available = i == len(merged) or merged[i][0] >= end
+        slots.append(Slot(from_minutes(start), from_minutes(end), available))
+    return slots
+
+
+def get_day_slots(dentist_id, day, exclude_id=None, day_start=None, day_end=None, slot_minutes=None):
+    """Return the Slot list for a dentist's day, using one query."""
+    busy = get_booked_intervals(dentist_id, day, exclude_id=exclude_id)
+    return build_slots(busy, day_start=day_start, day_end=day_end, slot_minutes=slot_minutes)
+
+
+async def aget_day_slots(dentist_id, day, exclude_id=None, day_start=None, day_end=None, slot_minutes=None):
+    """Async version of get_day_slots."""
+    busy = await aget_booked_intervals(dentist_id, day, exclude_id=exclude_id)
+    return build_slots(busy, day_start=day_start, day_end=day_end, slot_minutes=slot_minutes)
+
+
+def find_conflict(dentist_id, day, start_time, end_time, exclude_id=None):
+    """
+    Return the start time of a booked appointment that overlaps the given
+    times, or None if the dentist is free.
+    """
+    start, end = interval_minutes(start_time, end_time)
+    appointments = _booked_appointments(dentist_id, day, exclude_id=exclude_id)
+
+    for booked_start, booked_end in appointments.order_by('start_time').values_list('start_time', 'end_time'):
+        other_start, other_end = interval_minutes(booked_start, booked_end)
+        if start < other_end and end > other_start:
+            return booked_start
+    return None
+
+
+def invalidate_busy_intervals(dentist_id, day):
+    """Make the cached busy intervals for one dentist-day stale."""
+    invalidate_dentist_day(dentist_id, day)
+
+
+def get_busy_intervals(dentist_ids, days):
+    """
+    Return {(dentist_id, day): merged busy intervals} for every combination.
+
+    Dentist-days found in the cache cost nothing; the rest are loaded
+    together with one query and cached for AVAILABILITY_CACHE_TIMEOUT seconds.
+    """
+    pairs = [(dentist_id, day) for dentist_id in dentist_ids for day in days]
+    scopes = {pair: dentist_day_scope(*pair) for pair in pairs}
+    versions = get_versions(list(scopes.values()))
+    keys = {
+        versioned_key('availability:busy', scopes[pair], version=versions[scopes[pair]]): pair
+        for pair in pairs
+    }
+    cached = cache_get_many('availability', list(keys))
+    busy = {keys[key]: [tuple(interval) for interval in value] for key, value in cached.items()}
+
+    missing = [pair for key, pair in keys.items() if key not in cached]
+    if missing:
+        loaded = {pair: [] for pair in missing}
+        rows = Appointment.objects.filter(
+            dentist_id__in={dentist_id for dentist_id, _ in missing},
+            date__in={day for _, day in missing},
+            status__in=BLOCKING_STATUSES
+        ).order_by().values_list('dentist_id', 'date', 'start_time', 'end_time')
+        for dentist_id, day, start, end in rows:
+            if (dentist_id, day) in loaded:
+                loaded[(dentist_id, day)].append(interval_minutes(start, end))
+
+        timeout = getattr(settings, 'AVAILABILITY_CACHE_TIMEOUT', 600)
+        pair_keys = {pair: key for key, pair in keys.items()}
+        to_cache = {}
+        for pair, intervals in loaded.items():
+            busy[pair] = merge_intervals(intervals)
+            to_cache[pair_keys[pair]] = busy[pair]
+        cache.set_many(to_cache, timeout)
+    return busy
+
+
+def find_free_slots(start_date, end_date, dentist_ids, duration=None, limit=10,
+                    not_before=None, day_start=None, day_end=None, step=None):
+    """
+    Find the earliest free slots of `duration` minutes across dentists and days.
+
+    Candidate start times fall on the slot grid of each working day. Results
+    are ordered by date, start time and then dentist id; at most `limit` are
+    returned. not_before, a naive datetime, skips slots that start earlier
+    (typically the current time, so today's past slots are not offered).
+    """
+    default_start, default_end, default_length = get_working_hours()
+    day_start = to_minutes(day_start or default_start)
+    day_end = to_minutes(day_end or default_end)
+    step = step or default_length
+    duration = duration or default_length
+
+    dentist_ids = sorted(dentist_ids)
+    days = []
+    day = start_date
+    while day <= end_date:
+        days.append(day)
+        day += timedelta(days=1)
+
+    busy = get_busy_intervals(dentist_ids, days)
+
+    free = []
+    for day in days:
+        first = day_start
+        if not_before is not None:
+            if day < not_before.date():
+                continue
+            if day == not_before.date():
+                now = to_minutes(not_before.time()) + (1 if not_before.second or not_before.microsecond else 0)
+                # Round up to the next start on the slot grid
+                first = max(first, day_start + -(-(now - day_start) // step) * step)
+        for start in range(first, day_end - duration + 1, step):
+            end = start + duration
+            for dentist_id in dentist_ids:
+                if is_free(busy[(dentist_id, day)], start, end):
+                    free.append(FreeSlot(dentist_id, day, from_minutes(start), from_minutes(end)))
+                    if len(free) >= limit:
+                        return free
+    return free
@@ -0,0 +1,131 @@
+"""
+Concurrency-safe appointment booking.
+
+Checking for overlaps and then saving is only safe if no other booking for
+the same dentist and day can run in between. book_appointment does both
+inside one transaction while holding that dentist-day's BookingLock row:
+
+* On PostgreSQL (and other databases with row locks) the row is taken with
+  SELECT ... FOR UPDATE, so concurrent bookings for the same dentist-day
+  queue while bookings for other dentists or days proceed in parallel. The
+  exclusion constraint from migration 0009 backs this up.
+* SQLite has no row locks, so the transaction starts by writing the lock
+  row. That takes the database write lock before anything is read, so a
+  second booking waits (or fails fast and is retried) instead of reading
+  the day's appointments while the first is still being written.
+
+An overlap raises BookingConflict without saving anything.
+"""
+import time as time_module
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.utils import timezone
+from .availability import BLOCKING_STATUSES, find_conflict
+from .models import BookingLock
+
+# Exclusion constraint on overlapping scheduled appointments (migration 0009)
+OVERLAP_CONSTRAINT = 'app_appointment_no_overlap'
+LOCK_CONSTRAINT = 'unique_booking_lock'
+
+
+class BookingConflict(Exception):
+    """Raised when an appointment overlaps one already booked for the dentist."""
+
+    def __init__(self, appointment, conflict_start=None):
+        self.appointment = appointment
+        self.conflict_start = conflict_start
+        if conflict_start is not None:
+            at = f" at {conflict_start.strftime('%I:%M %p')}"
+        else:
+            at = ''
+        super().__init__(
+            f"This appointment overlaps with another appointment for "
+            f"{appointment.dentist.get_full_name()} on {appointment.date}{at}."
+        )
+
+
+def violates(error, constraint, sqlite_columns=None):
+    """
+    Return whether an IntegrityError was raised by the named constraint.
+
+    PostgreSQL reports the constraint name; SQLite only names the columns of
+    a failed UNIQUE constraint, given as sqlite_columns ('table.column, ...').
+    """
+    diag = getattr(error.__cause__, 'diag', None)
+    if diag is not None:
+        return diag.constraint_name == constraint
+    message = str(error)
+    if sqlite_columns is not None and f'UNIQUE constraint failed: {sqlite_columns}' in message:
+        return True
+    return constraint in message
+
+
+def lock_dentist_day(dentist_id, day):
+    """
+    Lock the BookingLock row for a dentist-day until the transaction ends.
+
+    Must be called inside transaction.atomic().
+    """
+    locks = BookingLock.objects.filter(dentist_id=dentist_id, date=day)
+    if connection.features.has_select_for_update:
+        BookingLock.objects.get_or_create(dentist_id=dentist_id, date=day)
+        locks.select_for_update().get()
+        return
+
+    # Write first so SQLite takes its write lock before the overlap check
+    if not locks.update(locked_at=timezone.now()):
+        try:
+            with transaction.atomic():
+                BookingLock.objects.create(dentist_id=dentist_id, date=day)
+        except IntegrityError as e:
+            if not violates(e, LOCK_CONSTRAINT, 'app_bookinglock.dentist_id, app_bookinglock.date'):
+                raise
+            # Created by a concurrent booking; lock it the same way
+            locks.update(locked_at=timezone.now())
+
+
+def _book(appointment):
+    with transaction.atomic():
+        if appointment.status in BLOCKING_STATUSES:
+            lock_dentist_day(appointment.dentist_id, appointment.date)
+            conflict = find_conflict(
+                appointment.dentist_id,
+                appointment.date,
+                appointment.start_time,
+                appointment.end_time,
+                exclude_id=appointment.pk,
+            )
+            if conflict:
+                raise BookingConflict(appointment, conflict)
+        try:
+            with transaction.atomic():
+                appointment.save()
+        except IntegrityError as e:
+            # Only the PostgreSQL exclusion constraint means a double
+            # booking; anything else is a real error
+            if not violates(e, OVERLAP_CONSTRAINT):
+                raise
+            raise BookingConflict(appointment)
+    return appointment
+
+
+def book_appointment(appointment):
+    """
+    Save a new or changed appointment unless it overlaps another booking.
+
+    Raises BookingConflict if the dentist is already booked at that time.
+    When SQLite reports the database as locked by a concurrent booking the
+    attempt is retried up to BOOKING_LOCK_RETRIES times; inside an outer
+    transaction the error is raised straight away, since the outer
+    transaction cannot be retried here.
+    """
+    retries = getattr(settings, 'BOOKING_LOCK_RETRIES', 20)
+    retry = not connection.in_atomic_block
+    for attempt in range(retries + 1):
+        try:
+            return _book(appointment)
+        except OperationalError as e:
+            if not retry or attempt == retries or 'locked' not in str(e):
+                raise
+            # Back off a little more each time, up to 50 ms
+            time_module.sleep(min(0.005 * (attempt + 1), 0.05))
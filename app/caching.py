@@ -0,0 +1,148 @@
+"""
+Cache helpers shared by the app's caches.
+
+Keys are namespaced ('<namespace>:<part>:...'). Data that belongs to a
+patient or to a dentist-day can be scoped to it: the scope's version number
+is part of the key, so bumping the version makes every entry in the scope
+stale at once, without having to know or delete the individual keys.
+
+Hits and misses are counted per namespace in each process and reported by
+get_stats() (see app.health.cache_stats).
+"""
+import threading
+import time
+from collections import defaultdict
+from django.core.cache import cache
+from django.db import transaction
+
+_missing = object()
+
+_stats = defaultdict(lambda: {'hits': 0, 'misses': 0})
+_stats_lock = threading.Lock()
+
+
+def make_key(namespace, *parts):
+    """Build a namespaced cache key."""
+    return ':'.join(str(part) for part in (namespace,) + parts)
+
+
+def patient_scope(patient_id):
+    return make_key('patient', patient_id)
+
+
+def dentist_day_scope(dentist_id, day):
+    return make_key('dentist-day', dentist_id, day)
+
+
+# Scope of everything rendered from the Tooth and ToothCondition tables
+REFERENCE_SCOPE = 'reference'
+
+
+def _version_key(scope):
+    return make_key('version', scope)
+
+
+def get_version(scope):
+    """Return the current version of a scope."""
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock so a version lost from the cache can never
+        # reuse the number of entries written before
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(scopes):
+    """Return {scope: version} for several scopes with one cache round trip."""
+    keys = {_version_key(scope): scope for scope in scopes}
+    found = cache.get_many(list(keys))
+    versions = {keys[key]: version for key, version in found.items()}
+    for scope in scopes:
+        if scope not in versions:
+            versions[scope] = get_version(scope)
+    return versions
+
+
+def bump_version(scope):
+    """Make every entry cached under a scope stale."""
+    try:
+        cache.incr(_version_key(scope))
+    except ValueError:
+        cache.set(_version_key(scope), time.time_ns(), None)
+
+
+def versioned_key(namespace, scope, *parts, version=None):
+    """Build a key for data in a scope, tied to the scope's current version."""
+    if version is None:
+        version = get_version(scope)
+    return make_key(namespace, scope, f'v{version}', *parts)
+
+
+def invalidate_patient(patient_id):
+    bump_version(patient_scope(patient_id))
+
+
+def invalidate_patients(patient_ids):
+    """
+    Bump the version of each patient now and again when the transaction
+    commits, so a page rendered in between from the old rows does not stay
+    cached. Empty ids are skipped.
+    """
+    patient_ids = {patient_id for patient_id in patient_ids if patient_id}
+
+    def invalidate():
+        for patient_id in patient_ids:
+            invalidate_patient(patient_id)
+
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+def invalidate_dentist_day(dentist_id, day):
+    bump_version(dentist_day_scope(dentist_id, day))
+
+
+def invalidate_reference_fragments():
+    bump_version(REFERENCE_SCOPE)
+
+
+def record(namespace, hits=0, misses=0):
+    """Add to a namespace's hit and miss counters."""
+    with _stats_lock:
+        _stats[namespace]['hits'] += hits
+        _stats[namespace]['misses'] += misses
+
+
+def cache_get(namespace, key, default=None):
+    """cache.get that counts a hit or miss for the namespace."""
+    value = cache.get(key, _missing)
+    if value is _missing:
+        record(namespace, misses=1)
+        return default
+    record(namespace, hits=1)
+    return value
+
+
+def cache_get_many(namespace, keys):
+    """cache.get_many that counts hits and misses for the namespace."""
+    found = cache.get_many(keys)
+    record(namespace, hits=len(found), misses=len(keys) - len(found))
+    return found
+
+
+def get_stats():
+    """Return {namespace: {'hits', 'misses', 'hit_rate'}} for this process."""
+    with _stats_lock:
+        stats = {namespace: dict(counts) for namespace, counts in _stats.items()}
+    for counts in stats.values():
+        total = counts['hits'] + counts['misses']
+        counts['hit_rate'] = round(counts['hits'] / total, 3) if total else None
+    return stats
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
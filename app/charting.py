@@ -0,0 +1,86 @@
+from django.db.models import Count, Q
+from .models import Treatment
+from .reference import get_teeth
+
+# Treatment statuses tracked on the dental chart, in display order
+CHART_STATUSES = [status for status, _ in Treatment.STATUS_CHOICES]
+
+
+def get_tooth_status_counts(patient, appointment=None, highlight_appointment=None):
+    """
+    Count a patient's treatments per tooth and status with one grouped query.
+
+    Returns a dict mapping tooth_id to a dict of status counts. If appointment
+    is given, only treatments from that appointment are counted. If
+    highlight_appointment is given, each entry also gets an 'appointment'
+    count of the treatments recorded during that appointment.
+    """
+    treatments = Treatment.objects.filter(patient=patient, tooth__isnull=False)
+    if appointment is not None:
+        treatments = treatments.filter(appointment=appointment)
+
+    annotations = {'count': Count('id')}
+    if highlight_appointment is not None:
+        annotations['appointment_count'] = Count('id', filter=Q(appointment=highlight_appointment))
+
+    rows = treatments.order_by().values('tooth_id', 'status').annotate(**annotations)
+
+    counts = {}
+    for row in rows:
+        tooth_counts = counts.setdefault(row['tooth_id'], {'appointment': 0})
+        tooth_counts[row['status']] = tooth_counts.get(row['status'], 0) + row['count']
+        tooth_counts['appointment'] += row.get('appointment_count', 0)
+    return counts
+
+
+class ChartTooth:
+    """A tooth as rendered on the dental chart, with the patient's treatment state."""
+    __slots__ = (
+        'id', 'number', 'name', 'quadrant', 'position', 'treatment_counts',
+        'has_treatments', 'has_planned_treatments', 'has_in_progress_treatments',
+        'has_completed_treatments', 'has_appointment_treatments',
+    )
+
+    def __init__(self, tooth, tooth_counts):
+        self.id = tooth.id
+        self.number = tooth.number
+        self.name = tooth.name
+        self.quadrant = tooth.quadrant
+        self.position = tooth.position
+
+        treatment_counts = {status: tooth_counts.get(status, 0) for status in CHART_STATUSES}
+        treatment_counts['total'] = sum(treatment_counts.values())
+
+        self.treatment_counts = treatment_counts
+        self.has_treatments = treatment_counts['total'] > 0
+        self.has_planned_treatments = treatment_counts['planned'] > 0
+        self.has_in_progress_treatments = treatment_counts['in_progress'] > 0
+        self.has_completed_treatments = treatment_counts['completed'] > 0
+        self.has_appointment_treatments = tooth_counts.get('appointment', 0) > 0
+
+
+def annotate_teeth(teeth, counts):
+    """
+    Combine teeth with the has_* flags and treatment_counts used by the chart templates.
+
+    teeth is any iterable of Tooth objects or ToothRecord tuples; counts is the
+    mapping returned by get_tooth_status_counts. Returns a list of ChartTooth.
+    """
+    return [ChartTooth(tooth, counts.get(tooth.id, {})) for tooth in teeth]
+
+
+def get_chart_teeth(patient, appointment=None, highlight_appointment=None):
+    """
+    Return all teeth, ordered for the chart, with the patient's treatment state.
+
+    Teeth come from the in-process reference cache, so this runs a single
+    grouped aggregate over Treatment regardless of how many teeth or
+    treatments exist.
+    """
+    teeth = get_teeth()
+    counts = get_tooth_status_counts(
+        patient,
+        appointment=appointment,
+        highlight_appointment=highlight_appointment,
+    )
+    return annotate_teeth(teeth, counts)
@@ -0,0 +1,99 @@
+"""
+Dashboard metrics.
+
+The admin totals are cached for DASHBOARD_COUNT_TIMEOUT seconds. On
+PostgreSQL, tables above DASHBOARD_ESTIMATE_THRESHOLD rows are counted from
+the planner's pg_class.reltuples estimate instead of a full COUNT(*).
+
+The dentist widgets only look at an upcoming window (today plus
+DASHBOARD_UPCOMING_DAYS, at most DASHBOARD_WIDGET_LIMIT appointments). They
+are cached per dentist, and app.signals drops that entry whenever one of
+the dentist's appointments is saved or deleted.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from .caching import cache_get, cache_get_many, make_key
+from .models import Appointment, Patient, Treatment
+
+# Context name and model of each admin total
+TOTALS = (
+    ('total_patients', Patient),
+    ('total_appointments', Appointment),
+    ('total_treatments', Treatment),
+)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def estimate_count(model):
+    """
+    Count a model's rows, using the PostgreSQL planner estimate for big tables.
+
+    The estimate is refreshed by VACUUM/ANALYZE, so it can lag slightly;
+    below the threshold (or if the table has never been analyzed) an exact
+    count is used instead.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        if row and row[0] >= _setting('DASHBOARD_ESTIMATE_THRESHOLD', 100000):
+            return row[0]
+    return model.objects.count()
+
+
+def get_totals():
+    """Return the admin totals as a dict keyed by context name."""
+    keys = {make_key('dashboard', 'count', name): (name, model) for name, model in TOTALS}
+    cached = cache_get_many('dashboard', list(keys))
+
+    totals = {}
+    missing = {}
+    for key, (name, model) in keys.items():
+        if key in cached:
+            totals[name] = cached[key]
+        else:
+            totals[name] = missing[key] = estimate_count(model)
+    if missing:
+        cache.set_many(missing, _setting('DASHBOARD_COUNT_TIMEOUT', 60))
+    return totals
+
+
+def _dentist_key(dentist_id):
+    return make_key('dashboard', 'dentist', dentist_id)
+
+
+def invalidate_dentist_widgets(dentist_id):
+    """Drop a dentist's cached dashboard widgets."""
+    cache.delete(_dentist_key(dentist_id))
+
+
+def get_dentist_widgets(dentist, today):
+    """
+    Return (upcoming appointments, their patients) for a dentist's dashboard.
+
+    Reads one bounded window query on a cache miss and nothing otherwise.
+    """
+    key = _dentist_key(dentist.pk)
+    cached = cache_get('dashboard', key)
+    if cached is not None and cached[0] == today:
+        return cached[1], cached[2]
+
+    window_end = today + timedelta(days=_setting('DASHBOARD_UPCOMING_DAYS', 7))
+    appointments = list(
+        Appointment.objects.filter(
+            dentist=dentist,
+            date__range=[today, window_end]
+        ).select_related('patient').order_by('date', 'start_time', 'id')[:_setting('DASHBOARD_WIDGET_LIMIT', 10)]
+    )
+    patients = list({appointment.patient_id: appointment.patient for appointment in appointments}.values())
+
+    cache.set(key, (today, appointments, patients), _setting('DASHBOARD_WIDGET_TIMEOUT', 300))
+    return appointments, patients
@@ -1,6 +1,9 @@
 from django import forms
 from django.forms import inlineformset_factory
+from django.urls import reverse_lazy
 from .models import Patient, Appointment, Treatment, Payment, PaymentItem
+from .availability import find_conflict
+from .ledger import PatientFinancials
 from decimal import Decimal
 
 class PatientForm(forms.ModelForm):
@@ -20,7 +23,35 @@ class PatientForm(forms.ModelForm):
             'chief_complaint': forms.Textarea(attrs={'rows': 3}),
         }
 
+class PatientAutocompleteWidget(forms.Select):
+    """
+    Patient select that only renders the currently chosen patient.
+    
+    Other patients are fetched from the patient search API as the user types,
+    so the page size does not grow with the number of patients.
+    """
+    placeholder = 'Select a patient'
+    extra_choices = [('new', '+ Add New Patient')]
+    
+    def __init__(self, attrs=None):
+        attrs = {'data-search-url': reverse_lazy('patient_search_api'), **(attrs or {})}
+        super().__init__(attrs)
+    
+    def optgroups(self, name, value, attrs=None):
+        # Only load the selected patient, by primary key
+        ids = [int(v) for v in value if str(v).isdigit()]
+        self.choices = [('', self.placeholder)] + self.extra_choices + list(
+            Patient.objects.filter(pk__in=ids).values_list('pk', 'name')
+        )
+        return super().optgroups(name, value, attrs)
+
 class AppointmentForm(forms.ModelForm):
+    # Patients are looked up by ID only; see PatientAutocompleteWidget
+    patient = forms.ModelChoiceField(
+        queryset=Patient.objects.all(),
+        widget=PatientAutocompleteWidget(attrs={'class': 'block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-500 focus:ring-indigo-500 sm:text-sm'})
+    )
+    
     # Add a duration field (in minutes)
     duration = forms.IntegerField(
         initial=30,
@@ -71,17 +102,15 @@ class AppointmentForm(forms.ModelForm):
             cleaned_data['end_time'] = end_time
             
             # Check for overlapping appointments
-            overlapping_appointments = Appointment.objects.filter(
-                dentist=dentist,
-                date=date,
-                status='scheduled'
-            ).exclude(pk=self.instance.pk if self.instance.pk else None)
-            
-            for appointment in overlapping_appointments:
-                # Check if the new appointment overlaps with existing ones
-                if (start_time < appointment.end_time and end_time > appointment.start_time):
-                    self.add_error(None, f"This appointment overlaps with another appointment for {dentist.get_full_name()} on {date} at {appointment.start_time.strftime('%I:%M %p')}.")
-                    break
+            conflict = find_conflict(
+                dentist.pk,
+                date,
+                start_time,
+                end_time,
+                exclude_id=self.instance.pk,
+            )
+            if conflict:
+                self.add_error(None, f"This appointment overlaps with another appointment for {dentist.get_full_name()} on {date} at {conflict.strftime('%I:%M %p')}.")
         
         return cleaned_data
     
@@ -143,11 +172,9 @@ class PaymentForm(forms.ModelForm):
         # If this is a new payment, initialize with default values
         if not self.instance.pk:
             # Calculate total treatment cost for the patient
-            from django.db.models import Sum
             if patient:
-                total_cost = Treatment.objects.filter(patient=patient).aggregate(Sum('cost'))['cost__sum'] or 0
-                total_paid = Payment.objects.filter(patient=patient).aggregate(Sum('amount_paid'))['amount_paid__sum'] or 0
-                self.fields['total_amount'].initial = total_cost - total_paid
+                financials = PatientFinancials.for_patient(patient)
+                self.fields['total_amount'].initial = financials.treatment_cost - financials.total_paid
     
     def clean(self):
         cleaned_data = super().clean()
@@ -1,6 +1,15 @@
-from django.http import JsonResponse
+import hmac
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, JsonResponse
+from .caching import get_stats
+from .metrics import render_prometheus
 
-def health_check(request):
+def _is_admin(user):
+    profile = getattr(user, 'profile', None)
+    return user.is_superuser or (profile is not None and profile.role == 'admin')
+
+async def health_check(request):
     """
     Health check endpoint to ensure the application is running properly.
     This endpoint doesn't require authentication.
@@ -8,4 +17,32 @@ def health_check(request):
     return JsonResponse({
         'status': 'ok',
         'message': 'DentChartzz is up and running!'
-    }) 
\ No newline at end of file
+    })
+
+@login_required
+def cache_stats(request):
+    """
+    Cache hit/miss counters per namespace for this worker process.
+    Only available to admins.
+    """
+    if not _is_admin(request.user):
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    
+    return JsonResponse({
+        'backend': settings.CACHES['default']['BACKEND'],
+        'namespaces': get_stats(),
+    })
+
+def metrics(request):
+    """
+    Request and cache metrics for this worker process in the Prometheus
+    text format. Scrapers authenticate with "Authorization: Bearer
+    <METRICS_TOKEN>"; logged-in admins can read them too.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorization = request.headers.get('Authorization', '')
+    scraper = bool(token) and hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode())
+    if not scraper and not (request.user.is_authenticated and _is_admin(request.user)):
+        return HttpResponse('Permission denied\n', status=403, content_type='text/plain')
+    
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
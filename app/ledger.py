@@ -0,0 +1,247 @@
+"""
+Per-patient payment ledger.
+
+PatientBalance keeps each patient's billed and paid totals so balance reads
+are a single primary-key lookup instead of a Sum over the full Payment
+history. Payment saves and deletes adjust the totals by their difference
+(see app.signals); rows that do not exist yet are built from the Payment
+table the first time they are read.
+
+PatientFinancials combines those totals with the patient's treatment costs
+and is what views and forms should use to display billing figures.
+"""
+from collections import namedtuple
+from asgiref.sync import sync_to_async
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from .models import Patient, Payment, PatientBalance, Treatment
+
+ZERO = Decimal('0.00')
+
+
+def to_decimal(value):
+    """Convert an amount that may have been assigned as a float or string."""
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value or 0))
+
+
+def compute_payment_totals(patient_ids=None):
+    """
+    Sum billed and paid amounts straight from the Payment table.
+
+    Returns a dict mapping patient_id to (total_billed, total_paid,
+    payment_count), using one grouped query. Patients without payments are
+    left out.
+    """
+    payments = Payment.objects.all()
+    if patient_ids is not None:
+        payments = payments.filter(patient_id__in=patient_ids)
+
+    rows = payments.order_by().values('patient_id').annotate(
+        billed=Sum('total_amount'),
+        paid=Sum('amount_paid'),
+        count=Count('id'),
+    )
+    return {
+        row['patient_id']: (row['billed'] or ZERO, row['paid'] or ZERO, row['count'])
+        for row in rows
+    }
+
+
+def rebuild_patient_balance(patient_id):
+    """Recalculate one patient's PatientBalance row from their payments."""
+    billed, paid, count = compute_payment_totals([patient_id]).get(patient_id, (ZERO, ZERO, 0))
+    balance, _ = PatientBalance.objects.update_or_create(
+        patient_id=patient_id,
+        defaults={'total_billed': billed, 'total_paid': paid, 'payment_count': count},
+    )
+    return balance
+
+
+def _lock_patient(patient_id):
+    # Payments and first reads of a patient's balance serialise on the
+    # patient row, so a row being built cannot miss, or count twice, a
+    # payment saved at the same moment
+    list(Patient.objects.select_for_update().filter(pk=patient_id).values_list('pk'))
+
+
+def get_balance(patient):
+    """
+    Return the PatientBalance for a patient (or patient id).
+
+    This is a single lookup by primary key; the row is built from the Payment
+    table the first time it is needed, holding the patient's row lock.
+    """
+    patient_id = getattr(patient, 'pk', patient)
+    try:
+        return PatientBalance.objects.get(patient_id=patient_id)
+    except PatientBalance.DoesNotExist:
+        try:
+            with transaction.atomic():
+                _lock_patient(patient_id)
+                return rebuild_patient_balance(patient_id)
+        except IntegrityError:
+            # Another request created the row first
+            return PatientBalance.objects.get(patient_id=patient_id)
+
+
+def apply_payment_change(patient_id, billed_delta, paid_delta, count_delta):
+    """
+    Adjust a patient's running totals by the given amounts.
+
+    Uses a single UPDATE with F() expressions so concurrent payments do not
+    overwrite each other. If no row was updated, the patient's row lock is
+    taken and the UPDATE retried: a first read building the row at the same
+    time has either committed it by then, or will see this payment once the
+    lock is released. Without a row nothing is written; it is built in full
+    on the next read.
+    """
+    billed_delta = to_decimal(billed_delta)
+    paid_delta = to_decimal(paid_delta)
+    if not (billed_delta or paid_delta or count_delta):
+        return
+    with transaction.atomic():
+        if _add_to_balance(patient_id, billed_delta, paid_delta, count_delta):
+            return
+        _lock_patient(patient_id)
+        _add_to_balance(patient_id, billed_delta, paid_delta, count_delta)
+
+
+def _add_to_balance(patient_id, billed_delta, paid_delta, count_delta):
+    return PatientBalance.objects.filter(patient_id=patient_id).update(
+        total_billed=F('total_billed') + billed_delta,
+        total_paid=F('total_paid') + paid_delta,
+        payment_count=F('payment_count') + count_delta,
+    )
+
+
+def find_balance_drift(patient_ids=None):
+    """
+    Compare stored PatientBalance rows with the Payment table.
+
+    Returns a list of (patient_id, stored, actual) tuples for every patient
+    whose stored totals differ, where stored and actual are
+    (total_billed, total_paid, payment_count). Patients without a stored row
+    are not reported, as they are rebuilt on first read.
+    """
+    balances = PatientBalance.objects.all()
+    if patient_ids is not None:
+        balances = balances.filter(patient_id__in=patient_ids)
+
+    stored = {
+        row[0]: tuple(row[1:])
+        for row in balances.values_list('patient_id', 'total_billed', 'total_paid', 'payment_count')
+    }
+    actual = compute_payment_totals(list(stored) if patient_ids is not None else None)
+
+    drift = []
+    for patient_id, stored_totals in sorted(stored.items()):
+        actual_totals = actual.get(patient_id, (ZERO, ZERO, 0))
+        if stored_totals != actual_totals:
+            drift.append((patient_id, stored_totals, actual_totals))
+    return drift
+
+
+def rebuild_all_balances(patient_ids=None):
+    """
+    Rebuild PatientBalance rows from the Payment table in bulk.
+
+    Returns the number of rows written.
+    """
+    patients = Patient.objects.all()
+    if patient_ids is not None:
+        patients = patients.filter(pk__in=patient_ids)
+    ids = list(patients.values_list('pk', flat=True))
+    totals = compute_payment_totals(patient_ids)
+
+    balances = []
+    for patient_id in ids:
+        billed, paid, count = totals.get(patient_id, (ZERO, ZERO, 0))
+        balances.append(PatientBalance(
+            patient_id=patient_id,
+            total_billed=billed,
+            total_paid=paid,
+            payment_count=count,
+        ))
+    with transaction.atomic():
+        PatientBalance.objects.filter(patient_id__in=ids).delete()
+        PatientBalance.objects.bulk_create(balances, batch_size=500)
+    return len(balances)
+
+
+class PatientFinancials(namedtuple('PatientFinancials', [
+    'patient_id', 'total_billed', 'total_paid', 'balance_due', 'treatment_cost', 'payment_count',
+])):
+    """
+    A patient's billing figures: payment totals from the ledger and the sum of
+    their treatment costs, read together in one SQL statement.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def for_patient(cls, patient):
+        """Return the PatientFinancials for one patient (or patient id)."""
+        patient_id = getattr(patient, 'pk', patient)
+        return cls.for_patients([patient_id])[patient_id]
+
+    @classmethod
+    async def afor_patient(cls, patient):
+        """Async version of for_patient."""
+        patient_id = getattr(patient, 'pk', patient)
+        return (await cls.afor_patients([patient_id]))[patient_id]
+
+    @staticmethod
+    def _rows(patient_ids):
+        treatment_cost = Treatment.objects.filter(patient=OuterRef('pk')).order_by().values(
+            'patient'
+        ).annotate(total=Sum('cost')).values('total')
+
+        return Patient.objects.filter(pk__in=patient_ids).order_by().values_list(
+            'pk', 'balance__total_billed', 'balance__total_paid', 'balance__payment_count',
+        ).annotate(
+            treatment_cost=Coalesce(
+                Subquery(treatment_cost, output_field=DecimalField(max_digits=12, decimal_places=2)),
+                Value(ZERO),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            )
+        )
+
+    @classmethod
+    def _from_row(cls, patient_id, billed, paid, count, cost, balance=None):
+        if balance is not None:
+            billed, paid, count = balance.total_billed, balance.total_paid, balance.payment_count
+        return cls(
+            patient_id=patient_id,
+            total_billed=billed,
+            total_paid=paid,
+            balance_due=billed - paid,
+            treatment_cost=to_decimal(cost),
+            payment_count=count,
+        )
+
+    @classmethod
+    def for_patients(cls, patient_ids):
+        """
+        Return a dict mapping each patient id to its PatientFinancials.
+
+        Uses one query for any number of patients. Patients whose ledger row
+        has not been built yet get it built here first.
+        """
+        financials = {}
+        for patient_id, billed, paid, count, cost in cls._rows(patient_ids):
+            balance = get_balance(patient_id) if count is None else None
+            financials[patient_id] = cls._from_row(patient_id, billed, paid, count, cost, balance)
+        return financials
+
+    @classmethod
+    async def afor_patients(cls, patient_ids):
+        """Async version of for_patients."""
+        financials = {}
+        async for patient_id, billed, paid, count, cost in cls._rows(patient_ids):
+            # Building a missing ledger row is a rare, transactional write
+            balance = await sync_to_async(get_balance)(patient_id) if count is None else None
+            financials[patient_id] = cls._from_row(patient_id, billed, paid, count, cost, balance)
+        return financials
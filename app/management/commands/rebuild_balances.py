@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from app.ledger import find_balance_drift, rebuild_all_balances
+
+class Command(BaseCommand):
+    help = 'Rebuilds the per-patient balance table from payments, or checks it for drift with --check'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report patients whose stored balance differs from their payments',
+        )
+        parser.add_argument(
+            '--patient',
+            type=int,
+            action='append',
+            dest='patients',
+            help='Limit to this patient ID (can be given more than once)',
+        )
+
+    def handle(self, *args, **options):
+        patient_ids = options['patients']
+        
+        if options['check']:
+            drift = find_balance_drift(patient_ids)
+            for patient_id, stored, actual in drift:
+                self.stdout.write(self.style.WARNING(
+                    f'Patient {patient_id}: stored billed={stored[0]} paid={stored[1]} count={stored[2]}, '
+                    f'actual billed={actual[0]} paid={actual[1]} count={actual[2]}'
+                ))
+            if drift:
+                raise CommandError(f'{len(drift)} patient balance(s) out of sync with payments')
+            self.stdout.write(self.style.SUCCESS('All patient balances match their payments'))
+            return
+        
+        count = rebuild_all_balances(patient_ids)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} patient balance(s)'))
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from app.release import migration_state, static_source_hash, collected_static_hash, record_static_hash
+from app.seeding import seed, seed_is_complete
+
+class Command(BaseCommand):
+    help = (
+        'Runs the release steps (migrate, createcachetable, collectstatic, seeding) once per deploy, '
+        'skipping each step that is already applied'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Run every step even if it looks already applied',
+        )
+        parser.add_argument(
+            '--skip-static',
+            action='store_true',
+            help='Leave static files alone',
+        )
+
+    def handle(self, *args, **options):
+        force = options['force']
+        
+        fingerprint, pending = migration_state()
+        if pending or force:
+            self.stdout.write(f'Applying {len(pending)} migration(s) (state {fingerprint})...')
+            call_command('migrate', interactive=False, verbosity=options['verbosity'])
+        else:
+            self.stdout.write(f'Migrations up to date (state {fingerprint}), skipping migrate')
+        
+        if settings.CACHE_BACKEND == 'db':
+            # createcachetable is a no-op when the table exists
+            call_command('createcachetable', verbosity=options['verbosity'])
+        
+        if not options['skip_static']:
+            source_hash = static_source_hash()
+            if force or collected_static_hash() != source_hash:
+                self.stdout.write(f'Collecting static files (source {source_hash[:16]})...')
+                call_command('collectstatic', interactive=False, verbosity=options['verbosity'])
+                record_static_hash(source_hash)
+            else:
+                self.stdout.write(f'Static files up to date (source {source_hash[:16]}), skipping collectstatic')
+        
+        if force or not seed_is_complete():
+            self.stdout.write('Seeding initial data...')
+            seed(log=self.stdout.write)
+        else:
+            self.stdout.write('Initial data present, skipping seeding')
+        
+        self.stdout.write(self.style.SUCCESS('Release complete'))
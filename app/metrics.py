@@ -0,0 +1,244 @@
+"""
+Per-request database and rendering cost, aggregated per view.
+
+RequestMetricsMiddleware (app.middleware) opens a RequestRecord for each
+request. Every SQL statement run through a connection's execute wrapper and
+every top-level template render run through TimedDjangoTemplates is added
+to it. When the response is ready the record is folded into in-memory
+histograms keyed by URL name:
+
+* wall time, SQL time and template time in seconds
+* number of queries
+
+render_prometheus() exports them, together with the cache counters from
+app.caching, in the Prometheus text format (served at /metrics/). Like the
+cache counters they are per worker process and start empty when the worker
+does.
+
+Requests slower than METRICS_SLOW_REQUEST_MS or running at least
+METRICS_SLOW_REQUEST_QUERIES queries are logged to the 'app.metrics' logger
+as one JSON object, with the METRICS_TOP_SQL statements that cost the most
+time. Statements are grouped by their SQL before parameters are bound, so
+an N+1 loop shows up as one statement with a high count.
+"""
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates, Template
+from .caching import get_stats
+
+logger = logging.getLogger('app.metrics')
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Distinct statements remembered per request for the slow-request log
+MAX_STATEMENTS = 200
+SQL_LOG_LENGTH = 500
+
+# name: (help, buckets)
+HISTOGRAMS = {
+    'request_duration_seconds': ('Wall time of each request', SECONDS_BUCKETS),
+    'request_sql_duration_seconds': ('Time spent running SQL in each request', SECONDS_BUCKETS),
+    'request_template_duration_seconds': ('Time spent rendering templates in each request', SECONDS_BUCKETS),
+    'request_queries': ('SQL queries run by each request', QUERY_BUCKETS),
+}
+
+_current = ContextVar('request_metrics', default=None)
+
+_lock = threading.Lock()
+# {histogram name: {view: [bucket counts..., +Inf count, sum]}}
+_histograms = {name: {} for name in HISTOGRAMS}
+# {(view, status class): count}
+_responses = defaultdict(int)
+# {view: count}
+_slow = defaultdict(int)
+
+
+class RequestRecord:
+    """What one request spent on SQL and templates."""
+    __slots__ = ('queries', 'sql_seconds', 'template_seconds', 'template_depth', 'statements')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+        # {sql: [count, seconds]}
+        self.statements = {}
+
+    def add_query(self, sql, seconds):
+        self.queries += 1
+        self.sql_seconds += seconds
+        statement = self.statements.get(sql)
+        if statement is None:
+            if len(self.statements) >= MAX_STATEMENTS:
+                return
+            statement = self.statements[sql] = [0, 0.0]
+        statement[0] += 1
+        statement[1] += seconds
+
+    def top_statements(self, limit):
+        """Return the statements that took the most time, most expensive first."""
+        ranked = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [
+            {'sql': sql[:SQL_LOG_LENGTH], 'count': count, 'ms': round(seconds * 1000, 2)}
+            for sql, (count, seconds) in ranked
+        ]
+
+
+def start_request():
+    """Begin recording for the current request; returns (record, token)."""
+    record = RequestRecord()
+    return record, _current.set(record)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper that adds each statement's time to the current request."""
+    record = _current.get()
+    if record is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record.add_query(sql, time.perf_counter() - started)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        record = _current.get()
+        if record is None:
+            return super().render(context, request)
+        # Templates rendered from inside another one are already timed by it
+        record.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            record.template_depth -= 1
+            if record.template_depth == 0:
+                record.template_seconds += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing renders for the request metrics."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+def _observe(name, view, value):
+    buckets = HISTOGRAMS[name][1]
+    counts = _histograms[name].get(view)
+    if counts is None:
+        counts = _histograms[name][view] = [0] * (len(buckets) + 2)
+    counts[bisect_left(buckets, value)] += 1
+    counts[-1] += value
+
+
+def observe_request(view, method, path, status, wall_seconds, record):
+    """Add a finished request to the histograms and log it if it was slow."""
+    slow_ms = getattr(settings, 'METRICS_SLOW_REQUEST_MS', 500)
+    slow_queries = getattr(settings, 'METRICS_SLOW_REQUEST_QUERIES', 50)
+    reasons = []
+    if wall_seconds * 1000 >= slow_ms:
+        reasons.append('duration')
+    if record.queries >= slow_queries:
+        reasons.append('queries')
+
+    with _lock:
+        _observe('request_duration_seconds', view, wall_seconds)
+        _observe('request_sql_duration_seconds', view, record.sql_seconds)
+        _observe('request_template_duration_seconds', view, record.template_seconds)
+        _observe('request_queries', view, record.queries)
+        _responses[(view, f'{status // 100}xx')] += 1
+        if reasons:
+            _slow[view] += 1
+
+    if reasons:
+        logger.warning(json.dumps({
+            'event': 'slow_request',
+            'reasons': reasons,
+            'view': view,
+            'method': method,
+            'path': path,
+            'status': status,
+            'wall_ms': round(wall_seconds * 1000, 2),
+            'sql_ms': round(record.sql_seconds * 1000, 2),
+            'template_ms': round(record.template_seconds * 1000, 2),
+            'queries': record.queries,
+            'top_sql': record.top_statements(getattr(settings, 'METRICS_TOP_SQL', 5)),
+        }))
+
+
+def reset_metrics():
+    with _lock:
+        for views in _histograms.values():
+            views.clear()
+        _responses.clear()
+        _slow.clear()
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(prefix='dentchartzz'):
+    """Return the metrics of this process in the Prometheus text format."""
+    with _lock:
+        histograms = {name: {view: list(counts) for view, counts in views.items()} for name, views in _histograms.items()}
+        responses = dict(_responses)
+        slow = dict(_slow)
+
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        metric = f'{prefix}_{name}'
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} histogram')
+        for view, counts in sorted(histograms[name].items()):
+            view = _label(view)
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{view="{view}"}} {_number(counts[-1])}')
+            lines.append(f'{metric}_count{{view="{view}"}} {cumulative}')
+
+    metric = f'{prefix}_responses_total'
+    lines.append(f'# HELP {metric} Responses by view and status class')
+    lines.append(f'# TYPE {metric} counter')
+    for (view, status), count in sorted(responses.items()):
+        lines.append(f'{metric}{{view="{_label(view)}",status="{status}"}} {count}')
+
+    metric = f'{prefix}_slow_requests_total'
+    lines.append(f'# HELP {metric} Requests logged as slow, by view')
+    lines.append(f'# TYPE {metric} counter')
+    for view, count in sorted(slow.items()):
+        lines.append(f'{metric}{{view="{_label(view)}"}} {count}')
+
+    cache_stats = get_stats()
+    for counter in ('hits', 'misses'):
+        metric = f'{prefix}_cache_{counter}_total'
+        lines.append(f'# HELP {metric} Cache {counter} by namespace')
+        lines.append(f'# TYPE {metric} counter')
+        for namespace, counts in sorted(cache_stats.items()):
+            lines.append(f'{metric}{{namespace="{_label(namespace)}"}} {counts[counter]}')
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,68 @@
+import time
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.decorators import sync_and_async_middleware
+from .metrics import start_request, end_request, record_query, observe_request
+
+def _trace_queries():
+    """Add record_query to every connection of this thread until the returned stack is closed."""
+    stack = ExitStack()
+    for alias in connections:
+        stack.enter_context(connections[alias].execute_wrapper(record_query))
+    return stack
+
+@sync_and_async_middleware
+class RequestMetricsMiddleware:
+    """
+    Record query count, SQL time, template time and wall time for each
+    request and add them to the per-view histograms in app.metrics.
+
+    Placed near the top of MIDDLEWARE so the session and authentication
+    queries are counted too. Set METRICS_ENABLED to False to leave it out.
+    Under ASGI it runs as a coroutine, so async views are not pushed onto a
+    thread to get through it.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        record, token = start_request()
+        started = time.perf_counter()
+        try:
+            with _trace_queries():
+                response = self.get_response(request)
+        finally:
+            end_request(token)
+        
+        self._observe(request, response, started, record)
+        return response
+
+    async def __acall__(self, request):
+        record, token = start_request()
+        started = time.perf_counter()
+        # The ORM runs an async request's queries through sync_to_async, on
+        # the thread (and so the connections) the wrappers are added to here
+        stack = await sync_to_async(_trace_queries)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            end_request(token)
+        
+        self._observe(request, response, started, record)
+        return response
+
+    def _observe(self, request, response, started, record):
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or 'unresolved'
+        observe_request(view, request.method, request.path, response.status_code, time.perf_counter() - started, record)
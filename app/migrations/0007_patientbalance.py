@@ -0,0 +1,45 @@
+# Generated by Django 5.1.15 on 2026-10-17 20:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def build_balances(apps, schema_editor):
+    Payment = apps.get_model('app', 'Payment')
+    PatientBalance = apps.get_model('app', 'PatientBalance')
+    rows = Payment.objects.order_by().values('patient_id').annotate(
+        billed=Sum('total_amount'),
+        paid=Sum('amount_paid'),
+        count=Count('id'),
+    )
+    PatientBalance.objects.bulk_create([
+        PatientBalance(
+            patient_id=row['patient_id'],
+            total_billed=row['billed'] or 0,
+            total_paid=row['paid'] or 0,
+            payment_count=row['count'],
+        )
+        for row in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_alter_patient_address'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientBalance',
+            fields=[
+                ('patient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='balance', serialize=False, to='app.patient')),
+                ('total_billed', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_paid', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('payment_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(build_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.15 on 2026-10-17 20:34
+
+import re
+import warnings
+from django.db import migrations, models
+
+
+def normalize_phones(apps, schema_editor):
+    Patient = apps.get_model('app', 'Patient')
+    patients = list(Patient.objects.only('id', 'phone'))
+    for patient in patients:
+        patient.phone_normalized = re.sub(r'\D', '', patient.phone or '')[:15]
+    Patient.objects.bulk_update(patients, ['phone_normalized'], batch_size=500)
+
+
+def create_name_trigram_index(apps, schema_editor):
+    # Trigram index for substring and prefix search on patient names. Matches
+    # the UPPER(name) LIKE ... that icontains/istartswith generate. PostgreSQL
+    # with the pg_trgm extension only; elsewhere search falls back to scanning.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        available = cursor.fetchone() is not None
+    if not available:
+        warnings.warn('pg_trgm is not available; skipping the trigram index on patient name')
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS app_patient_name_trgm '
+        'ON app_patient USING gin (UPPER(name) gin_trgm_ops)'
+    )
+
+
+def drop_name_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS app_patient_name_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_patientbalance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='phone_normalized',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=15),
+        ),
+        migrations.RunPython(normalize_phones, migrations.RunPython.noop),
+        migrations.RunPython(create_name_trigram_index, drop_name_trigram_index),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.1.15 on 2026-10-17 20:47
+
+import warnings
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# An appointment's time range; {t} is an optional table alias with its dot
+APPOINTMENT_RANGE = (
+    "tsrange({t}date + {t}start_time, "
+    "CASE WHEN {t}end_time > {t}start_time THEN {t}date + {t}end_time ELSE ({t}date + 1)::timestamp END)"
+)
+
+
+def create_overlap_constraint(apps, schema_editor):
+    # Second line of defence behind app.booking: PostgreSQL rejects any two
+    # scheduled appointments for the same dentist whose times overlap.
+    # Appointments ending at or before their start run to midnight. Skipped,
+    # with a warning, when btree_gist is not available or existing rows
+    # already overlap; other databases rely on the lock.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'btree_gist'")
+        if cursor.fetchone() is None:
+            warnings.warn('btree_gist is not available; skipping the appointment overlap constraint')
+            return
+        cursor.execute(
+            'SELECT EXISTS (SELECT 1 FROM app_appointment a JOIN app_appointment b '
+            "ON a.dentist_id = b.dentist_id AND a.id < b.id AND a.status = 'scheduled' AND b.status = 'scheduled' "
+            f"AND {APPOINTMENT_RANGE.format(t='a.')} && {APPOINTMENT_RANGE.format(t='b.')})"
+        )
+        if cursor.fetchone()[0]:
+            warnings.warn('Scheduled appointments already overlap; skipping the appointment overlap constraint')
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    schema_editor.execute(
+        'ALTER TABLE app_appointment ADD CONSTRAINT app_appointment_no_overlap '
+        f"EXCLUDE USING gist (dentist_id WITH =, {APPOINTMENT_RANGE.format(t='')} WITH &&) "
+        "WHERE (status = 'scheduled')"
+    )
+
+
+def drop_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('ALTER TABLE app_appointment DROP CONSTRAINT IF EXISTS app_appointment_no_overlap')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_patient_phone_normalized'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('locked_at', models.DateTimeField(auto_now=True)),
+                ('dentist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_locks', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dentist', 'date'), name='unique_booking_lock')],
+            },
+        ),
+        migrations.RunPython(create_overlap_constraint, drop_overlap_constraint),
+    ]
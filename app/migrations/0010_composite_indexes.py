@@ -0,0 +1,35 @@
+# Generated by Django 5.1.15 on 2026-10-17 20:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_bookinglock'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['dentist', 'date', 'status'], name='appt_dentist_date_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', '-date', '-start_time'], name='appt_patient_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['patient', '-payment_date', '-created_at'], name='payment_patient_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='treatment',
+            index=models.Index(fields=['patient', 'tooth', 'status'], name='treatment_patient_tooth_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='treatmenthistory',
+            index=models.Index(fields=['treatment', '-created_at'], name='history_treatment_created_idx'),
+        ),
+    ]
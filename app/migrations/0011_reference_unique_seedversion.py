@@ -0,0 +1,96 @@
+# Generated by Django 5.1.15 on 2026-10-17 21:41
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+QUADRANTS = {'Upper Right': 1, 'Upper Left': 2, 'Lower Left': 3, 'Lower Right': 4}
+POSITIONS = {
+    'Central Incisor': 1, 'Lateral Incisor': 2, 'Canine': 3, 'First Premolar': 4,
+    'Second Premolar': 5, 'First Molar': 6, 'Second Molar': 7, 'Third Molar': 8,
+}
+
+
+def renumber_legacy_teeth(apps, schema_editor):
+    # init_db.py used to number the teeth 1-32, counting quadrants 1 and 3
+    # from the third molar. Give those rows the two-digit numbers the chart
+    # and the reference seed use, so seeding updates them instead of adding
+    # a second set. A number already held by another tooth is left alone.
+    Tooth = apps.get_model('app', 'Tooth')
+    legacy = {}
+    for tooth in Tooth.objects.filter(number__lte=32):
+        quadrant = position = None
+        for side, side_quadrant in QUADRANTS.items():
+            if tooth.name.startswith(side + ' '):
+                quadrant, position = side_quadrant, POSITIONS.get(tooth.name[len(side) + 1:])
+        if position is None:
+            continue
+        legacy_position = 9 - position if quadrant in (1, 3) else position
+        if tooth.number == (quadrant - 1) * 8 + legacy_position:
+            legacy[tooth.pk] = (quadrant * 10 + position, quadrant, position)
+    taken = set(Tooth.objects.exclude(pk__in=legacy).values_list('number', flat=True))
+    for pk, (number, quadrant, position) in legacy.items():
+        if number not in taken:
+            Tooth.objects.filter(pk=pk).update(number=number, quadrant=quadrant, position=position)
+
+
+def merge_duplicates(model, field, same):
+    # Keep the oldest row for each value and move everything that points at
+    # the others onto it before they are deleted. Rows are only merged when
+    # the fields in same match too; anything else needs a person to decide
+    # which row is right, so the migration stops before changing anything.
+    duplicates = list(
+        model.objects.values(field).annotate(keep=Min('pk'), rows=Count('pk')).filter(rows__gt=1).order_by(field)
+    )
+    conflicts = []
+    for row in duplicates:
+        values = model.objects.filter(**{field: row[field]}).order_by().values_list(*same).distinct()
+        if values.count() > 1:
+            pks = model.objects.filter(**{field: row[field]}).order_by('pk').values_list('pk', flat=True)
+            conflicts.append(f"{field} {row[field]!r} (ids {', '.join(map(str, pks))})")
+    if conflicts:
+        raise RuntimeError(
+            f"Cannot make {model._meta.verbose_name} {field} unique: rows sharing a {field} differ in "
+            f"{', '.join(same)} for {'; '.join(conflicts)}. Fix or delete the extra rows and run migrate again."
+        )
+
+    for row in duplicates:
+        extra = list(model.objects.filter(**{field: row[field]}).exclude(pk=row['keep']).values_list('pk', flat=True))
+        for relation in model._meta.related_objects:
+            relation.related_model.objects.filter(
+                **{f'{relation.field.name}__in': extra}
+            ).update(**{relation.field.name: row['keep']})
+        model.objects.filter(pk__in=extra).delete()
+
+
+def merge_duplicate_reference_data(apps, schema_editor):
+    merge_duplicates(apps.get_model('app', 'Tooth'), 'number', ('name', 'quadrant', 'position'))
+    merge_duplicates(apps.get_model('app', 'ToothCondition'), 'name', ('description',))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeedVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('version', models.PositiveIntegerField()),
+                ('applied_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(renumber_legacy_teeth, migrations.RunPython.noop),
+        migrations.RunPython(merge_duplicate_reference_data, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='tooth',
+            constraint=models.UniqueConstraint(fields=('number',), name='unique_tooth_number'),
+        ),
+        migrations.AddConstraint(
+            model_name='toothcondition',
+            constraint=models.UniqueConstraint(fields=('name',), name='unique_tooth_condition_name'),
+        ),
+    ]
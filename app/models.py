@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from datetime import date
+import re
 
 # Create your models here.
 
@@ -41,12 +42,27 @@ class Patient(models.Model):
     drug_allergies = models.TextField(blank=True, null=True)
     previous_dental_work = models.TextField(blank=True, null=True)
     
+    # Digits of the phone number only, kept for indexed prefix search
+    phone_normalized = models.CharField(max_length=15, blank=True, default='', editable=False, db_index=True)
+    
     # System fields
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return self.name
+    
+    @staticmethod
+    def normalize_phone(phone):
+        """Strip everything but digits from a phone number"""
+        return re.sub(r'\D', '', phone or '')[:15]
+    
+    def save(self, *args, **kwargs):
+        self.phone_normalized = self.normalize_phone(self.phone)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'phone' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'phone_normalized'}
+        super().save(*args, **kwargs)
 
 class Appointment(models.Model):
     STATUS_CHOICES = [
@@ -94,6 +110,12 @@ class Appointment(models.Model):
     
     class Meta:
         ordering = ['-date', '-start_time']
+        indexes = [
+            # A dentist's bookings for a day (availability, booking, calendar)
+            models.Index(fields=['dentist', 'date', 'status'], name='appt_dentist_date_status_idx'),
+            # A patient's appointments, newest first
+            models.Index(fields=['patient', '-date', '-start_time'], name='appt_patient_date_idx'),
+        ]
 
 class Tooth(models.Model):
     # Using double-digit tooth numbering system
@@ -108,6 +130,9 @@ class Tooth(models.Model):
     
     class Meta:
         ordering = ['number']
+        constraints = [
+            models.UniqueConstraint(fields=['number'], name='unique_tooth_number'),
+        ]
 
 class ToothCondition(models.Model):
     name = models.CharField(max_length=100)
@@ -115,6 +140,11 @@ class ToothCondition(models.Model):
     
     def __str__(self):
         return self.name
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name'], name='unique_tooth_condition_name'),
+        ]
 
 class Treatment(models.Model):
     STATUS_CHOICES = [
@@ -139,6 +169,12 @@ class Treatment(models.Model):
     def __str__(self):
         tooth_info = f" - Tooth {self.tooth.number}" if self.tooth else ""
         return f"{self.patient.name}{tooth_info} - {self.condition.name}"
+    
+    class Meta:
+        indexes = [
+            # Dental chart counts and per-tooth treatment lists
+            models.Index(fields=['patient', 'tooth', 'status'], name='treatment_patient_tooth_idx'),
+        ]
 
 class TreatmentHistory(models.Model):
     """Model to track treatment status changes over time"""
@@ -157,6 +193,9 @@ class TreatmentHistory(models.Model):
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = "Treatment histories"
+        indexes = [
+            models.Index(fields=['treatment', '-created_at'], name='history_treatment_created_idx'),
+        ]
 
 class Payment(models.Model):
     """Model to track payments made by patients"""
@@ -182,6 +221,12 @@ class Payment(models.Model):
     def __str__(self):
         return f"Payment #{self.id} - {self.patient.name} - {self.payment_date}"
     
+    def save(self, *args, **kwargs):
+        # Keep the payment and the patient's running balance (updated by
+        # signals) in the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
     @property
     def balance(self):
         """Calculate the remaining balance for this payment"""
@@ -194,6 +239,10 @@ class Payment(models.Model):
     
     class Meta:
         ordering = ['-payment_date', '-created_at']
+        indexes = [
+            # A patient's payments in the default ordering
+            models.Index(fields=['patient', '-payment_date', '-created_at'], name='payment_patient_date_idx'),
+        ]
 
 class PaymentItem(models.Model):
     """Model to track individual line items within a payment"""
@@ -204,3 +253,42 @@ class PaymentItem(models.Model):
     
     def __str__(self):
         return f"{self.description} - ${self.amount}"
+
+class PatientBalance(models.Model):
+    """Running totals of a patient's payments, kept in step with the Payment table"""
+    patient = models.OneToOneField(Patient, on_delete=models.CASCADE, primary_key=True, related_name='balance')
+    total_billed = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    payment_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Balance for {self.patient.name}: {self.balance_due}"
+    
+    @property
+    def balance_due(self):
+        """Calculate the outstanding balance across all payments"""
+        return self.total_billed - self.total_paid
+
+class BookingLock(models.Model):
+    """One row per dentist and day, locked while an appointment on that day is booked"""
+    dentist = models.ForeignKey(User, on_delete=models.CASCADE, related_name='booking_locks')
+    date = models.DateField()
+    locked_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dentist', 'date'], name='unique_booking_lock'),
+        ]
+    
+    def __str__(self):
+        return f"Booking lock for {self.dentist.username} on {self.date}"
+
+class SeedVersion(models.Model):
+    """The version of each seed fixture last applied to this database"""
+    name = models.CharField(max_length=50, unique=True)
+    version = models.PositiveIntegerField()
+    applied_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} seed v{self.version}"
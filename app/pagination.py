@@ -0,0 +1,128 @@
+"""
+Keyset (cursor) pagination.
+
+Unlike OFFSET pagination, each page continues from the ordering values of
+the last row shown, so fetching a later page costs the same as the first
+one and rows inserted meanwhile do not shift the pages.
+"""
+import base64
+import binascii
+import datetime
+import json
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+class KeysetPage:
+    """One page of results with the cursor for the page after it."""
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """JSON encoder that keeps full microsecond precision, unlike DjangoJSONEncoder."""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    data = json.dumps(list(values), cls=CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, length):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, UnicodeError, ValueError):
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(values, list) or len(values) != length:
+        raise InvalidCursor('Invalid cursor')
+    return values
+
+
+def _field(model, path):
+    """Return the model field a (possibly related) ordering path points at."""
+    parts = path.split('__')
+    for part in parts[:-1]:
+        model = model._meta.get_field(part).related_model
+    return model._meta.get_field(parts[-1])
+
+
+def _cursor_values(model, ordering, values):
+    """Convert decoded cursor values to the types of their ordering fields."""
+    converted = []
+    for field, value in zip(ordering, values):
+        if value is None:
+            raise InvalidCursor('Invalid cursor')
+        try:
+            converted.append(_field(model, field.lstrip('-')).to_python(value))
+        except (TypeError, ValueError, ValidationError):
+            raise InvalidCursor('Invalid cursor')
+    return converted
+
+
+def _after(ordering, values):
+    """Build the filter selecting rows that sort after the given values."""
+    condition = Q()
+    for i, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        step = Q(**{f'{name}__{lookup}': values[i]})
+        for previous, value in zip(ordering[:i], values[:i]):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return condition
+
+
+def keyset_paginate(queryset, ordering, cursor=None, page_size=25):
+    """
+    Return a KeysetPage of queryset ordered by the given fields.
+
+    ordering fields must be non-nullable and the last one unique (usually
+    'id' or '-id') so the order is total. cursor is the next_cursor of the previous page, or None for the
+    first page. Raises InvalidCursor if the cursor is malformed or its
+    values do not fit the ordering fields.
+    """
+    ordering = list(ordering)
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        values = _cursor_values(queryset.model, ordering, decode_cursor(cursor, len(ordering)))
+        queryset = queryset.filter(_after(ordering, values))
+
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor(_resolve(last, field.lstrip('-')) for field in ordering)
+    return KeysetPage(items, next_cursor)
+
+
+def _resolve(obj, path):
+    for part in path.split('__'):
+        obj = getattr(obj, part)
+    return obj
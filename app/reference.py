@@ -0,0 +1,108 @@
+"""
+In-process cache of the dental reference tables (Tooth and ToothCondition).
+
+These tables hold a small, fixed set of rows that every chart render reads.
+They are loaded once per worker into immutable records and served from
+memory until a save or delete on either model invalidates the snapshot.
+
+Invalidation drops the snapshot in the process that made the change and
+bumps the shared REFERENCE_SCOPE version in the cache. Reads compare the
+snapshot with that version at most every REFERENCE_VERSION_CHECK_SECONDS,
+so other workers, and changes made by populate_teeth or the release job in
+another container, are picked up within that time (as long as the cache
+backend is shared, see CACHE_BACKEND). In between, reads run no queries
+and make no cache lookups, even on the db cache backend.
+"""
+import threading
+import time
+from django.conf import settings
+from collections import namedtuple
+from types import MappingProxyType
+from django.http import Http404
+from .caching import REFERENCE_SCOPE, get_version, bump_version
+from .models import Tooth, ToothCondition
+
+ToothRecord = namedtuple('ToothRecord', ['id', 'number', 'name', 'quadrant', 'position'])
+ConditionRecord = namedtuple('ConditionRecord', ['id', 'name', 'description'])
+
+ReferenceData = namedtuple('ReferenceData', [
+    'version',
+    'teeth',               # tuple of ToothRecord ordered by quadrant, position
+    'teeth_by_id',         # read-only mapping of id -> ToothRecord
+    'teeth_by_number',     # read-only mapping of number -> ToothRecord
+    'conditions',          # tuple of ConditionRecord in default ordering
+    'conditions_by_id',    # read-only mapping of id -> ConditionRecord
+])
+
+_lock = threading.Lock()
+_version = 0
+# (REFERENCE_SCOPE version the snapshot was loaded at, ReferenceData,
+#  time.monotonic() after which the version is checked again)
+_cached = None
+
+
+def _load(version):
+    teeth = tuple(
+        ToothRecord(*row) for row in Tooth.objects.order_by('quadrant', 'position').values_list(
+            'id', 'number', 'name', 'quadrant', 'position'
+        )
+    )
+    conditions = tuple(
+        ConditionRecord(*row) for row in ToothCondition.objects.order_by('id').values_list(
+            'id', 'name', 'description'
+        )
+    )
+    return ReferenceData(
+        version=version,
+        teeth=teeth,
+        teeth_by_id=MappingProxyType({t.id: t for t in teeth}),
+        teeth_by_number=MappingProxyType({t.number: t for t in teeth}),
+        conditions=conditions,
+        conditions_by_id=MappingProxyType({c.id: c for c in conditions}),
+    )
+
+
+def get_reference_data():
+    """Return the current ReferenceData snapshot, loading it if needed."""
+    cached = _cached
+    if cached is not None and time.monotonic() < cached[2]:
+        return cached[1]
+    return _rebuild(get_version(REFERENCE_SCOPE))
+
+
+def _rebuild(scope_version):
+    global _cached
+    check_at = time.monotonic() + getattr(settings, 'REFERENCE_VERSION_CHECK_SECONDS', 5)
+    with _lock:
+        if _cached is None or _cached[0] != scope_version:
+            _cached = (scope_version, _load(_version), check_at)
+        else:
+            _cached = (scope_version, _cached[1], check_at)
+        return _cached[1]
+
+
+def invalidate_reference_data():
+    """Discard the cached snapshot here and in every other process."""
+    global _cached, _version
+    with _lock:
+        _version += 1
+        _cached = None
+    bump_version(REFERENCE_SCOPE)
+
+
+def get_teeth():
+    """Return all teeth as ToothRecord tuples, ordered for the chart."""
+    return get_reference_data().teeth
+
+
+def get_conditions():
+    """Return all tooth conditions as ConditionRecord tuples."""
+    return get_reference_data().conditions
+
+
+def get_tooth_by_number_or_404(number):
+    """Look up a tooth by its two-digit number, raising Http404 if unknown."""
+    tooth = get_reference_data().teeth_by_number.get(number)
+    if tooth is None:
+        raise Http404('No tooth matches the given number.')
+    return tooth
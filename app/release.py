@@ -0,0 +1,78 @@
+"""
+Checks used by the release command to skip steps that are already done.
+
+* Migrations: the migrations on disk are compared with the ones recorded in
+  django_migrations (one query). Their fingerprint is a hash of the sorted
+  migration names, printed so releases can be compared.
+* Static files: the source files found by the staticfiles finders are
+  hashed (path and content) and the hash is written next to the collected
+  files. collectstatic is skipped while that hash is unchanged and, for a
+  manifest storage, the manifest written by the last run is still there.
+"""
+import hashlib
+import os
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db import connections
+from django.db.migrations.loader import MigrationLoader
+
+STATIC_HASH_FILE = '.source-hash'
+
+
+def _fingerprint(migrations):
+    digest = hashlib.sha256()
+    for app_label, name in sorted(migrations):
+        digest.update(f'{app_label}.{name}\n'.encode())
+    return digest.hexdigest()[:16]
+
+
+def migration_state(database='default'):
+    """
+    Return (disk fingerprint, pending migrations) for a database.
+
+    Pending migrations are (app_label, name) pairs on disk that have not been
+    applied; an empty list means migrate has nothing to do.
+    """
+    loader = MigrationLoader(connections[database], ignore_no_migrations=True)
+    disk = set(loader.disk_migrations)
+    pending = sorted(disk - set(loader.applied_migrations))
+    return _fingerprint(disk), pending
+
+
+def static_source_hash():
+    """Hash the path and content of every static source file."""
+    digest = hashlib.sha256()
+    files = {}
+    for finder in get_finders():
+        for path, storage in finder.list(['CVS', '.*', '*~']):
+            # The first finder to provide a path wins, as in collectstatic
+            files.setdefault(path, storage)
+    for path in sorted(files):
+        digest.update(path.encode() + b'\0')
+        with files[path].open(path) as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _static_root_file(name):
+    return os.path.join(settings.STATIC_ROOT, name)
+
+
+def collected_static_hash():
+    """Return the source hash recorded by the last collectstatic, or None."""
+    manifest_name = getattr(staticfiles_storage, 'manifest_name', None)
+    if manifest_name and not os.path.exists(_static_root_file(manifest_name)):
+        return None
+    try:
+        with open(_static_root_file(STATIC_HASH_FILE)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def record_static_hash(source_hash):
+    os.makedirs(settings.STATIC_ROOT, exist_ok=True)
+    with open(_static_root_file(STATIC_HASH_FILE), 'w') as f:
+        f.write(source_hash)
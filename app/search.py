@@ -0,0 +1,50 @@
+"""
+Patient search.
+
+Names are matched by substring ('contains' mode) or prefix ('prefix' mode).
+On PostgreSQL both are served by the trigram index created in migration
+0008; on SQLite they fall back to a scan, which stays cheap because results
+are always read one keyset page at a time. Phone numbers are matched by
+prefix on the digits-only phone_normalized column, which is a plain B-tree
+range scan on every database.
+"""
+import re
+from django.db.models import Q
+from .models import Patient
+
+SEARCH_MODES = ('contains', 'prefix')
+
+# Queries made only of these characters are treated as phone numbers
+PHONE_QUERY_RE = re.compile(r'[\d\s()+.-]+')
+
+
+def search_patients(query, mode='contains', queryset=None):
+    """
+    Filter patients by name, phone number or ID.
+
+    Returns an unordered queryset; use app.pagination.keyset_paginate to
+    read it page by page.
+    """
+    if queryset is None:
+        queryset = Patient.objects.all()
+    query = (query or '').strip()
+    if not query:
+        return queryset
+
+    if mode == 'prefix':
+        condition = Q(name__istartswith=query)
+    else:
+        condition = Q(name__icontains=query)
+
+    if PHONE_QUERY_RE.fullmatch(query):
+        digits = Patient.normalize_phone(query)
+        if digits:
+            # All stored values are digits, so every number starting with
+            # `digits` sorts between it and `digits` followed by ':' (the
+            # character after '9'). This keeps it a simple index range scan.
+            condition |= Q(phone_normalized__gte=digits, phone_normalized__lt=digits + ':')
+
+    if query.isdigit() and len(query) <= 18:
+        condition |= Q(id=int(query))
+
+    return queryset.filter(condition)
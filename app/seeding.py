@@ -0,0 +1,198 @@
+"""
+Initial data for a new installation: the default users, the teeth and the
+tooth conditions.
+
+The teeth and conditions come from versioned fixtures in seed_fixtures/,
+named reference-<version>.json; the highest version is the desired state.
+Seeding reads the current rows with one query, upserts only the rows that
+are missing or differ with bulk_create(update_conflicts=True) on the unique
+tooth number and condition name, and records the version applied. Rows that
+are not in the fixture are never deleted, so treatments pointing at them
+are safe.
+
+seed_is_complete() checks the users and the applied version with a single
+query, so a release on an already seeded database costs one round trip;
+seed() can be run any number of times.
+"""
+import json
+import os
+import re
+from collections import namedtuple
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from .models import UserProfile, Tooth, ToothCondition, SeedVersion
+from .reference import invalidate_reference_data
+
+SUPERUSER = ('admin', 'admin@example.com', 'admin123')
+
+# (username, email, password, first name, last name, role, phone, address)
+STAFF_USERS = (
+    ('dentist', 'dentist@example.com', 'dentist123', 'Doctor', 'Dentist', 'dentist', '1234567890', '123 Dentist Street'),
+    ('staff', 'staff@example.com', 'staff123', 'Staff', 'Member', 'staff', '9876543210', '456 Staff Avenue'),
+)
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), 'seed_fixtures')
+REFERENCE_SEED = 'reference'
+# Fixtures are named reference-NNNN.json, the version padded to four digits
+_FIXTURE_NAME = re.compile(r'^reference-(\d{4})\.json$')
+
+TOOTH_FIELDS = ('number', 'name', 'quadrant', 'position')
+CONDITION_FIELDS = ('name', 'description')
+
+# version: the fixture version
+# teeth: tuple of dicts with TOOTH_FIELDS keys
+# conditions: tuple of dicts with CONDITION_FIELDS keys
+ReferenceFixture = namedtuple('ReferenceFixture', ['version', 'teeth', 'conditions'])
+
+# teeth, conditions: the fixture rows that are missing or differ from the database
+ReferenceDiff = namedtuple('ReferenceDiff', ['teeth', 'conditions'])
+
+SEED_USERNAMES = (SUPERUSER[0],) + tuple(user[0] for user in STAFF_USERS)
+
+
+def seed_is_complete(fixture_dir=FIXTURE_DIR):
+    """Return whether the seed users exist and the latest reference fixture is applied, using one query."""
+    versions = fixture_versions(fixture_dir)
+    user_table = connection.ops.quote_name(User._meta.db_table)
+    seed_table = connection.ops.quote_name(SeedVersion._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(SEED_USERNAMES))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT (SELECT COUNT(*) FROM {user_table} WHERE username IN ({placeholders})), '
+            f'(SELECT version FROM {seed_table} WHERE name = %s)',
+            list(SEED_USERNAMES) + [REFERENCE_SEED]
+        )
+        users, version = cursor.fetchone()
+    return users == len(SEED_USERNAMES) and version == (versions[-1] if versions else None)
+
+
+def create_superuser(log=print):
+    """Create the admin superuser if it doesn't exist"""
+    username, email, password = SUPERUSER
+    if not User.objects.filter(username=username).exists():
+        user = User.objects.create_superuser(username=username, email=email, password=password)
+        log(f"Superuser created: {user.username}")
+    else:
+        log("Superuser already exists")
+
+
+def fixture_versions(fixture_dir=FIXTURE_DIR):
+    """Return the available reference fixture versions, in ascending order."""
+    versions = []
+    for filename in os.listdir(fixture_dir):
+        match = _FIXTURE_NAME.match(filename)
+        if match:
+            versions.append(int(match.group(1)))
+    return sorted(versions)
+
+
+def load_reference_fixture(version=None, fixture_dir=FIXTURE_DIR):
+    """Load a reference fixture; the latest one unless a version is given."""
+    versions = fixture_versions(fixture_dir)
+    if version is None:
+        if not versions:
+            raise ValueError(f'No reference fixtures in {fixture_dir}')
+        version = versions[-1]
+    elif version not in versions:
+        raise ValueError(f'No reference fixture version {version}')
+    with open(os.path.join(fixture_dir, f'reference-{version:04d}.json')) as f:
+        data = json.load(f)
+    return ReferenceFixture(
+        version=version,
+        teeth=tuple({field: tooth.get(field) for field in TOOTH_FIELDS} for tooth in data['teeth']),
+        conditions=tuple({field: condition.get(field) for field in CONDITION_FIELDS} for condition in data['conditions']),
+    )
+
+
+def diff_reference_data(fixture):
+    """Compare a fixture with the teeth and conditions in the database, using one query."""
+    tooth_table = connection.ops.quote_name(Tooth._meta.db_table)
+    condition_table = connection.ops.quote_name(ToothCondition._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT 1, number, name, quadrant, position, NULL FROM {tooth_table} '
+            f'UNION ALL '
+            f'SELECT 2, NULL, name, NULL, NULL, description FROM {condition_table}'
+        )
+        rows = cursor.fetchall()
+    
+    teeth = {}
+    conditions = {}
+    for kind, number, name, quadrant, position, description in rows:
+        if kind == 1:
+            teeth[number] = {'number': number, 'name': name, 'quadrant': quadrant, 'position': position}
+        else:
+            conditions[name] = {'name': name, 'description': description}
+    
+    return ReferenceDiff(
+        teeth=[tooth for tooth in fixture.teeth if teeth.get(tooth['number']) != tooth],
+        conditions=[condition for condition in fixture.conditions if conditions.get(condition['name']) != condition],
+    )
+
+
+def seed_reference_data(version=None, log=print, fixture_dir=FIXTURE_DIR):
+    """
+    Bring the teeth and conditions up to a fixture version and record it.
+    
+    Only the rows that are missing or differ are written; returns the
+    ReferenceDiff that was applied.
+    """
+    fixture = load_reference_fixture(version, fixture_dir)
+    with transaction.atomic():
+        diff = diff_reference_data(fixture)
+        if diff.teeth:
+            Tooth.objects.bulk_create(
+                [Tooth(**tooth) for tooth in diff.teeth],
+                update_conflicts=True,
+                unique_fields=['number'],
+                update_fields=['name', 'quadrant', 'position'],
+            )
+        if diff.conditions:
+            ToothCondition.objects.bulk_create(
+                [ToothCondition(**condition) for condition in diff.conditions],
+                update_conflicts=True,
+                unique_fields=['name'],
+                update_fields=['description'],
+            )
+        SeedVersion.objects.update_or_create(name=REFERENCE_SEED, defaults={'version': fixture.version})
+        
+        if diff.teeth or diff.conditions:
+            # bulk_create sends no signals, so drop the cached reference data
+            # in every worker, now and again once the rows are committed
+            invalidate_reference_data()
+            transaction.on_commit(invalidate_reference_data)
+    
+    log(
+        f"Reference data at version {fixture.version}: "
+        f"{len(diff.teeth)} teeth and {len(diff.conditions)} tooth conditions written"
+    )
+    return diff
+
+
+def create_staff_users(log=print):
+    """Create the default dentist and staff users if they don't exist"""
+    for username, email, password, first_name, last_name, role, phone, address in STAFF_USERS:
+        if User.objects.filter(username=username).exists():
+            log(f"{role.title()} user already exists")
+            continue
+        user = User.objects.create_user(
+            username=username,
+            email=email,
+            password=password,
+            first_name=first_name,
+            last_name=last_name
+        )
+        profile = UserProfile.objects.get(user=user)
+        profile.role = role
+        profile.phone = phone
+        profile.address = address
+        profile.save()
+        log(f"{role.title()} user created: {user.username}")
+
+
+def seed(log=print):
+    """Create whatever initial data is missing and bring the reference data up to date."""
+    with transaction.atomic():
+        create_superuser(log)
+        seed_reference_data(log=log)
+        create_staff_users(log)
@@ -1,7 +1,19 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile
+from .models import (
+    UserProfile, Patient, Tooth, ToothCondition, Payment, PaymentItem, Appointment, Treatment, TreatmentHistory
+)
+from .agenda import invalidate_appointment_lists, invalidate_dentist_names
+from .availability import invalidate_busy_intervals
+from .caching import invalidate_patients
+from .dashboard import invalidate_dentist_widgets
+from .reference import invalidate_reference_data
+from .ledger import apply_payment_change, to_decimal
+
+# User fields shown as a dentist's name on the appointment lists and feed
+USER_NAME_FIELDS = {'first_name', 'last_name', 'username'}
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -13,4 +25,126 @@ def save_user_profile(sender, instance, **kwargs):
     try:
         instance.profile.save()
     except UserProfile.DoesNotExist:
-        UserProfile.objects.create(user=instance) 
\ No newline at end of file
+        UserProfile.objects.create(user=instance) 
+
+@receiver([post_save, post_delete], sender=Tooth)
+@receiver([post_save, post_delete], sender=ToothCondition)
+def invalidate_reference_cache(sender, **kwargs):
+    # Drop the snapshot now and again once the change is committed, so a
+    # reload that raced with an open transaction cannot keep stale rows
+    # (this also bumps REFERENCE_SCOPE, dropping the cached fragments)
+    invalidate_reference_data()
+    transaction.on_commit(invalidate_reference_data)
+
+@receiver(pre_save, sender=Payment)
+def remember_previous_payment(sender, instance, raw=False, **kwargs):
+    # Keep the stored amounts so post_save can apply only the difference
+    instance._ledger_previous = None
+    instance._patient_previous = None
+    if instance.pk and not raw:
+        instance._ledger_previous = Payment.objects.filter(pk=instance.pk).values_list(
+            'patient_id', 'total_amount', 'amount_paid'
+        ).first()
+        if instance._ledger_previous:
+            instance._patient_previous = instance._ledger_previous[0]
+
+@receiver(post_save, sender=Payment)
+def update_balance_on_payment_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_ledger_previous', None)
+    if previous is None:
+        apply_payment_change(instance.patient_id, instance.total_amount, instance.amount_paid, 1)
+    elif previous[0] != instance.patient_id:
+        # Payment moved to another patient
+        apply_payment_change(previous[0], -previous[1], -previous[2], -1)
+        apply_payment_change(instance.patient_id, instance.total_amount, instance.amount_paid, 1)
+    else:
+        apply_payment_change(
+            instance.patient_id,
+            to_decimal(instance.total_amount) - previous[1],
+            to_decimal(instance.amount_paid) - previous[2],
+            0,
+        )
+    instance._ledger_previous = None
+
+@receiver(post_delete, sender=Payment)
+def update_balance_on_payment_delete(sender, instance, **kwargs):
+    apply_payment_change(
+        instance.patient_id,
+        -to_decimal(instance.total_amount),
+        -to_decimal(instance.amount_paid),
+        -1,
+    )
+
+@receiver(pre_save, sender=Appointment)
+def remember_previous_slot(sender, instance, raw=False, **kwargs):
+    # An appointment moved to another dentist or day frees its old slot too
+    instance._availability_previous = None
+    instance._patient_previous = None
+    if instance.pk and not raw:
+        previous = Appointment.objects.filter(pk=instance.pk).values_list(
+            'dentist_id', 'date', 'patient_id'
+        ).first()
+        if previous:
+            instance._availability_previous = previous[:2]
+            instance._patient_previous = previous[2]
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_dentist_day_caches(sender, instance, **kwargs):
+    dentist_days = {(instance.dentist_id, instance.date)}
+    previous = getattr(instance, '_availability_previous', None)
+    if previous:
+        dentist_days.add(previous)
+    instance._availability_previous = None
+
+    def invalidate():
+        for dentist_id, day in dentist_days:
+            invalidate_busy_intervals(dentist_id, day)
+            invalidate_dentist_widgets(dentist_id)
+
+    # As with the reference cache, drop the entries again after commit
+    invalidate()
+    transaction.on_commit(invalidate)
+
+@receiver([post_save, post_delete], sender=Appointment)
+@receiver([post_save, post_delete], sender=Patient)
+def invalidate_appointment_list_cache(sender, **kwargs):
+    # Cached list pages hold patient names, so any of these changes makes
+    # them stale
+    invalidate_appointment_lists()
+    transaction.on_commit(invalidate_appointment_lists)
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_dentist_name_caches(sender, update_fields=None, **kwargs):
+    # Cached list pages and the calendar feed ETags cover dentist names.
+    # Saves of other user fields, like the last_login update on every
+    # login, leave the names alone.
+    if update_fields is not None and not USER_NAME_FIELDS & set(update_fields):
+        return
+
+    def invalidate():
+        invalidate_appointment_lists()
+        invalidate_dentist_names()
+
+    invalidate()
+    transaction.on_commit(invalidate)
+
+@receiver([post_save, post_delete], sender=Appointment)
+@receiver([post_save, post_delete], sender=Treatment)
+@receiver([post_save, post_delete], sender=Payment)
+def invalidate_patient_fragments(sender, instance, **kwargs):
+    # Bump the patient's version so the cached patient_detail fragments are
+    # rendered again; a record moved to another patient stales both
+    previous = getattr(instance, '_patient_previous', None)
+    instance._patient_previous = None
+    invalidate_patients([instance.patient_id, previous])
+
+@receiver([post_save, post_delete], sender=TreatmentHistory)
+def invalidate_patient_fragments_for_history(sender, instance, **kwargs):
+    invalidate_patients([instance.treatment.patient_id])
+
+@receiver([post_save, post_delete], sender=PaymentItem)
+def invalidate_patient_fragments_for_item(sender, instance, **kwargs):
+    invalidate_patients([instance.payment.patient_id])
@@ -3,6 +3,8 @@ from django.contrib.auth.models import User
 from app.models import UserProfile, Patient, Tooth, ToothCondition
 import uuid
 from django.db import connections
+from django.core.cache import cache
+from app.reference import invalidate_reference_data
 
 
 @pytest.fixture(autouse=True)
@@ -16,6 +18,11 @@ def db_reset(django_db_setup, django_db_blocker):
                 for table in tables:
                     if table.startswith('app_') or table.startswith('auth_'):
                         cursor.execute(f"DELETE FROM {table}")
+    
+    # Raw deletes and test rollbacks do not send signals, so drop any
+    # reference data and availability cached by a previous test
+    invalidate_reference_data()
+    cache.clear()
 
 
 @pytest.fixture
@@ -1,7 +1,13 @@
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.urls import reverse
 from django.contrib.auth.models import User
-from app.models import UserProfile, Patient, Appointment
+from app.models import (
+    UserProfile, Patient, Appointment, Tooth,
+    ToothCondition, Treatment, TreatmentHistory
+)
+from app.reference import get_reference_data
 from datetime import date, time, datetime, timedelta
 import json
 import uuid
@@ -308,4 +314,147 @@ class TimeSlotAPITest(TestCase):
         data = json.loads(response.content)
         
         # Check that the response contains an error message
-        self.assertIn('error', data) 
\ No newline at end of file
+        self.assertIn('error', data)
+
+
+class ToothTreatmentsAPITest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        
+        # Create a dentist user with unique username
+        dentist_username = f"dentist_{uuid.uuid4().hex[:8]}"
+        self.dentist = User.objects.create_user(
+            username=dentist_username,
+            email=f'{dentist_username}@example.com',
+            password='dentistpassword',
+            first_name='Doctor',
+            last_name='Dentist'
+        )
+        self.dentist_profile = UserProfile.objects.get(user=self.dentist)
+        self.dentist_profile.role = 'dentist'
+        self.dentist_profile.save()
+        
+        self.patient = Patient.objects.create(
+            name='Test Patient',
+            age=30,
+            gender='M',
+            phone='1234567890'
+        )
+        self.appointment = Appointment.objects.create(
+            patient=self.patient,
+            dentist=self.dentist,
+            date=date.today(),
+            start_time=time(10, 0),
+            end_time=time(10, 30),
+            status='scheduled'
+        )
+        self.condition = ToothCondition.objects.create(name='Cavity')
+        self.tooth11 = Tooth.objects.create(number=11, name='Upper Right Central Incisor', quadrant=1, position=1)
+        self.tooth12 = Tooth.objects.create(number=12, name='Upper Right Lateral Incisor', quadrant=1, position=2)
+        
+        # Login
+        self.client.login(username=self.dentist.username, password='dentistpassword')
+    
+    def _add_treatment(self, tooth, history_count=2):
+        treatment = Treatment.objects.create(
+            patient=self.patient,
+            tooth=tooth,
+            condition=self.condition,
+            appointment=self.appointment,
+            description='Filling',
+            status='planned'
+        )
+        for _ in range(history_count):
+            TreatmentHistory.objects.create(
+                treatment=treatment,
+                previous_status='planned',
+                new_status='in_progress',
+                appointment=self.appointment,
+                dentist=self.dentist
+            )
+        return treatment
+    
+    def test_single_tooth_payload(self):
+        """Test that the single tooth response includes treatments and history"""
+        self._add_treatment(self.tooth11)
+        
+        response = self.client.get(
+            reverse('get_tooth_treatments', kwargs={'tooth_id': 11}),
+            {'patient_id': self.patient.id}
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(data['tooth_id'], 11)
+        self.assertEqual(len(data['treatments']), 1)
+        
+        treatment = data['treatments'][0]
+        self.assertEqual(treatment['condition_name'], 'Cavity')
+        self.assertEqual(treatment['status_display'], 'Planned')
+        self.assertEqual(treatment['appointment_id'], self.appointment.id)
+        self.assertEqual(len(treatment['history']), 2)
+        self.assertEqual(treatment['history'][0]['dentist'], 'Doctor Dentist')
+        self.assertEqual(treatment['history'][0]['new_status_display'], 'In Progress')
+    
+    def test_condition_missing_from_reference_data(self):
+        """Test that a condition added after the reference data was loaded is shown as Unknown"""
+        get_reference_data()
+        # bulk_create sends no signals, so the loaded reference data stays
+        ToothCondition.objects.bulk_create([ToothCondition(name='Abscess')])
+        condition = ToothCondition.objects.get(name='Abscess')
+        Treatment.objects.create(patient=self.patient, tooth=self.tooth11, condition=condition, description='Drain')
+        
+        response = self.client.get(reverse('get_tooth_treatments', kwargs={'tooth_id': 11}))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['treatments'][0]['condition_name'], 'Unknown')
+    
+    def test_multi_tooth_mode(self):
+        """Test that several teeth can be fetched in one request"""
+        self._add_treatment(self.tooth11)
+        self._add_treatment(self.tooth12)
+        self._add_treatment(self.tooth12)
+        
+        response = self.client.get(
+            reverse('get_teeth_treatments'),
+            {'teeth': '11,12', 'patient_id': self.patient.id}
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual([t['tooth_id'] for t in data['teeth']], [11, 12])
+        self.assertEqual(len(data['teeth'][0]['treatments']), 1)
+        self.assertEqual(len(data['teeth'][1]['treatments']), 2)
+    
+    def test_multi_tooth_mode_invalid_parameters(self):
+        """Test that missing, malformed or unknown tooth numbers are rejected"""
+        response = self.client.get(reverse('get_teeth_treatments'))
+        self.assertEqual(response.status_code, 400)
+        
+        response = self.client.get(reverse('get_teeth_treatments'), {'teeth': '11,abc'})
+        self.assertEqual(response.status_code, 400)
+        
+        response = self.client.get(reverse('get_teeth_treatments'), {'teeth': '11,99'})
+        self.assertEqual(response.status_code, 404)
+    
+    def test_query_count_is_constant(self):
+        """Test that the endpoint does not query per treatment or history row"""
+        url = reverse('get_teeth_treatments')
+        params = {'teeth': '11,12', 'patient_id': self.patient.id}
+        self._add_treatment(self.tooth11, history_count=1)
+        
+        # Warm the reference data cache
+        self.client.get(url, params)
+        
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url, params)
+        
+        for _ in range(5):
+            self._add_treatment(self.tooth11, history_count=3)
+            self._add_treatment(self.tooth12, history_count=3)
+        
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url, params)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(few), len(many))
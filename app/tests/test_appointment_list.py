@@ -0,0 +1,153 @@
+from datetime import date, time, timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.db.models import Model
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from django.contrib.auth.models import User
+from app.models import UserProfile, Patient, Appointment
+from app.pagination import encode_cursor
+from app.views import APPOINTMENT_PAGE_SIZE
+import uuid
+
+
+class AppointmentListTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.dentist = User.objects.create_user(
+            username=f'dentist_{uuid.uuid4().hex[:8]}',
+            password='password123',
+            first_name='List',
+            last_name='Dentist'
+        )
+        profile = UserProfile.objects.get(user=self.dentist)
+        profile.role = 'dentist'
+        profile.save()
+        self.client.login(username=self.dentist.username, password='password123')
+        self.patient = Patient.objects.create(name='List Patient', age=35, gender='F', phone='5550007777')
+        self.start = date(2030, 4, 1)
+
+    def book(self, count, status='scheduled'):
+        for i in range(count):
+            Appointment.objects.create(
+                patient=self.patient,
+                dentist=self.dentist,
+                date=self.start + timedelta(days=i % 5),
+                start_time=time(9 + i % 8, 0),
+                end_time=time(9 + i % 8, 30),
+                status=status
+            )
+
+    def get(self, **params):
+        return self.client.get(reverse('appointment_list'), params)
+
+    def test_date_range_filter(self):
+        """Test that appointments are filtered by a date range"""
+        self.book(10)
+        response = self.get(date_from='2030-04-02', date_to='2030-04-03', status='scheduled')
+        dates = {appointment.date for appointment in response.context['appointments']}
+        self.assertEqual(dates, {date(2030, 4, 2), date(2030, 4, 3)})
+
+    def test_empty_filters_mean_all(self):
+        """Test that empty date and status filters show every appointment"""
+        self.book(3)
+        self.book(2, status='cancelled')
+        response = self.get(date_from='', date_to='', status='', dentist='')
+        self.assertEqual(len(response.context['appointments']), 5)
+
+    def test_pages_are_in_schedule_order(self):
+        """Test walking every page returns each appointment once, by date and time"""
+        self.book(APPOINTMENT_PAGE_SIZE + 7)
+        params = {'date_from': '', 'date_to': '', 'status': ''}
+        seen = []
+        response = self.get(**params)
+        seen.extend(response.context['appointments'])
+        next_cursor = response.context['next_cursor']
+        self.assertIsNotNone(next_cursor)
+        response = self.get(after=next_cursor, **params)
+        seen.extend(response.context['appointments'])
+        self.assertIsNone(response.context['next_cursor'])
+
+        self.assertEqual(len(seen), APPOINTMENT_PAGE_SIZE + 7)
+        keys = [(a.date, a.start_time, a.id) for a in seen]
+        self.assertEqual(keys, sorted(keys))
+
+    def test_query_count_is_constant(self):
+        """Test that the number of queries does not grow with the rows on a page"""
+        params = {'date_from': '', 'date_to': '', 'status': ''}
+        self.book(1)
+        with CaptureQueriesContext(connection) as small:
+            self.get(**params)
+        self.book(30)
+        with CaptureQueriesContext(connection) as large:
+            response = self.get(**params)
+        self.assertEqual(len(response.context['appointments']), 31)
+        self.assertEqual(len(large), len(small))
+
+    def test_pages_are_cached_until_appointments_change(self):
+        """Test that a repeated filter combination is served from the cache"""
+        self.book(3)
+        params = {'date_from': '2030-04-01', 'date_to': '2030-04-30', 'status': 'scheduled'}
+        with CaptureQueriesContext(connection) as first:
+            self.get(**params)
+        with CaptureQueriesContext(connection) as second:
+            response = self.get(**params)
+        self.assertEqual(len(second), len(first) - 1)
+        self.assertEqual(len(response.context['appointments']), 3)
+
+        # Saving an appointment invalidates the cached page
+        self.book(1)
+        response = self.get(**params)
+        self.assertEqual(len(response.context['appointments']), 4)
+
+        # So does renaming a patient shown on it
+        self.patient.name = 'Renamed'
+        self.patient.save()
+        self.assertContains(self.get(**params), 'Renamed')
+
+    def test_invalid_cursor_shows_first_page(self):
+        """Test that a malformed cursor falls back to the first page"""
+        self.book(2)
+        response = self.get(after='not-a-cursor', date_from='', date_to='', status='')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['is_first_page'])
+        self.assertEqual(len(response.context['appointments']), 2)
+
+    def test_cursor_with_wrong_types_shows_first_page(self):
+        """Test that a well-formed cursor with values of the wrong types falls back to the first page"""
+        self.book(2)
+        cursor = encode_cursor(['April', '25:99', 'y'])
+        response = self.get(after=cursor, date_from='', date_to='', status='')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['is_first_page'])
+        self.assertEqual(len(response.context['appointments']), 2)
+
+    def test_cached_pages_hold_no_user_rows(self):
+        """Test that a cached page stores the shown values, not the dentist's user row"""
+        self.book(1)
+        with mock.patch('app.agenda.cache.set', wraps=cache.set) as cache_set:
+            response = self.get(date_from='', date_to='', status='')
+        page = cache_set.call_args.args[1]
+        row = page.items[0]
+        self.assertIsInstance(row, tuple)
+        self.assertFalse([value for value in row if isinstance(value, (Model, User))])
+        self.assertNotIn(self.dentist.password, row)
+        self.assertContains(response, 'List Dentist')
+        self.assertContains(response, 'List Patient')
+
+    def test_login_keeps_pages_cached(self):
+        """Test that the last_login update of a login does not invalidate the cached pages"""
+        self.book(1)
+        params = {'date_from': '', 'date_to': '', 'status': ''}
+        self.get(**params)
+        self.client.login(username=self.dentist.username, password='password123')
+        with CaptureQueriesContext(connection) as queries:
+            self.get(**params)
+        self.assertFalse([q for q in queries.captured_queries if 'app_appointment' in q['sql']])
+
+        # Renaming the dentist does
+        self.dentist.first_name = 'Renamed'
+        self.dentist.save(update_fields=['first_name'])
+        self.assertContains(self.get(**params), 'Renamed Dentist')
@@ -0,0 +1,97 @@
+from asyncio import iscoroutinefunction
+from asgiref.sync import sync_to_async
+from datetime import date, time, timedelta
+from decimal import Decimal
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth.models import User
+from app import views
+from app.availability import aget_day_slots, get_day_slots
+from app.health import health_check
+from app.ledger import PatientFinancials
+from app.models import UserProfile, Patient, Appointment, Tooth, ToothCondition, Treatment, Payment
+import uuid
+
+
+class AsyncApiViewsTest(TestCase):
+    def setUp(self):
+        self.dentist = User.objects.create_user(
+            username=f'dentist_{uuid.uuid4().hex[:8]}',
+            password='password123',
+            first_name='Async',
+            last_name='Dentist'
+        )
+        profile = UserProfile.objects.get(user=self.dentist)
+        profile.role = 'dentist'
+        profile.save()
+
+        self.patient = Patient.objects.create(
+            name='Async Patient', age=33, gender='F', phone='5550006601', chief_complaint='Sensitive molar'
+        )
+        self.day = date.today() + timedelta(days=1)
+        Appointment.objects.create(
+            patient=self.patient,
+            dentist=self.dentist,
+            date=self.day,
+            start_time=time(9, 0),
+            end_time=time(10, 0),
+            status='scheduled',
+            notes='Chief complaint: chipped incisor'
+        )
+        self.tooth = Tooth.objects.create(number=11, name='Upper Right Central Incisor', quadrant=1, position=1)
+        condition = ToothCondition.objects.create(name='Chip', description='Chipped enamel')
+        Treatment.objects.create(
+            patient=self.patient, tooth=self.tooth, condition=condition,
+            description='Bonding', status='planned', cost=Decimal('250.00')
+        )
+        Payment.objects.create(
+            patient=self.patient, total_amount=Decimal('250.00'), amount_paid=Decimal('100.00'), created_by=self.dentist
+        )
+
+    def test_json_endpoints_are_async(self):
+        """Test that the JSON endpoints are coroutine views"""
+        for view in (views.get_time_slots, views.get_patient_balance, views.get_patient_complaints,
+                     views.get_tooth_treatments, health_check):
+            self.assertTrue(iscoroutinefunction(view), view.__name__)
+
+    async def test_async_client_requests(self):
+        """Test that the async endpoints answer through the async client"""
+        await self.async_client.aforce_login(self.dentist)
+
+        response = await self.async_client.get(reverse('get_time_slots'), {
+            'dentist': self.dentist.id, 'date': self.day.isoformat()
+        })
+        slots = {slot['time']: slot['available'] for slot in response.json()['time_slots']}
+        self.assertFalse(slots['09:00'])
+        self.assertTrue(slots['10:00'])
+
+        response = await self.async_client.get(reverse('get_patient_balance', args=[self.patient.id]))
+        self.assertEqual(response.json()['balance_due'], 150.0)
+
+        response = await self.async_client.get(reverse('get_patient_complaints', args=[self.patient.id]))
+        self.assertEqual(response.json()['complaints'], ['Sensitive molar', 'Chief complaint: chipped incisor'])
+
+        response = await self.async_client.get(reverse('get_tooth_treatments', args=[11]))
+        self.assertEqual(response.json()['treatments'][0]['description'], 'Bonding')
+
+        response = await self.async_client.get(reverse('get_tooth_treatments', args=[99]))
+        self.assertEqual(response.status_code, 404)
+
+        response = await self.async_client.get(reverse('health_check'))
+        self.assertEqual(response.json()['status'], 'ok')
+
+    async def test_async_endpoints_require_login(self):
+        """Test that the async endpoints still redirect anonymous users"""
+        response = await self.async_client.get(reverse('get_patient_balance', args=[self.patient.id]))
+        self.assertEqual(response.status_code, 302)
+
+    async def test_async_helpers_match_sync(self):
+        """Test that the async ledger and slot helpers return the sync results"""
+        self.assertEqual(
+            await PatientFinancials.afor_patient(self.patient),
+            await sync_to_async(PatientFinancials.for_patient)(self.patient)
+        )
+        self.assertEqual(
+            await aget_day_slots(self.dentist.id, self.day),
+            await sync_to_async(get_day_slots)(self.dentist.id, self.day)
+        )
@@ -0,0 +1,233 @@
+from datetime import date, datetime, time, timedelta
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.contrib.auth.models import User
+from app.models import UserProfile, Patient, Appointment
+from app.availability import (
+    merge_intervals, is_free, build_slots, get_day_slots, find_conflict,
+    get_busy_intervals, find_free_slots,
+)
+import json
+import uuid
+
+
+class SlotMathTest(TestCase):
+    def test_merge_intervals(self):
+        """Test that overlapping and touching intervals are merged"""
+        merged = merge_intervals([(600, 630), (540, 570), (560, 600), (700, 720)])
+        self.assertEqual(merged, [(540, 630), (700, 720)])
+
+    def test_is_free(self):
+        """Test the binary-search free check against merged intervals"""
+        merged = [(540, 600), (660, 720)]
+        self.assertTrue(is_free(merged, 600, 660))
+        self.assertFalse(is_free(merged, 590, 610))
+        self.assertFalse(is_free(merged, 700, 710))
+        self.assertTrue(is_free(merged, 720, 780))
+        self.assertTrue(is_free([], 0, 30))
+
+    def test_build_slots_marks_overlaps(self):
+        """Test that every slot overlapping a booking is unavailable"""
+        # 10:15 - 11:00 blocks the 10:00 and 10:30 slots
+        slots = build_slots([(615, 660)])
+        self.assertEqual(len(slots), 16)
+        self.assertEqual(slots[0].start, time(9, 0))
+        self.assertEqual(slots[-1].end, time(17, 0))
+        busy = [slot.start for slot in slots if not slot.available]
+        self.assertEqual(busy, [time(10, 0), time(10, 30)])
+
+    def test_custom_hours_and_length(self):
+        """Test that working hours and slot length can be overridden"""
+        slots = build_slots([], day_start=time(8, 0), day_end=time(10, 0), slot_minutes=15)
+        self.assertEqual(len(slots), 8)
+        self.assertEqual(slots[1].start, time(8, 15))
+
+    @override_settings(CLINIC_DAY_START=time(10, 0), CLINIC_DAY_END=time(12, 0), APPOINTMENT_SLOT_MINUTES=60)
+    def test_hours_from_settings(self):
+        """Test that the default working hours come from settings"""
+        slots = build_slots([])
+        self.assertEqual([slot.start for slot in slots], [time(10, 0), time(11, 0)])
+
+
+class DentistAvailabilityTest(TestCase):
+    def setUp(self):
+        self.dentist = User.objects.create_user(
+            username=f'dentist_{uuid.uuid4().hex[:8]}',
+            password='password123',
+            first_name='Avail',
+            last_name='Dentist'
+        )
+        profile = UserProfile.objects.get(user=self.dentist)
+        profile.role = 'dentist'
+        profile.save()
+
+        self.patient = Patient.objects.create(name='Slot Patient', age=30, gender='M', phone='5550001111')
+        self.day = date(2030, 1, 7)
+        self.booking = Appointment.objects.create(
+            patient=self.patient,
+            dentist=self.dentist,
+            date=self.day,
+            start_time=time(10, 0),
+            end_time=time(11, 0),
+            status='scheduled'
+        )
+        # Cancelled appointments do not block the dentist
+        Appointment.objects.create(
+            patient=self.patient,
+            dentist=self.dentist,
+            date=self.day,
+            start_time=time(14, 0),
+            end_time=time(15, 0),
+            status='cancelled'
+        )
+
+    def test_day_slots_use_one_query(self):
+        """Test that a dentist's day is read with a single query"""
+        with self.assertNumQueries(1):
+            slots = get_day_slots(self.dentist.id, self.day)
+        busy = [slot.start for slot in slots if not slot.available]
+        self.assertEqual(busy, [time(10, 0), time(10, 30)])
+
+    def test_day_slots_exclude_appointment(self):
+        """Test that an appointment being edited does not block itself"""
+        slots = get_day_slots(self.dentist.id, self.day, exclude_id=self.booking.pk)
+        self.assertTrue(all(slot.available for slot in slots))
+
+    def test_find_conflict(self):
+        """Test overlap detection against scheduled appointments only"""
+        self.assertEqual(find_conflict(self.dentist.id, self.day, time(10, 30), time(11, 30)), time(10, 0))
+        self.assertIsNone(find_conflict(self.dentist.id, self.day, time(11, 0), time(12, 0)))
+        self.assertIsNone(find_conflict(self.dentist.id, self.day, time(14, 0), time(15, 0)))
+        self.assertIsNone(
+            find_conflict(self.dentist.id, self.day, time(10, 30), time(11, 30), exclude_id=self.booking.pk)
+        )
+
+    def test_time_slots_api(self):
+        """Test that the time slot API reports the same availability"""
+        client = Client()
+        client.login(username=self.dentist.username, password='password123')
+        response = client.get(reverse('get_time_slots'), {
+            'dentist': self.dentist.id,
+            'date': self.day.strftime('%Y-%m-%d'),
+            'selected_time': '09:30',
+        })
+        self.assertEqual(response.status_code, 200)
+        slots = json.loads(response.content)['time_slots']
+        self.assertEqual([slot['time'] for slot in slots if not slot['available']], ['10:00', '10:30'])
+        self.assertEqual([slot['time'] for slot in slots if slot['selected']], ['09:30'])
+
+        response = client.get(reverse('get_time_slots'), {
+            'dentist': self.dentist.id,
+            'date': self.day.strftime('%Y-%m-%d'),
+            'appointment_id': self.booking.pk,
+        })
+        slots = json.loads(response.content)['time_slots']
+        self.assertTrue(all(slot['available'] for slot in slots))
+
+
+class AvailabilitySearchTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.dentists = []
+        for name in ('First', 'Second'):
+            dentist = User.objects.create_user(
+                username=f'dentist_{uuid.uuid4().hex[:8]}',
+                password='password123',
+                first_name=name,
+                last_name='Dentist'
+            )
+            profile = UserProfile.objects.get(user=dentist)
+            profile.role = 'dentist'
+            profile.save()
+            self.dentists.append(dentist)
+        self.client.login(username=self.dentists[0].username, password='password123')
+
+        self.patient = Patient.objects.create(name='Search Patient', age=40, gender='F', phone='5550002222')
+        self.day = date(2030, 1, 7)
+        cache.clear()
+
+    def book(self, dentist, day, start, end):
+        return Appointment.objects.create(
+            patient=self.patient,
+            dentist=dentist,
+            date=day,
+            start_time=start,
+            end_time=end,
+            status='scheduled'
+        )
+
+    def test_earliest_slots_across_dentists(self):
+        """Test that free slots are ordered by date, time and dentist"""
+        first, second = self.dentists
+        self.book(first, self.day, time(9, 0), time(10, 0))
+        slots = find_free_slots(self.day, self.day, [first.id, second.id], duration=60, limit=3)
+        self.assertEqual(
+            [(slot.dentist_id, slot.start) for slot in slots],
+            [(second.id, time(9, 0)), (second.id, time(9, 30)), (first.id, time(10, 0))],
+        )
+
+    def test_search_spans_days(self):
+        """Test that a fully booked day moves the search to the next day"""
+        first = self.dentists[0]
+        self.book(first, self.day, time(9, 0), time(17, 0))
+        slots = find_free_slots(self.day, self.day + timedelta(days=2), [first.id], limit=1)
+        self.assertEqual(slots[0].date, self.day + timedelta(days=1))
+        self.assertEqual(slots[0].start, time(9, 0))
+
+    def test_not_before_skips_past_slots(self):
+        """Test that slots before the given moment are not offered"""
+        first = self.dentists[0]
+        slots = find_free_slots(
+            self.day, self.day, [first.id], limit=1, not_before=datetime(2030, 1, 7, 10, 5)
+        )
+        self.assertEqual(slots[0].start, time(10, 30))
+
+    def test_busy_intervals_are_cached_and_invalidated(self):
+        """Test that dentist-days are cached and dropped when appointments change"""
+        first, second = self.dentists
+        days = [self.day, self.day + timedelta(days=1)]
+        with self.assertNumQueries(1):
+            get_busy_intervals([first.id, second.id], days)
+        with self.assertNumQueries(0):
+            get_busy_intervals([first.id, second.id], days)
+
+        appointment = self.book(first, self.day, time(9, 0), time(10, 0))
+        busy = get_busy_intervals([first.id, second.id], days)
+        self.assertEqual(busy[(first.id, self.day)], [(540, 600)])
+
+        # Moving the appointment refreshes both the old and the new dentist-day
+        appointment.dentist = second
+        appointment.date = days[1]
+        appointment.save()
+        busy = get_busy_intervals([first.id, second.id], days)
+        self.assertEqual(busy[(first.id, self.day)], [])
+        self.assertEqual(busy[(second.id, days[1])], [(540, 600)])
+
+        appointment.delete()
+        self.assertEqual(get_busy_intervals([second.id], [days[1]])[(second.id, days[1])], [])
+
+    def test_availability_api(self):
+        """Test the availability endpoint filters by dentist and duration"""
+        first, second = self.dentists
+        self.book(second, self.day, time(9, 0), time(12, 0))
+        response = self.client.get(reverse('availability_search'), {
+            'start': self.day.strftime('%Y-%m-%d'),
+            'end': self.day.strftime('%Y-%m-%d'),
+            'dentist': second.id,
+            'duration': 90,
+            'limit': 2,
+        })
+        self.assertEqual(response.status_code, 200)
+        slots = json.loads(response.content)['slots']
+        self.assertEqual([(s['dentist_id'], s['start'], s['end']) for s in slots],
+                         [(second.id, '12:00', '13:30'), (second.id, '12:30', '14:00')])
+        self.assertEqual(slots[0]['dentist_name'], 'Second Dentist')
+
+    def test_availability_api_validation(self):
+        """Test that bad parameters return 400"""
+        url = reverse('availability_search')
+        self.assertEqual(self.client.get(url, {'start': 'bad'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': '2030-01-07', 'end': '2030-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': '2030-01-01', 'end': '2030-06-01'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'duration': 'x'}).status_code, 400)
@@ -0,0 +1,150 @@
+from datetime import date, time
+import threading
+from django.test import TestCase, TransactionTestCase, Client
+from django.urls import reverse
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connection
+from app.models import UserProfile, Patient, Appointment, BookingLock
+from app.booking import BookingConflict, book_appointment
+from types import SimpleNamespace
+from unittest import mock
+import uuid
+
+
+def integrity_error(constraint):
+    # Shaped like a PostgreSQL error: the driver's exception carries the
+    # name of the violated constraint
+    cause = Exception(f'violates constraint "{constraint}"')
+    cause.diag = SimpleNamespace(constraint_name=constraint)
+    error = IntegrityError(*cause.args)
+    error.__cause__ = cause
+    return error
+
+
+def create_dentist(first_name='Book'):
+    dentist = User.objects.create_user(
+        username=f'dentist_{uuid.uuid4().hex[:8]}',
+        password='password123',
+        first_name=first_name,
+        last_name='Dentist'
+    )
+    profile = UserProfile.objects.get(user=dentist)
+    profile.role = 'dentist'
+    profile.save()
+    return dentist
+
+
+class BookAppointmentTest(TestCase):
+    def setUp(self):
+        self.dentist = create_dentist()
+        self.patient = Patient.objects.create(name='Booking Patient', age=33, gender='F', phone='5550003333')
+        self.day = date(2030, 2, 4)
+
+    def new_appointment(self, start, end, **kwargs):
+        return Appointment(
+            patient=self.patient,
+            dentist=kwargs.pop('dentist', self.dentist),
+            date=self.day,
+            start_time=start,
+            end_time=end,
+            status=kwargs.pop('status', 'scheduled'),
+        )
+
+    def test_books_free_slot(self):
+        """Test that a free slot is saved and the dentist-day lock row created"""
+        appointment = book_appointment(self.new_appointment(time(9, 0), time(10, 0)))
+        self.assertIsNotNone(appointment.pk)
+        self.assertTrue(BookingLock.objects.filter(dentist=self.dentist, date=self.day).exists())
+
+    def test_only_overlap_constraint_means_conflict(self):
+        """Test that only the exclusion constraint is reported as a double booking"""
+        appointment = self.new_appointment(time(9, 0), time(10, 0))
+        with mock.patch.object(Appointment, 'save', side_effect=integrity_error('app_appointment_no_overlap')):
+            with self.assertRaises(BookingConflict):
+                book_appointment(appointment)
+
+        with mock.patch.object(Appointment, 'save', side_effect=integrity_error('app_appointment_patient_id_fkey')):
+            with self.assertRaises(IntegrityError):
+                book_appointment(appointment)
+
+    def test_overlap_raises_conflict(self):
+        """Test that an overlapping booking is rejected without saving"""
+        book_appointment(self.new_appointment(time(9, 0), time(10, 0)))
+        with self.assertRaises(BookingConflict) as ctx:
+            book_appointment(self.new_appointment(time(9, 30), time(10, 30)))
+        self.assertEqual(ctx.exception.conflict_start, time(9, 0))
+        self.assertIn('09:00 AM', str(ctx.exception))
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_other_dentist_and_cancelled_do_not_conflict(self):
+        """Test that only the same dentist's scheduled appointments conflict"""
+        book_appointment(self.new_appointment(time(9, 0), time(10, 0)))
+        book_appointment(self.new_appointment(time(9, 0), time(10, 0), dentist=create_dentist('Other')))
+        book_appointment(self.new_appointment(time(9, 0), time(10, 0), status='cancelled'))
+        self.assertEqual(Appointment.objects.count(), 3)
+
+    def test_rescheduling_cancelled_appointment_checks_overlap(self):
+        """Test that changing a cancelled appointment back to scheduled is checked"""
+        book_appointment(self.new_appointment(time(9, 0), time(10, 0)))
+        cancelled = book_appointment(self.new_appointment(time(9, 0), time(10, 0), status='cancelled'))
+
+        client = Client()
+        client.login(username=self.dentist.username, password='password123')
+        client.post(reverse('appointment_status_update', args=[cancelled.pk]), {'status': 'scheduled'})
+        cancelled.refresh_from_db()
+        self.assertEqual(cancelled.status, 'cancelled')
+
+    def test_update_keeps_own_slot(self):
+        """Test that moving an appointment within its own time is not a conflict"""
+        appointment = book_appointment(self.new_appointment(time(9, 0), time(10, 0)))
+        appointment.end_time = time(10, 30)
+        book_appointment(appointment)
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.end_time, time(10, 30))
+
+
+class ConcurrentBookingTest(TransactionTestCase):
+    def setUp(self):
+        self.dentist = create_dentist()
+        self.patient = Patient.objects.create(name='Race Patient', age=50, gender='M', phone='5550004444')
+        self.day = date(2030, 2, 5)
+
+    def test_no_double_booking_under_contention(self):
+        """Test that concurrent bookings of overlapping slots leave no overlaps"""
+        threads = 8
+        barrier = threading.Barrier(threads)
+        results = []
+        errors = []
+
+        def worker(i):
+            try:
+                barrier.wait()
+                # Every attempt overlaps the others (9:00-10:00 shifted by up to 35 min)
+                start_minute = 5 * i
+                appointment = Appointment(
+                    patient_id=self.patient.pk,
+                    dentist_id=self.dentist.pk,
+                    date=self.day,
+                    start_time=time(9, start_minute),
+                    end_time=time(10, start_minute),
+                    status='scheduled',
+                )
+                book_appointment(appointment)
+                results.append('booked')
+            except BookingConflict:
+                results.append('conflict')
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(results.count('booked'), 1)
+        self.assertEqual(results.count('conflict'), threads - 1)
+        self.assertEqual(Appointment.objects.filter(dentist=self.dentist, date=self.day).count(), 1)
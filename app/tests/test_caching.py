@@ -0,0 +1,81 @@
+from datetime import date, time
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.contrib.auth.models import User
+from app.models import UserProfile, Patient, Appointment
+from app import caching
+from app.availability import get_busy_intervals
+import uuid
+
+
+class CacheHelpersTest(TestCase):
+    def setUp(self):
+        caching.reset_stats()
+
+    def test_make_key(self):
+        """Test that keys are namespaced"""
+        self.assertEqual(caching.make_key('ns', 1, 'a'), 'ns:1:a')
+        self.assertEqual(caching.dentist_day_scope(3, date(2030, 1, 2)), 'dentist-day:3:2030-01-02')
+
+    def test_bumping_a_scope_makes_its_keys_stale(self):
+        """Test versioned invalidation of one scope leaves others alone"""
+        first = caching.versioned_key('test', caching.patient_scope(1), 'chart')
+        other = caching.versioned_key('test', caching.patient_scope(2), 'chart')
+        cache.set(first, 'cached')
+
+        caching.invalidate_patient(1)
+        self.assertNotEqual(caching.versioned_key('test', caching.patient_scope(1), 'chart'), first)
+        self.assertEqual(caching.versioned_key('test', caching.patient_scope(2), 'chart'), other)
+
+    def test_lost_version_does_not_reuse_old_keys(self):
+        """Test that a version evicted from the cache restarts at a new number"""
+        scope = caching.dentist_day_scope(1, date(2030, 1, 1))
+        before = caching.get_version(scope)
+        cache.delete(f'version:{scope}')
+        self.assertNotEqual(caching.get_version(scope), before)
+
+    def test_hit_and_miss_counters(self):
+        """Test that lookups are counted per namespace"""
+        cache.set('present', 1)
+        caching.cache_get('test', 'present')
+        caching.cache_get('test', 'absent')
+        caching.cache_get_many('test', ['present', 'absent', 'also-absent'])
+        stats = caching.get_stats()['test']
+        self.assertEqual((stats['hits'], stats['misses']), (2, 3))
+        self.assertEqual(stats['hit_rate'], 0.4)
+
+    def test_dentist_day_invalidation_reaches_availability(self):
+        """Test that an appointment change only invalidates its own dentist-day"""
+        dentist = User.objects.create_user(username=f'dentist_{uuid.uuid4().hex[:8]}', password='x')
+        patient = Patient.objects.create(name='Cache Patient', age=20, gender='M', phone='5550009999')
+        days = [date(2030, 1, 1), date(2030, 1, 2)]
+        get_busy_intervals([dentist.id], days)
+
+        Appointment.objects.create(
+            patient=patient, dentist=dentist, date=days[0],
+            start_time=time(9, 0), end_time=time(10, 0), status='scheduled'
+        )
+        caching.reset_stats()
+        get_busy_intervals([dentist.id], days)
+        stats = caching.get_stats()['availability']
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+
+class CacheStatsEndpointTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username=f'user_{uuid.uuid4().hex[:8]}', password='password123')
+        self.client.login(username=self.user.username, password='password123')
+
+    def test_admin_only(self):
+        """Test that only admins can read the cache counters"""
+        url = reverse('cache_stats')
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        profile = UserProfile.objects.get(user=self.user)
+        profile.role = 'admin'
+        profile.save()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('namespaces', response.json())
@@ -0,0 +1,203 @@
+from datetime import date, time, timedelta
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from django.contrib.auth.models import User
+from app.models import UserProfile, Patient, Appointment
+from app.agenda import get_range, step_anchor, group_by_day, split_weeks
+import uuid
+
+
+class CalendarRangeTest(TestCase):
+    def test_week_range_starts_on_monday(self):
+        """Test that week views cover Monday to Sunday"""
+        start, end = get_range('week', date(2030, 1, 10))
+        self.assertEqual((start, end), (date(2030, 1, 7), date(2030, 1, 13)))
+
+    def test_month_range_is_padded_to_whole_weeks(self):
+        """Test that month views start and end on week boundaries"""
+        start, end = get_range('month', date(2030, 1, 15))
+        self.assertEqual(start, date(2029, 12, 31))
+        self.assertEqual(end, date(2030, 2, 3))
+        self.assertEqual(len(split_weeks(group_by_day([], start, end))), 5)
+
+    def test_step_anchor(self):
+        """Test moving a page forwards and backwards"""
+        self.assertEqual(step_anchor('month', date(2030, 12, 31), 1), date(2031, 1, 1))
+        self.assertEqual(step_anchor('month', date(2030, 1, 31), -1), date(2029, 12, 1))
+        self.assertEqual(step_anchor('week', date(2030, 1, 10), -1), date(2030, 1, 3))
+
+
+class AppointmentCalendarViewTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.dentists = []
+        for name in ('Alpha', 'Beta'):
+            dentist = User.objects.create_user(
+                username=f'dentist_{uuid.uuid4().hex[:8]}',
+                password='password123',
+                first_name=name,
+                last_name='Dentist'
+            )
+            profile = UserProfile.objects.get(user=dentist)
+            profile.role = 'dentist'
+            profile.save()
+            self.dentists.append(dentist)
+        self.client.login(username=self.dentists[0].username, password='password123')
+        self.patient = Patient.objects.create(name='Calendar Patient', age=30, gender='F', phone='5550005555')
+        self.day = date(2030, 1, 9)
+
+    def book(self, count):
+        for i in range(count):
+            Appointment.objects.create(
+                patient=self.patient,
+                dentist=self.dentists[i % 2],
+                date=self.day + timedelta(days=i % 20),
+                start_time=time(9 + i % 8, 0),
+                end_time=time(9 + i % 8, 30),
+                status='scheduled'
+            )
+
+    def count_queries(self, view):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('appointment_calendar'), {
+                'view': view, 'date': self.day.strftime('%Y-%m-%d'),
+            })
+        self.assertEqual(response.status_code, 200)
+        return len(ctx), response
+
+    def test_week_groups_appointments_by_day(self):
+        """Test that the week view buckets appointments into their days"""
+        self.book(4)
+        _, response = self.count_queries('week')
+        weeks = response.context['calendar_data']
+        self.assertEqual(len(weeks), 1)
+        self.assertEqual(len(weeks[0][self.day]), 1)
+        self.assertEqual(len(weeks[0][self.day + timedelta(days=1)]), 1)
+        self.assertContains(response, 'Calendar Patient')
+
+    def test_dentist_columns(self):
+        """Test that the per-dentist layout puts each booking under its dentist"""
+        self.book(2)
+        _, response = self.count_queries('dentists')
+        dentists = response.context['dentists']
+        self.assertEqual(len(dentists), 2)
+        rows = dict(response.context['dentist_rows'])
+        first_day = rows[self.day]
+        self.assertEqual(sum(len(column) for column in first_day), 1)
+        self.assertEqual(first_day[dentists.index(self.dentists[0])][0].date, self.day)
+        self.assertContains(response, 'Dr. Beta Dentist')
+
+    def test_query_count_is_constant(self):
+        """Test that the number of queries does not grow with range or bookings"""
+        counts = {view: self.count_queries(view)[0] for view in ('week', 'month', 'dentists')}
+        self.book(40)
+        for view, before in counts.items():
+            self.assertEqual(self.count_queries(view)[0], before, view)
+
+    def test_invalid_date_and_view_fall_back(self):
+        """Test that bad parameters show the current week instead of failing"""
+        response = self.client.get(reverse('appointment_calendar'), {'view': 'year', 'date': 'bad'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['view'], 'week')
+        self.assertEqual(response.context['current_date'], date.today())
+
+
+class CalendarFeedTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.dentist = User.objects.create_user(
+            username=f'dentist_{uuid.uuid4().hex[:8]}',
+            password='password123',
+            first_name='Feed',
+            last_name='Dentist'
+        )
+        self.client.login(username=self.dentist.username, password='password123')
+        self.patient = Patient.objects.create(name='Feed Patient', age=41, gender='M', phone='5550006666')
+        self.appointment = Appointment.objects.create(
+            patient=self.patient,
+            dentist=self.dentist,
+            date=date(2030, 3, 4),
+            start_time=time(9, 0),
+            end_time=time(9, 30),
+            status='scheduled'
+        )
+        self.params = {'start': '2030-03-01', 'end': '2030-03-31'}
+
+    def get(self, **headers):
+        return self.client.get(reverse('calendar_feed'), self.params, **headers)
+
+    def test_feed_returns_compact_tuples(self):
+        """Test the feed payload and its ETag header"""
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'].startswith('"'))
+        data = response.json()
+        self.assertEqual(data['fields'][:4], ['id', 'date', 'start', 'end'])
+        self.assertEqual(data['appointments'], [[
+            self.appointment.pk, '2030-03-04', '09:00', '09:30', 'scheduled',
+            self.dentist.pk, self.patient.pk, 'Feed Patient',
+        ]])
+        self.assertEqual(data['dentists'], {str(self.dentist.pk): 'Feed Dentist'})
+
+    def test_matching_etag_returns_304_without_reading_rows(self):
+        """Test that a matching If-None-Match is answered with 304 and no payload query"""
+        etag = self.get()['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any('"app_patient"."name"' in q['sql'] for q in ctx.captured_queries))
+
+    def test_etag_changes_with_the_range(self):
+        """Test that edits, new rows, deletions and patient renames change the ETag"""
+        etags = [self.get()['ETag']]
+
+        self.appointment.status = 'completed'
+        self.appointment.save()
+        etags.append(self.get()['ETag'])
+
+        other = Appointment.objects.create(
+            patient=self.patient, dentist=self.dentist, date=date(2030, 3, 5),
+            start_time=time(10, 0), end_time=time(10, 30), status='scheduled'
+        )
+        etags.append(self.get()['ETag'])
+
+        other.delete()
+        etags.append(self.get()['ETag'])
+
+        self.patient.name = 'Renamed Patient'
+        self.patient.save()
+        etags.append(self.get()['ETag'])
+
+        for before, after in zip(etags, etags[1:]):
+            self.assertNotEqual(before, after)
+        # Deleting the new row restores the earlier content, and its ETag
+        self.assertEqual(etags[3], etags[1])
+        response = self.get(HTTP_IF_NONE_MATCH=etags[0])
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_changes_when_dentist_is_renamed(self):
+        """Test that renaming a dentist shown in the feed changes the ETag, and logging in does not"""
+        etag = self.get()['ETag']
+        self.client.login(username=self.dentist.username, password='password123')
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.dentist.first_name = 'Renamed'
+        self.dentist.save()
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['dentists'], {str(self.dentist.pk): 'Renamed Dentist'})
+
+    def test_dentist_filter(self):
+        """Test that the feed can be limited to some dentists"""
+        self.params['dentist'] = self.dentist.pk + 1000
+        self.assertEqual(self.get().json()['appointments'], [])
+
+    def test_invalid_parameters(self):
+        """Test that missing or invalid ranges return 400"""
+        url = reverse('calendar_feed')
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': '2030-03-10', 'end': '2030-03-01'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': '2030-01-01', 'end': '2030-12-31'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': 'x', 'end': '2030-03-01'}).status_code, 400)
@@ -0,0 +1,153 @@
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from django.contrib.auth.models import User
+from app.models import (
+    UserProfile, Patient, Appointment, Tooth,
+    ToothCondition, Treatment
+)
+from app.charting import get_chart_teeth
+from datetime import date, time
+import uuid
+
+
+class ChartStateTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+
+        # Create a dentist user with unique username
+        username = f"dentist_{uuid.uuid4().hex[:8]}"
+        self.user = User.objects.create_user(
+            username=username,
+            email=f'{username}@example.com',
+            password='testpassword'
+        )
+        profile = UserProfile.objects.get(user=self.user)
+        profile.role = 'dentist'
+        profile.save()
+
+        self.patient = Patient.objects.create(
+            name='Chart Patient',
+            age=40,
+            gender='F',
+            phone='5551234567'
+        )
+        self.appointment = Appointment.objects.create(
+            patient=self.patient,
+            dentist=self.user,
+            date=date.today(),
+            start_time=time(10, 0),
+            end_time=time(10, 30),
+            status='scheduled'
+        )
+        self.other_appointment = Appointment.objects.create(
+            patient=self.patient,
+            dentist=self.user,
+            date=date.today(),
+            start_time=time(11, 0),
+            end_time=time(11, 30),
+            status='completed'
+        )
+        self.condition = ToothCondition.objects.create(name='Cavity')
+
+        # Create a full set of 32 teeth
+        self.teeth = []
+        for quadrant in range(1, 5):
+            for position in range(1, 9):
+                self.teeth.append(Tooth.objects.create(
+                    number=quadrant * 10 + position,
+                    name=f'Tooth {quadrant}{position}',
+                    quadrant=quadrant,
+                    position=position
+                ))
+
+        self.client.login(username=self.user.username, password='testpassword')
+
+    def _add_treatment(self, tooth, status, appointment=None):
+        return Treatment.objects.create(
+            patient=self.patient,
+            tooth=tooth,
+            condition=self.condition,
+            appointment=appointment,
+            description='Test treatment',
+            status=status
+        )
+
+    def test_counts_and_flags(self):
+        """Test that per-status counts and flags are attached to each tooth"""
+        first, second = self.teeth[0], self.teeth[1]
+        self._add_treatment(first, 'planned', self.appointment)
+        self._add_treatment(first, 'planned', self.other_appointment)
+        self._add_treatment(first, 'completed', self.other_appointment)
+        self._add_treatment(second, 'cancelled')
+
+        teeth = {t.id: t for t in get_chart_teeth(self.patient, highlight_appointment=self.appointment)}
+
+        self.assertEqual(len(teeth), 32)
+        self.assertEqual(teeth[first.id].treatment_counts, {
+            'planned': 2, 'in_progress': 0, 'completed': 1, 'cancelled': 0, 'total': 3,
+        })
+        self.assertTrue(teeth[first.id].has_treatments)
+        self.assertTrue(teeth[first.id].has_planned_treatments)
+        self.assertFalse(teeth[first.id].has_in_progress_treatments)
+        self.assertTrue(teeth[first.id].has_completed_treatments)
+        self.assertTrue(teeth[first.id].has_appointment_treatments)
+
+        self.assertEqual(teeth[second.id].treatment_counts['total'], 1)
+        self.assertTrue(teeth[second.id].has_treatments)
+        self.assertFalse(teeth[second.id].has_planned_treatments)
+        self.assertFalse(teeth[second.id].has_appointment_treatments)
+
+        self.assertEqual(teeth[self.teeth[2].id].treatment_counts['total'], 0)
+        self.assertFalse(teeth[self.teeth[2].id].has_treatments)
+
+    def test_scoped_to_appointment(self):
+        """Test that only the given appointment's treatments are counted"""
+        tooth = self.teeth[0]
+        self._add_treatment(tooth, 'planned', self.appointment)
+        self._add_treatment(tooth, 'completed', self.other_appointment)
+
+        teeth = {t.id: t for t in get_chart_teeth(self.patient, appointment=self.appointment)}
+
+        self.assertEqual(teeth[tooth.id].treatment_counts['total'], 1)
+        self.assertTrue(teeth[tooth.id].has_planned_treatments)
+        self.assertFalse(teeth[tooth.id].has_completed_treatments)
+
+    def test_fixed_query_count(self):
+        """Test that the chart state is built with one query regardless of data size"""
+        # Warm the reference data cache
+        get_chart_teeth(self.patient)
+
+        with self.assertNumQueries(1):
+            get_chart_teeth(self.patient, highlight_appointment=self.appointment)
+
+        for tooth in self.teeth:
+            for status in ('planned', 'in_progress', 'completed', 'cancelled'):
+                self._add_treatment(tooth, status, self.appointment)
+
+        with self.assertNumQueries(1):
+            teeth = get_chart_teeth(self.patient, highlight_appointment=self.appointment)
+        self.assertTrue(all(t.treatment_counts['total'] == 4 for t in teeth))
+
+    def test_dental_chart_view_query_count_is_constant(self):
+        """Test that the dental chart page does not issue queries per tooth or treatment"""
+        url = reverse('dental_chart', kwargs={'patient_id': self.patient.id})
+        url += f'?appointment={self.appointment.id}'
+
+        # Warm the reference data cache
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as empty_chart:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        for tooth in self.teeth:
+            self._add_treatment(tooth, 'planned', self.appointment)
+            self._add_treatment(tooth, 'completed', self.appointment)
+
+        with CaptureQueriesContext(connection) as full_chart:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(len(empty_chart), len(full_chart))
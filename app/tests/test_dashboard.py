@@ -0,0 +1,104 @@
+from datetime import date, time, timedelta
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from django.contrib.auth.models import User
+from app.models import UserProfile, Patient, Appointment
+from app.dashboard import estimate_count, get_totals, get_dentist_widgets
+import uuid
+
+
+def create_user(role):
+    user = User.objects.create_user(
+        username=f'{role}_{uuid.uuid4().hex[:8]}',
+        password='password123',
+        first_name=role.title(),
+        last_name='User'
+    )
+    profile = UserProfile.objects.get(user=user)
+    profile.role = role
+    profile.save()
+    return user
+
+
+class DashboardMetricsTest(TestCase):
+    def setUp(self):
+        self.dentist = create_user('dentist')
+        self.today = date.today()
+        self.patients = [
+            Patient.objects.create(name=f'Dash Patient {i}', age=30 + i, gender='M', phone=f'55500088{i:02d}')
+            for i in range(3)
+        ]
+
+    def book(self, patient, day, hour=9):
+        return Appointment.objects.create(
+            patient=patient,
+            dentist=self.dentist,
+            date=day,
+            start_time=time(hour, 0),
+            end_time=time(hour, 30),
+            status='scheduled'
+        )
+
+    def test_estimate_count_is_exact_on_small_tables(self):
+        """Test that small tables are counted exactly"""
+        self.assertEqual(estimate_count(Patient), 3)
+
+    def test_totals_are_cached(self):
+        """Test that admin totals are read once and then served from the cache"""
+        with self.assertNumQueries(3):
+            totals = get_totals()
+        self.assertEqual(totals['total_patients'], 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_totals(), totals)
+
+    @override_settings(DASHBOARD_UPCOMING_DAYS=3, DASHBOARD_WIDGET_LIMIT=2)
+    def test_dentist_widgets_are_bounded(self):
+        """Test that the dentist widgets only cover the upcoming window"""
+        self.book(self.patients[0], self.today - timedelta(days=1))
+        self.book(self.patients[1], self.today, hour=10)
+        self.book(self.patients[2], self.today + timedelta(days=1))
+        self.book(self.patients[0], self.today + timedelta(days=2))
+        self.book(self.patients[1], self.today + timedelta(days=10))
+
+        appointments, patients = get_dentist_widgets(self.dentist, self.today)
+        self.assertEqual([a.date for a in appointments], [self.today, self.today + timedelta(days=1)])
+        self.assertEqual(patients, [self.patients[1], self.patients[2]])
+
+    def test_dentist_widgets_are_invalidated_on_save(self):
+        """Test that saving one of the dentist's appointments refreshes the widgets"""
+        self.book(self.patients[0], self.today)
+        get_dentist_widgets(self.dentist, self.today)
+        with self.assertNumQueries(0):
+            appointments, _ = get_dentist_widgets(self.dentist, self.today)
+        self.assertEqual(len(appointments), 1)
+
+        self.book(self.patients[1], self.today + timedelta(days=1))
+        appointments, patients = get_dentist_widgets(self.dentist, self.today)
+        self.assertEqual(len(appointments), 2)
+        self.assertEqual(len(patients), 2)
+
+    def test_admin_dashboard_repeat_view_uses_fewer_queries(self):
+        """Test that repeat admin dashboard views skip the count queries"""
+        admin = create_user('admin')
+        client = Client()
+        client.login(username=admin.username, password='password123')
+        with CaptureQueriesContext(connection) as first:
+            client.get(reverse('dashboard'))
+        with CaptureQueriesContext(connection) as second:
+            response = client.get(reverse('dashboard'))
+        self.assertEqual(len(second), len(first) - 3)
+        self.assertEqual(response.context['total_patients'], 3)
+
+    def test_dentist_dashboard_renders_widgets(self):
+        """Test that the dentist dashboard shows the upcoming appointments and patients"""
+        self.book(self.patients[0], self.today + timedelta(days=1))
+        self.book(self.patients[2], self.today + timedelta(days=2))
+        client = Client()
+        client.login(username=self.dentist.username, password='password123')
+        response = client.get(reverse('dashboard'))
+        self.assertContains(response, 'My Upcoming Appointments')
+        self.assertContains(response, 'Dash Patient 0')
+        self.assertContains(response, 'Dash Patient 2')
+        self.assertNotContains(response, 'Dash Patient 1')
@@ -155,6 +155,33 @@ class AppointmentFormTest(TestCase):
         
         # Check that there's a non-field error about overlapping
         self.assertTrue(any('overlaps' in error for error in form.non_field_errors()))
+    
+    def test_patient_widget_renders_only_selected_patient(self):
+        """Test that the patient dropdown does not list every patient"""
+        other = Patient.objects.create(name='Other Person', age=50, gender='M', phone='1112223333')
+        
+        html = str(AppointmentForm(initial={'patient': self.patient.id})['patient'])
+        self.assertIn('Jane Doe', html)
+        self.assertNotIn(other.name, html)
+        self.assertIn('+ Add New Patient', html)
+        self.assertIn('data-search-url="/app/api/patients/search/"', html)
+        
+        # Rendering with no selection does not load any patient
+        with self.assertNumQueries(0):
+            str(AppointmentForm()['patient'])
+    
+    def test_patient_validated_by_submitted_id(self):
+        """Test that only the submitted patient ID is checked"""
+        form_data = {
+            'patient': 999999,
+            'dentist': self.user.id,
+            'date': (date.today() + timedelta(days=2)).strftime('%Y-%m-%d'),
+            'start_time': '09:00',
+            'duration': 30,
+        }
+        form = AppointmentForm(data=form_data)
+        self.assertFalse(form.is_valid())
+        self.assertIn('patient', form.errors)
 
 
 class TreatmentFormTest(TestCase):
@@ -0,0 +1,67 @@
+from datetime import date
+from django.test import TestCase
+from django.db import connection, transaction
+from app.models import Appointment, Treatment, TreatmentHistory, Payment
+
+
+class QueryPlanTest(TestCase):
+    """
+    Check that the hot query shapes are served by an index.
+
+    Runs EXPLAIN on whichever database the tests use (SQLite by default,
+    PostgreSQL when DATABASE_URL points at one).
+    """
+
+    def explain(self, queryset):
+        if connection.vendor == 'postgresql':
+            # The test tables are tiny, so stop the planner preferring a
+            # sequential scan and show which index it would use
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+                return queryset.explain()
+        return queryset.explain()
+
+    def assertUsesIndex(self, queryset, index_name, table):
+        plan = self.explain(queryset)
+        self.assertIn(index_name, plan)
+        if connection.vendor == 'sqlite':
+            # "SCAN <table>" without an index is a full table scan, and a temp
+            # B-tree means the rows are sorted after being read
+            self.assertNotRegex(plan, rf'SCAN {table}(?! USING)')
+            self.assertNotIn('TEMP B-TREE', plan)
+        elif connection.vendor == 'postgresql':
+            self.assertNotIn(f'Seq Scan on {table}', plan)
+        return plan
+
+    def test_dentist_day_appointments(self):
+        """Test that a dentist's bookings for a day use the dentist/date/status index"""
+        queryset = Appointment.objects.filter(
+            dentist_id=1, date=date(2030, 1, 1), status__in=('scheduled',)
+        ).order_by().values_list('start_time', 'end_time')
+        self.assertUsesIndex(queryset, 'appt_dentist_date_status_idx', 'app_appointment')
+
+    def test_patient_appointments_newest_first(self):
+        """Test that a patient's appointments are read in index order"""
+        queryset = Appointment.objects.filter(patient_id=1).order_by('-date', '-start_time')
+        self.assertUsesIndex(queryset, 'appt_patient_date_idx', 'app_appointment')
+
+    def test_patient_tooth_treatments(self):
+        """Test that treatments by patient, tooth and status use the composite index"""
+        queryset = Treatment.objects.filter(patient_id=1, tooth_id=11, status='planned').order_by()
+        self.assertUsesIndex(queryset, 'treatment_patient_tooth_idx', 'app_treatment')
+
+    def test_appointment_treatments(self):
+        """Test that treatments for an appointment use the foreign key index"""
+        queryset = Treatment.objects.filter(appointment_id=1).order_by()
+        self.assertUsesIndex(queryset, 'app_treatment_appointment_id', 'app_treatment')
+
+    def test_patient_payments_newest_first(self):
+        """Test that a patient's payments are read in index order"""
+        queryset = Payment.objects.filter(patient_id=1)
+        self.assertUsesIndex(queryset, 'payment_patient_date_idx', 'app_payment')
+
+    def test_treatment_history_newest_first(self):
+        """Test that a treatment's history is read in index order"""
+        queryset = TreatmentHistory.objects.filter(treatment_id=1)
+        self.assertUsesIndex(queryset, 'history_treatment_created_idx', 'app_treatmenthistory')
@@ -0,0 +1,213 @@
+from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.contrib.auth.models import User
+from app.models import Patient, Payment, PatientBalance, ToothCondition, Treatment
+from app.ledger import get_balance, find_balance_drift, rebuild_all_balances, PatientFinancials
+from app.forms import PaymentForm
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+import uuid
+
+
+class PatientBalanceTest(TestCase):
+    def setUp(self):
+        username = f"staff_{uuid.uuid4().hex[:8]}"
+        self.user = User.objects.create_user(
+            username=username,
+            email=f'{username}@example.com',
+            password='testpassword'
+        )
+        self.patient = Patient.objects.create(
+            name='Ledger Patient',
+            age=35,
+            gender='F',
+            phone='5550001111'
+        )
+        self.other_patient = Patient.objects.create(
+            name='Other Patient',
+            age=50,
+            gender='M',
+            phone='5550002222'
+        )
+
+    def _pay(self, total, paid, patient=None):
+        return Payment.objects.create(
+            patient=patient or self.patient,
+            total_amount=Decimal(total),
+            amount_paid=Decimal(paid),
+            payment_method='cash',
+            created_by=self.user
+        )
+
+    def test_balance_built_on_first_read(self):
+        """Test that a missing balance row is built from existing payments"""
+        self._pay('1000.00', '400.00')
+        PatientBalance.objects.all().delete()
+
+        balance = get_balance(self.patient)
+        self.assertEqual(balance.total_billed, Decimal('1000.00'))
+        self.assertEqual(balance.total_paid, Decimal('400.00'))
+        self.assertEqual(balance.balance_due, Decimal('600.00'))
+        self.assertEqual(balance.payment_count, 1)
+
+    def test_building_and_first_payment_take_patient_lock(self):
+        """Test that building a row and a payment without a row both lock the patient"""
+        with mock.patch('app.ledger._lock_patient') as lock:
+            self._pay('100.00', '0.00')
+            lock.assert_called_once_with(self.patient.pk)
+
+            lock.reset_mock()
+            balance = get_balance(self.patient)
+            lock.assert_called_once_with(self.patient.pk)
+            self.assertEqual(balance.payment_count, 1)
+
+            # Once the row exists, payments update it without the lock
+            lock.reset_mock()
+            self._pay('50.00', '50.00')
+            lock.assert_not_called()
+        self.assertEqual(get_balance(self.patient).payment_count, 2)
+
+    def test_balance_tracks_create_edit_delete(self):
+        """Test that payment changes are applied incrementally"""
+        get_balance(self.patient)
+
+        first = self._pay('1000.00', '400.00')
+        second = self._pay('500.00', '500.00')
+        balance = get_balance(self.patient)
+        self.assertEqual(balance.total_billed, Decimal('1500.00'))
+        self.assertEqual(balance.total_paid, Decimal('900.00'))
+        self.assertEqual(balance.payment_count, 2)
+
+        first.amount_paid = Decimal('1000.00')
+        first.save()
+        self.assertEqual(get_balance(self.patient).balance_due, Decimal('0.00'))
+
+        second.delete()
+        balance = get_balance(self.patient)
+        self.assertEqual(balance.total_billed, Decimal('1000.00'))
+        self.assertEqual(balance.total_paid, Decimal('1000.00'))
+        self.assertEqual(balance.payment_count, 1)
+        self.assertEqual(find_balance_drift(), [])
+
+    def test_payment_moved_between_patients(self):
+        """Test that reassigning a payment moves its amounts"""
+        get_balance(self.patient)
+        get_balance(self.other_patient)
+        payment = self._pay('300.00', '100.00')
+
+        payment.patient = self.other_patient
+        payment.save()
+
+        self.assertEqual(get_balance(self.patient).total_billed, Decimal('0.00'))
+        self.assertEqual(get_balance(self.other_patient).total_billed, Decimal('300.00'))
+        self.assertEqual(get_balance(self.other_patient).payment_count, 1)
+
+    def test_read_is_single_query(self):
+        """Test that reading a stored balance is a single lookup"""
+        for _ in range(10):
+            self._pay('100.00', '50.00')
+        get_balance(self.patient)
+
+        with self.assertNumQueries(1):
+            balance = get_balance(self.patient)
+        self.assertEqual(balance.balance_due, Decimal('500.00'))
+
+    def test_drift_check_and_rebuild(self):
+        """Test that the management command reports and repairs drift"""
+        self._pay('1000.00', '400.00')
+        get_balance(self.patient)
+
+        # Bulk updates bypass the signals and leave the ledger stale
+        Payment.objects.filter(patient=self.patient).update(amount_paid=Decimal('900.00'))
+        drift = find_balance_drift()
+        self.assertEqual(len(drift), 1)
+        self.assertEqual(drift[0][0], self.patient.id)
+
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_balances', '--check', stdout=out)
+        self.assertIn(f'Patient {self.patient.id}', out.getvalue())
+
+        call_command('rebuild_balances', stdout=StringIO())
+        self.assertEqual(find_balance_drift(), [])
+        self.assertEqual(get_balance(self.patient).total_paid, Decimal('900.00'))
+
+        out = StringIO()
+        call_command('rebuild_balances', '--check', stdout=out)
+        self.assertIn('All patient balances match', out.getvalue())
+
+    def test_rebuild_all_creates_rows_for_every_patient(self):
+        """Test that a full rebuild writes a row for patients without payments"""
+        self._pay('200.00', '200.00')
+        self.assertEqual(rebuild_all_balances(), 2)
+        self.assertEqual(PatientBalance.objects.count(), 2)
+        self.assertEqual(get_balance(self.other_patient).payment_count, 0)
+
+
+class PatientFinancialsTest(TestCase):
+    def setUp(self):
+        self.condition = ToothCondition.objects.create(name='Cavity')
+        self.patients = [
+            Patient.objects.create(name=f'Patient {i}', age=30 + i, gender='M', phone=f'555000{i:04d}')
+            for i in range(5)
+        ]
+        for i, patient in enumerate(self.patients):
+            for _ in range(i):
+                Treatment.objects.create(
+                    patient=patient,
+                    condition=self.condition,
+                    description='Filling',
+                    cost=Decimal('250.00')
+                )
+                Payment.objects.create(
+                    patient=patient,
+                    total_amount=Decimal('250.00'),
+                    amount_paid=Decimal('100.00')
+                )
+        # Build the ledger rows
+        rebuild_all_balances()
+
+    def test_single_patient(self):
+        """Test that all figures are returned from one query"""
+        patient = self.patients[3]
+        with self.assertNumQueries(1):
+            financials = PatientFinancials.for_patient(patient)
+
+        self.assertEqual(financials.total_billed, Decimal('750.00'))
+        self.assertEqual(financials.total_paid, Decimal('300.00'))
+        self.assertEqual(financials.balance_due, Decimal('450.00'))
+        self.assertEqual(financials.treatment_cost, Decimal('750.00'))
+        self.assertEqual(financials.payment_count, 3)
+
+    def test_patient_without_payments_or_treatments(self):
+        """Test that a patient with no history gets zero totals"""
+        financials = PatientFinancials.for_patient(self.patients[0])
+        self.assertEqual(financials.total_billed, Decimal('0.00'))
+        self.assertEqual(financials.treatment_cost, Decimal('0.00'))
+        self.assertEqual(financials.payment_count, 0)
+
+    def test_bulk_variant(self):
+        """Test that many patients are loaded with a single query"""
+        ids = [p.id for p in self.patients]
+        with self.assertNumQueries(1):
+            financials = PatientFinancials.for_patients(ids)
+
+        self.assertEqual(set(financials), set(ids))
+        for i, patient in enumerate(self.patients):
+            self.assertEqual(financials[patient.id].payment_count, i)
+            self.assertEqual(financials[patient.id].treatment_cost, Decimal('250.00') * i)
+
+    def test_missing_ledger_row_is_built(self):
+        """Test that patients without a ledger row still get correct totals"""
+        PatientBalance.objects.all().delete()
+        financials = PatientFinancials.for_patient(self.patients[2])
+        self.assertEqual(financials.total_paid, Decimal('200.00'))
+        self.assertTrue(PatientBalance.objects.filter(patient=self.patients[2]).exists())
+
+    def test_payment_form_initial_total(self):
+        """Test that the payment form suggests treatment cost minus amount paid"""
+        form = PaymentForm(patient=self.patients[4])
+        self.assertEqual(form.fields['total_amount'].initial, Decimal('600.00'))
+
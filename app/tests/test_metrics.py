@@ -0,0 +1,153 @@
+import json
+import uuid
+from django.contrib.auth.models import User
+from asgiref.sync import iscoroutinefunction
+from django.http import HttpResponse
+from django.test import TestCase, AsyncClient, Client, override_settings
+from django.urls import reverse
+from app.models import UserProfile, Patient
+from app import metrics
+from app.middleware import RequestMetricsMiddleware
+
+
+def sample(text, line_start):
+    """Return the value of the first exported sample whose line starts with line_start."""
+    for line in text.splitlines():
+        if line.startswith(line_start + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+class RequestRecordTest(TestCase):
+    def test_repeated_statements_are_grouped(self):
+        """Test that the same SQL run in a loop is reported once with its count"""
+        record = metrics.RequestRecord()
+        for _ in range(3):
+            record.add_query('SELECT * FROM app_treatment WHERE tooth_id = %s', 0.002)
+        record.add_query('SELECT * FROM app_patient', 0.001)
+        
+        top = record.top_statements(1)
+        self.assertEqual(record.queries, 4)
+        self.assertEqual(len(top), 1)
+        self.assertEqual(top[0]['count'], 3)
+        self.assertEqual(top[0]['ms'], 6.0)
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test that exported buckets count every observation at or below their bound"""
+        metrics.reset_metrics()
+        record = metrics.RequestRecord()
+        record.queries = 5
+        metrics.observe_request('sample', 'GET', '/sample/', 200, 0.02, record)
+        record.queries = 30
+        metrics.observe_request('sample', 'GET', '/sample/', 200, 0.02, record)
+        
+        text = metrics.render_prometheus()
+        self.assertEqual(sample(text, 'dentchartzz_request_queries_bucket{view="sample",le="2"}'), 0)
+        self.assertEqual(sample(text, 'dentchartzz_request_queries_bucket{view="sample",le="5"}'), 1)
+        self.assertEqual(sample(text, 'dentchartzz_request_queries_bucket{view="sample",le="50"}'), 2)
+        self.assertEqual(sample(text, 'dentchartzz_request_queries_bucket{view="sample",le="+Inf"}'), 2)
+        self.assertEqual(sample(text, 'dentchartzz_request_queries_sum{view="sample"}'), 35)
+        self.assertEqual(sample(text, 'dentchartzz_responses_total{view="sample",status="2xx"}'), 2)
+
+
+class RequestMetricsMiddlewareTest(TestCase):
+    def setUp(self):
+        metrics.reset_metrics()
+        self.client = Client()
+        self.user = User.objects.create_user(username=f'user_{uuid.uuid4().hex[:8]}', password='password123')
+        self.client.login(username=self.user.username, password='password123')
+        for i in range(3):
+            Patient.objects.create(name=f'Metrics Patient {i}', age=30, gender='F', phone=f'555000{i}')
+
+    def test_request_is_recorded_per_url_name(self):
+        """Test that queries, SQL time, template time and wall time are recorded for the view"""
+        self.client.get(reverse('patient_list'))
+        
+        text = metrics.render_prometheus()
+        self.assertEqual(sample(text, 'dentchartzz_request_duration_seconds_count{view="patient_list"}'), 1)
+        self.assertGreater(sample(text, 'dentchartzz_request_queries_sum{view="patient_list"}'), 0)
+        self.assertGreater(sample(text, 'dentchartzz_request_sql_duration_seconds_sum{view="patient_list"}'), 0)
+        self.assertGreater(sample(text, 'dentchartzz_request_template_duration_seconds_sum{view="patient_list"}'), 0)
+
+    def test_unknown_url_is_grouped(self):
+        """Test that requests matching no URL share one label"""
+        self.client.get('/no-such-page/')
+        text = metrics.render_prometheus()
+        self.assertEqual(sample(text, 'dentchartzz_responses_total{view="unresolved",status="4xx"}'), 1)
+
+    @override_settings(METRICS_SLOW_REQUEST_QUERIES=1)
+    def test_slow_request_log_lists_top_sql(self):
+        """Test that a request over the query threshold is logged as JSON with its costliest SQL"""
+        with self.assertLogs('app.metrics', level='WARNING') as logs:
+            self.client.get(reverse('patient_list'))
+        
+        entry = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(entry['event'], 'slow_request')
+        self.assertEqual(entry['view'], 'patient_list')
+        self.assertIn('queries', entry['reasons'])
+        self.assertGreaterEqual(entry['queries'], 1)
+        self.assertTrue(entry['top_sql'])
+        self.assertTrue(all({'sql', 'count', 'ms'} <= set(statement) for statement in entry['top_sql']))
+        
+        text = metrics.render_prometheus()
+        self.assertEqual(sample(text, 'dentchartzz_slow_requests_total{view="patient_list"}'), 1)
+
+    def test_middleware_is_async_for_async_handlers(self):
+        """Test that the middleware runs as a coroutine when the rest of the chain is async"""
+        async def get_response(request):
+            return HttpResponse()
+        
+        self.assertTrue(iscoroutinefunction(RequestMetricsMiddleware(get_response)))
+        self.assertFalse(iscoroutinefunction(RequestMetricsMiddleware(lambda request: HttpResponse())))
+
+    async def test_async_view_is_recorded(self):
+        """Test that an async view served over ASGI is recorded with its queries"""
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        patient = await Patient.objects.afirst()
+        response = await client.get(reverse('get_patient_balance', args=[patient.pk]))
+        self.assertEqual(response.status_code, 200)
+        
+        text = metrics.render_prometheus()
+        self.assertEqual(sample(text, 'dentchartzz_request_duration_seconds_count{view="get_patient_balance"}'), 1)
+        self.assertGreater(sample(text, 'dentchartzz_request_queries_sum{view="get_patient_balance"}'), 0)
+
+    def test_fast_request_is_not_logged(self):
+        """Test that requests under both thresholds are not logged"""
+        with self.assertNoLogs('app.metrics', level='WARNING'):
+            self.client.get(reverse('health_check'))
+
+
+class MetricsEndpointTest(TestCase):
+    def setUp(self):
+        metrics.reset_metrics()
+        self.client = Client()
+        self.user = User.objects.create_user(username=f'user_{uuid.uuid4().hex[:8]}', password='password123')
+
+    def test_anonymous_and_staff_are_refused(self):
+        """Test that the metrics are not public"""
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.login(username=self.user.username, password='password123')
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+    def test_admin_can_read_metrics(self):
+        """Test that an admin session gets the Prometheus text format"""
+        profile = UserProfile.objects.get(user=self.user)
+        profile.role = 'admin'
+        profile.save()
+        self.client.login(username=self.user.username, password='password123')
+        self.client.get(reverse('health_check'))
+        
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('# TYPE dentchartzz_request_duration_seconds histogram', text)
+        self.assertEqual(sample(text, 'dentchartzz_request_duration_seconds_count{view="health_check"}'), 1)
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_bearer_token(self):
+        """Test that scrapers authenticate with the configured token"""
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer scrape-token').status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
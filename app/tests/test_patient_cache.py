@@ -0,0 +1,161 @@
+from datetime import date, time
+from decimal import Decimal
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from django.contrib.auth.models import User
+from app.models import (
+    UserProfile, Patient, Appointment, Tooth, ToothCondition, Treatment, TreatmentHistory, Payment, PaymentItem
+)
+from app.caching import REFERENCE_SCOPE, get_version, patient_scope
+import uuid
+
+
+@override_settings(CACHE_SHARED=True)
+class PatientDetailFragmentCacheTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.dentist = User.objects.create_user(
+            username=f'dentist_{uuid.uuid4().hex[:8]}',
+            password='password123',
+            first_name='Cache',
+            last_name='Dentist'
+        )
+        profile = UserProfile.objects.get(user=self.dentist)
+        profile.role = 'dentist'
+        profile.save()
+        self.client.login(username=self.dentist.username, password='password123')
+
+        self.patient = Patient.objects.create(name='Fragment Patient', age=40, gender='F', phone='5550009901')
+        self.other_patient = Patient.objects.create(name='Other Patient', age=41, gender='M', phone='5550009902')
+        self.tooth = Tooth.objects.create(number=11, name='Upper Right Central Incisor', quadrant=1, position=1)
+        self.condition = ToothCondition.objects.create(name='Cavity', description='Tooth decay')
+        self.appointment = Appointment.objects.create(
+            patient=self.patient,
+            dentist=self.dentist,
+            date=date.today(),
+            start_time=time(9, 0),
+            end_time=time(9, 30),
+            status='scheduled'
+        )
+        self.treatment = Treatment.objects.create(
+            patient=self.patient,
+            tooth=self.tooth,
+            condition=self.condition,
+            description='Filling',
+            status='planned',
+            cost=Decimal('150.00')
+        )
+        self.url = reverse('patient_detail', args=[self.patient.pk])
+
+    def version(self, patient=None):
+        return get_version(patient_scope((patient or self.patient).pk))
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_repeat_view_is_served_from_fragments(self):
+        """Test that a second view of an unchanged patient skips the section queries"""
+        first, _ = self.count_queries()
+        second, response = self.count_queries()
+        self.assertLess(second, first)
+        self.assertContains(response, 'Filling')
+        self.assertContains(response, 'id="tooth-11"')
+
+    def test_appointment_changes_bump_version(self):
+        """Test that saving, moving and deleting an appointment bumps the patient version"""
+        before = self.version()
+        self.appointment.status = 'completed'
+        self.appointment.save()
+        self.assertNotEqual(self.version(), before)
+
+        other_before = self.version(self.other_patient)
+        before = self.version()
+        self.appointment.patient = self.other_patient
+        self.appointment.save()
+        self.assertNotEqual(self.version(), before)
+        self.assertNotEqual(self.version(self.other_patient), other_before)
+
+        other_before = self.version(self.other_patient)
+        self.appointment.delete()
+        self.assertNotEqual(self.version(self.other_patient), other_before)
+
+    def test_treatment_and_history_changes_bump_version(self):
+        """Test that treatment and treatment history saves bump the patient version"""
+        before = self.version()
+        self.treatment.status = 'in_progress'
+        self.treatment.save()
+        self.assertNotEqual(self.version(), before)
+
+        before = self.version()
+        TreatmentHistory.objects.create(
+            treatment=self.treatment,
+            previous_status='planned',
+            new_status='in_progress',
+            dentist=self.dentist
+        )
+        self.assertNotEqual(self.version(), before)
+
+    def test_payment_and_item_changes_bump_version(self):
+        """Test that payment and payment item saves bump the patient version"""
+        before = self.version()
+        payment = Payment.objects.create(
+            patient=self.patient,
+            total_amount=Decimal('150.00'),
+            amount_paid=Decimal('50.00'),
+            created_by=self.dentist
+        )
+        self.assertNotEqual(self.version(), before)
+
+        before = self.version()
+        PaymentItem.objects.create(payment=payment, description='Filling', amount=Decimal('150.00'), treatment=self.treatment)
+        self.assertNotEqual(self.version(), before)
+
+    def test_unrelated_patient_keeps_version(self):
+        """Test that changes to one patient leave another patient's fragments cached"""
+        before = self.version(self.other_patient)
+        self.treatment.status = 'completed'
+        self.treatment.save()
+        self.assertEqual(self.version(self.other_patient), before)
+
+    def test_changes_are_rendered_after_bump(self):
+        """Test that the page shows a new status and payment after they are saved"""
+        self.client.get(self.url)
+        self.treatment.status = 'completed'
+        self.treatment.save()
+        Payment.objects.create(
+            patient=self.patient,
+            total_amount=Decimal('150.00'),
+            amount_paid=Decimal('75.00'),
+            created_by=self.dentist
+        )
+
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Completed')
+        self.assertContains(response, '$75.00')
+
+    def test_reference_changes_bump_reference_version(self):
+        """Test that editing a tooth makes the cached chart stale"""
+        self.client.get(self.url)
+        before = get_version(REFERENCE_SCOPE)
+        self.tooth.name = 'Renamed Incisor'
+        self.tooth.save()
+        self.assertNotEqual(get_version(REFERENCE_SCOPE), before)
+
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Renamed Incisor')
+
+    @override_settings(CACHE_SHARED=False)
+    def test_fragments_are_not_cached_on_locmem(self):
+        """Test that the sections are rendered on every view when the cache is per process"""
+        self.client.get(self.url)
+        # update() skips the signals, like a change made by another worker
+        # whose bump this process would not see
+        Treatment.objects.filter(pk=self.treatment.pk).update(description='Root canal')
+
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Root canal')
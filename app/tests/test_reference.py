@@ -0,0 +1,156 @@
+from unittest import mock
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.http import Http404
+from app.models import UserProfile, Patient, Tooth, ToothCondition
+from app.reference import (
+    get_reference_data, get_teeth, get_conditions,
+    get_tooth_by_number_or_404, invalidate_reference_data
+)
+from app.caching import REFERENCE_SCOPE, bump_version
+from io import StringIO
+import json
+import time
+import uuid
+
+DB_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'test_reference_cache'}}
+
+
+class ReferenceDataCacheTest(TestCase):
+    def setUp(self):
+        self.tooth = Tooth.objects.create(
+            number=11,
+            name='Upper Right Central Incisor',
+            quadrant=1,
+            position=1
+        )
+        self.condition = ToothCondition.objects.create(
+            name='Cavity',
+            description='Dental decay requiring filling'
+        )
+
+    def test_records_are_immutable_tuples(self):
+        """Test that cached teeth and conditions are read-only records"""
+        tooth = get_teeth()[0]
+        self.assertEqual(tooth.number, 11)
+        self.assertEqual(tooth.name, 'Upper Right Central Incisor')
+        with self.assertRaises(AttributeError):
+            tooth.name = 'Changed'
+
+        condition = get_conditions()[0]
+        self.assertEqual(condition.name, 'Cavity')
+
+        with self.assertRaises(TypeError):
+            get_reference_data().teeth_by_number[99] = tooth
+
+    def test_cached_reads_run_no_queries(self):
+        """Test that reference data is served from memory once loaded"""
+        get_reference_data()
+        with self.assertNumQueries(0):
+            get_teeth()
+            get_conditions()
+            get_tooth_by_number_or_404(11)
+
+    @override_settings(CACHES=DB_CACHE)
+    def test_cached_reads_skip_db_cache_between_checks(self):
+        """Test that on the db cache backend the shared version is only read once per check interval"""
+        call_command('createcachetable', verbosity=0)
+        get_reference_data()
+        with self.assertNumQueries(0):
+            get_teeth()
+            get_tooth_by_number_or_404(11)
+
+        # Once the interval is over, a read checks the version (one cache query)
+        with mock.patch('app.reference.time.monotonic', return_value=time.monotonic() + 60):
+            with self.assertNumQueries(1):
+                get_teeth()
+
+    def test_change_from_another_process_is_picked_up(self):
+        """Test that a bumped shared reference version reloads the snapshot at the next check"""
+        get_reference_data()
+        # Another worker or the release job adds a tooth without signals
+        # reaching this process; only the shared version changes
+        Tooth.objects.bulk_create([Tooth(number=12, name='Upper Right Lateral Incisor', quadrant=1, position=2)])
+        self.assertIsNone(get_reference_data().teeth_by_number.get(12))
+
+        bump_version(REFERENCE_SCOPE)
+        self.assertIsNone(get_reference_data().teeth_by_number.get(12))
+        with mock.patch('app.reference.time.monotonic', return_value=time.monotonic() + 60):
+            self.assertEqual(get_tooth_by_number_or_404(12).name, 'Upper Right Lateral Incisor')
+
+    def test_save_invalidates_cache(self):
+        """Test that saving a tooth or condition bumps the version and reloads"""
+        version = get_reference_data().version
+
+        self.tooth.name = 'Renamed Incisor'
+        self.tooth.save()
+        self.assertGreater(get_reference_data().version, version)
+        self.assertEqual(get_tooth_by_number_or_404(11).name, 'Renamed Incisor')
+
+        ToothCondition.objects.create(name='Crown')
+        self.assertEqual(len(get_conditions()), 2)
+
+    def test_delete_invalidates_cache(self):
+        """Test that deleting a tooth removes it from the cache"""
+        get_reference_data()
+        self.tooth.delete()
+        with self.assertRaises(Http404):
+            get_tooth_by_number_or_404(11)
+
+    def test_manual_invalidation(self):
+        """Test that invalidate_reference_data forces a reload"""
+        first = get_reference_data()
+        invalidate_reference_data()
+        self.assertIsNot(get_reference_data(), first)
+
+    def test_populate_teeth_invalidates_cache(self):
+        """Test that the populate_teeth command refreshes the cache"""
+        get_reference_data()
+        call_command('populate_teeth', stdout=StringIO())
+        self.assertEqual(len(get_teeth()), 32)
+        self.assertEqual(get_tooth_by_number_or_404(48).name, 'Lower Right Third Molar')
+
+
+class ToothLookupEndpointTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        username = f"testuser_{uuid.uuid4().hex[:8]}"
+        self.user = User.objects.create_user(
+            username=username,
+            email=f'{username}@example.com',
+            password='testpassword'
+        )
+        self.profile = UserProfile.objects.get(user=self.user)
+        self.profile.role = 'dentist'
+        self.profile.save()
+
+        self.patient = Patient.objects.create(
+            name='Test Patient',
+            age=30,
+            gender='M',
+            phone='1234567890'
+        )
+        Tooth.objects.create(number=11, name='Upper Right Central Incisor', quadrant=1, position=1)
+
+        self.client.login(username=self.user.username, password='testpassword')
+
+    def test_unknown_tooth_returns_404(self):
+        """Test that an unknown tooth number returns 404"""
+        response = self.client.get(reverse('get_tooth_treatments', kwargs={'tooth_id': 99}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_tooth_lookup_uses_cache(self):
+        """Test that the endpoint resolves the tooth without querying the Tooth table"""
+        url = reverse('get_tooth_treatments', kwargs={'tooth_id': 11})
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'patient_id': self.patient.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('FROM "app_tooth"' in q['sql'] for q in queries))
+        data = json.loads(response.content)
+        self.assertEqual(data['tooth_name'], 'Upper Right Central Incisor')
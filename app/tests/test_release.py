@@ -0,0 +1,107 @@
+import shutil
+import tempfile
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from app.models import Tooth, ToothCondition
+from app.release import migration_state, static_source_hash, collected_static_hash
+from app.seeding import SEED_USERNAMES, load_reference_fixture, seed, seed_is_complete
+
+
+class SeedingTest(TestCase):
+    def test_seed_is_complete_uses_one_query(self):
+        """The seed check costs a single query before and after seeding"""
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(seed_is_complete())
+        self.assertEqual(len(queries), 1)
+        
+        seed(log=lambda message: None)
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(seed_is_complete())
+        self.assertEqual(len(queries), 1)
+
+    def test_seed_is_idempotent(self):
+        """Seeding twice creates the data once"""
+        seed(log=lambda message: None)
+        seed(log=lambda message: None)
+        
+        self.assertEqual(User.objects.filter(username__in=SEED_USERNAMES).count(), len(SEED_USERNAMES))
+        fixture = load_reference_fixture()
+        self.assertEqual(Tooth.objects.count(), len(fixture.teeth))
+        self.assertEqual(ToothCondition.objects.count(), len(fixture.conditions))
+        self.assertEqual(User.objects.get(username='dentist').profile.role, 'dentist')
+
+    def test_missing_seed_user_is_recreated(self):
+        """A missing seed user makes the seed incomplete and is created again"""
+        seed(log=lambda message: None)
+        User.objects.filter(username='staff').delete()
+        
+        self.assertFalse(seed_is_complete())
+        seed(log=lambda message: None)
+        self.assertTrue(seed_is_complete())
+
+
+class ReleaseCommandTest(TestCase):
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root, ignore_errors=True)
+        # Plain storage keeps the test from compressing every admin asset
+        settings_override = override_settings(
+            STATIC_ROOT=self.static_root,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+            },
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def release(self, *args):
+        out = StringIO()
+        call_command('release', *args, verbosity=0, stdout=out)
+        return out.getvalue()
+
+    def test_no_pending_migrations_in_test_database(self):
+        """The test database has every migration applied"""
+        fingerprint, pending = migration_state()
+        self.assertEqual(pending, [])
+        self.assertEqual(len(fingerprint), 16)
+
+    def test_first_release_collects_static_and_seeds(self):
+        """A fresh install collects static files, records their hash and seeds"""
+        output = self.release()
+        
+        self.assertIn('skipping migrate', output)
+        self.assertIn('Collecting static files', output)
+        self.assertIn('Seeding initial data', output)
+        self.assertEqual(collected_static_hash(), static_source_hash())
+        self.assertTrue(seed_is_complete())
+
+    def test_second_release_skips_applied_steps(self):
+        """Running the release again skips every step"""
+        self.release()
+        output = self.release()
+        
+        self.assertIn('skipping migrate', output)
+        self.assertIn('skipping collectstatic', output)
+        self.assertIn('skipping seeding', output)
+
+    def test_force_runs_every_step(self):
+        """--force runs the steps even when they are applied"""
+        self.release()
+        output = self.release('--force')
+        
+        self.assertIn('Collecting static files', output)
+        self.assertIn('Seeding initial data', output)
+
+    def test_lost_hash_collects_again(self):
+        """Without a recorded hash, e.g. on a new static volume, collectstatic runs again"""
+        self.release()
+        shutil.rmtree(self.static_root)
+        
+        self.assertIsNone(collected_static_hash())
+        self.assertIn('Collecting static files', self.release())
@@ -0,0 +1,158 @@
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.contrib.auth.models import User
+from app.models import UserProfile, Patient
+from app.search import search_patients
+from app.pagination import keyset_paginate, encode_cursor, InvalidCursor
+import json
+import uuid
+
+
+class PatientSearchTest(TestCase):
+    def setUp(self):
+        self.john = Patient.objects.create(name='John Smith', age=30, gender='M', phone='(987) 654-3210')
+        self.jane = Patient.objects.create(name='Jane Johnson', age=28, gender='F', phone='555-123-4567')
+        self.bob = Patient.objects.create(name='Bob Stone', age=45, gender='M', phone='+1 555 999 0000')
+
+    def test_phone_is_normalized_on_save(self):
+        """Test that the digits-only phone column is kept up to date"""
+        self.assertEqual(self.john.phone_normalized, '9876543210')
+
+        self.john.phone = '111-222'
+        self.john.save(update_fields=['phone'])
+        self.john.refresh_from_db()
+        self.assertEqual(self.john.phone_normalized, '111222')
+
+    def test_name_contains_and_prefix_modes(self):
+        """Test that names match by substring or by prefix"""
+        self.assertEqual(set(search_patients('john')), {self.john, self.jane})
+        self.assertEqual(set(search_patients('john', mode='prefix')), {self.john})
+
+    def test_phone_prefix_ignores_formatting(self):
+        """Test that phone searches match on digits regardless of punctuation"""
+        self.assertEqual(list(search_patients('987-654')), [self.john])
+        self.assertEqual(list(search_patients('(555) 123')), [self.jane])
+        # Only prefixes match, not digits in the middle of the number
+        self.assertEqual(list(search_patients('654')), [])
+
+    def test_numeric_query_matches_id(self):
+        """Test that a numeric query matches the patient ID"""
+        self.assertIn(self.bob, search_patients(str(self.bob.id)))
+
+    def test_empty_query_returns_everyone(self):
+        """Test that an empty search does not filter"""
+        self.assertEqual(search_patients('').count(), 3)
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        # Several patients share a name so the id tie-breaker is exercised
+        for i in range(7):
+            Patient.objects.create(name=f'Patient {i % 3}', age=20 + i, gender='O', phone=f'555000{i}')
+
+    def test_pages_cover_every_row_once(self):
+        """Test that walking the cursors returns each row exactly once, in order"""
+        ordering = ('name', 'id')
+        seen = []
+        cursor = None
+        while True:
+            page = keyset_paginate(Patient.objects.all(), ordering, cursor=cursor, page_size=3)
+            seen.extend(page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+
+        self.assertEqual(seen, list(Patient.objects.order_by(*ordering)))
+
+    def test_descending_ordering(self):
+        """Test that descending fields page in reverse order"""
+        first = keyset_paginate(Patient.objects.all(), ('-created_at', '-id'), page_size=4)
+        second = keyset_paginate(Patient.objects.all(), ('-created_at', '-id'), cursor=first.next_cursor, page_size=4)
+        self.assertEqual(len(first), 4)
+        self.assertEqual(len(second), 3)
+        self.assertFalse(second.has_next)
+        self.assertEqual(
+            [p.id for p in first] + [p.id for p in second],
+            list(Patient.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        )
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected"""
+        with self.assertRaises(InvalidCursor):
+            keyset_paginate(Patient.objects.all(), ('name', 'id'), cursor='not-a-cursor')
+
+    def test_cursor_with_wrong_types(self):
+        """Test that a well-formed cursor whose values do not fit the fields is rejected"""
+        for values in (['Alice', 'y'], ['Alice', None], ['Alice', [1]]):
+            with self.assertRaises(InvalidCursor):
+                keyset_paginate(Patient.objects.all(), ('name', 'id'), cursor=encode_cursor(values))
+        with self.assertRaises(InvalidCursor):
+            keyset_paginate(Patient.objects.all(), ('-created_at', '-id'), cursor=encode_cursor(['yesterday', 1]))
+
+
+class PatientSearchViewsTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        username = f"staff_{uuid.uuid4().hex[:8]}"
+        self.user = User.objects.create_user(
+            username=username,
+            email=f'{username}@example.com',
+            password='testpassword'
+        )
+        self.profile = UserProfile.objects.get(user=self.user)
+        self.profile.role = 'staff'
+        self.profile.save()
+
+        for i in range(30):
+            Patient.objects.create(name=f'Alice {i:02d}', age=30, gender='F', phone=f'444{i:07d}')
+        self.client.login(username=self.user.username, password='testpassword')
+
+    def test_patient_list_is_paginated(self):
+        """Test that the patient list shows one page and links to the next"""
+        response = self.client.get(reverse('patient_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['patients']), 25)
+        self.assertIsNotNone(response.context['next_cursor'])
+
+        response = self.client.get(reverse('patient_list'), {'after': response.context['next_cursor']})
+        self.assertEqual(len(response.context['patients']), 5)
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_patient_list_invalid_cursor_shows_first_page(self):
+        """Test that a broken cursor falls back to the first page"""
+        response = self.client.get(reverse('patient_list'), {'after': '!!!'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['patients']), 25)
+
+    def test_autocomplete_api(self):
+        """Test that the autocomplete API returns the top matches in name order"""
+        response = self.client.get(reverse('patient_search_api'), {'q': 'alice', 'limit': 5})
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual([r['name'] for r in data['results']], [f'Alice {i:02d}' for i in range(5)])
+        self.assertIsNotNone(data['next_cursor'])
+
+        response = self.client.get(reverse('patient_search_api'), {
+            'q': 'alice', 'limit': 5, 'cursor': data['next_cursor']
+        })
+        data = json.loads(response.content)
+        self.assertEqual(data['results'][0]['name'], 'Alice 05')
+
+    def test_autocomplete_api_phone_search(self):
+        """Test that the autocomplete API matches phone prefixes"""
+        response = self.client.get(reverse('patient_search_api'), {'q': '444 000 0012'})
+        data = json.loads(response.content)
+        self.assertEqual([r['name'] for r in data['results']], ['Alice 12'])
+
+    def test_autocomplete_api_invalid_parameters(self):
+        """Test that invalid modes, limits and cursors are rejected"""
+        url = reverse('patient_search_api')
+        self.assertEqual(self.client.get(url, {'mode': 'fuzzy'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'limit': 'ten'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'cursor': '!!!'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'cursor': encode_cursor(['Alice', 'y'])}).status_code, 400)
+
+    def test_patient_list_cursor_with_wrong_types(self):
+        """Test that the patient list falls back to the first page for a mistyped cursor"""
+        response = self.client.get(reverse('patient_list'), {'after': encode_cursor(['not-a-date', 'x'])})
+        self.assertEqual(response.status_code, 200)
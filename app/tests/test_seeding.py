@@ -0,0 +1,222 @@
+import json
+import os
+import shutil
+import tempfile
+from importlib import import_module
+from io import StringIO
+from django.apps import apps
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from app.models import Patient, Tooth, ToothCondition, Treatment, SeedVersion
+from app.reference import get_reference_data
+from app.seeding import (
+    REFERENCE_SEED, fixture_versions, load_reference_fixture, diff_reference_data, seed_reference_data,
+    seed_is_complete,
+)
+
+
+def quiet(message):
+    pass
+
+
+class ReferenceSeedingTest(TestCase):
+    def setUp(self):
+        self.fixture = load_reference_fixture()
+
+    def test_fixture_uses_two_digit_numbers(self):
+        """The reference fixture numbers teeth by quadrant and position"""
+        self.assertEqual(len(self.fixture.teeth), 32)
+        for tooth in self.fixture.teeth:
+            self.assertEqual(tooth['number'], tooth['quadrant'] * 10 + tooth['position'])
+        self.assertEqual(len({c['name'] for c in self.fixture.conditions}), len(self.fixture.conditions))
+
+    def test_diff_uses_one_query(self):
+        """The current teeth and conditions are read with a single query"""
+        with CaptureQueriesContext(connection) as queries:
+            diff = diff_reference_data(self.fixture)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(len(diff.teeth), len(self.fixture.teeth))
+        self.assertEqual(len(diff.conditions), len(self.fixture.conditions))
+
+    def test_seed_creates_reference_data_and_records_version(self):
+        """Seeding creates every tooth and condition and records the fixture version"""
+        seed_reference_data(log=quiet)
+        
+        self.assertEqual(
+            list(Tooth.objects.values_list('number', flat=True)),
+            sorted(tooth['number'] for tooth in self.fixture.teeth)
+        )
+        self.assertEqual(ToothCondition.objects.count(), len(self.fixture.conditions))
+        self.assertEqual(SeedVersion.objects.get(name=REFERENCE_SEED).version, self.fixture.version)
+
+    def test_second_seed_writes_no_reference_rows(self):
+        """Seeding an up to date database writes no teeth or conditions"""
+        seed_reference_data(log=quiet)
+        
+        with CaptureQueriesContext(connection) as queries:
+            diff = seed_reference_data(log=quiet)
+        self.assertEqual((diff.teeth, diff.conditions), ([], []))
+        for query in queries:
+            self.assertNotIn('app_tooth', query['sql'].split('FROM')[0])
+
+    def test_seed_updates_changed_rows_and_keeps_treatments(self):
+        """Changed rows are updated in place, and unknown rows and their treatments are kept"""
+        tooth = Tooth.objects.create(number=11, name='Renamed', quadrant=1, position=1)
+        condition = ToothCondition.objects.create(name='Cavity', description='Old description')
+        custom = ToothCondition.objects.create(name='Custom', description='Added by the clinic')
+        patient = Patient.objects.create(name='Seed Patient', age=35, gender='F', phone='1234567890')
+        treatment = Treatment.objects.create(
+            patient=patient, tooth=tooth, condition=custom, description='Keep me'
+        )
+        
+        seed_reference_data(log=quiet)
+        
+        tooth.refresh_from_db()
+        condition.refresh_from_db()
+        self.assertEqual(tooth.name, 'Upper Right Central Incisor')
+        self.assertEqual(condition.description, 'Dental decay requiring filling')
+        self.assertTrue(ToothCondition.objects.filter(pk=custom.pk).exists())
+        self.assertTrue(Treatment.objects.filter(pk=treatment.pk, tooth=tooth).exists())
+        self.assertEqual(Tooth.objects.count(), len(self.fixture.teeth))
+
+    def test_seed_refreshes_cached_reference_data(self):
+        """The cached reference snapshot is dropped even though bulk_create sends no signals"""
+        self.assertEqual(len(get_reference_data().teeth), 0)
+        seed_reference_data(log=quiet)
+        self.assertEqual(len(get_reference_data().teeth), len(self.fixture.teeth))
+
+    def test_populate_teeth_keeps_treatments(self):
+        """populate_teeth no longer deletes teeth and the treatments on them"""
+        seed_reference_data(log=quiet)
+        patient = Patient.objects.create(name='Seed Patient', age=35, gender='F', phone='1234567890')
+        treatment = Treatment.objects.create(
+            patient=patient, tooth=Tooth.objects.get(number=36), condition=ToothCondition.objects.get(name='Crown'),
+            description='Crown on 36'
+        )
+        
+        out = StringIO()
+        call_command('populate_teeth', stdout=out)
+        
+        self.assertIn('0 teeth and 0 tooth conditions written', out.getvalue())
+        self.assertTrue(Treatment.objects.filter(pk=treatment.pk).exists())
+
+    def test_unique_number_and_name(self):
+        """Tooth numbers and condition names are unique"""
+        Tooth.objects.create(number=11, name='Upper Right Central Incisor', quadrant=1, position=1)
+        ToothCondition.objects.create(name='Cavity')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Tooth.objects.create(number=11, name='Duplicate')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ToothCondition.objects.create(name='Cavity')
+
+
+class VersionedFixtureTest(TestCase):
+    def setUp(self):
+        self.fixture_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.fixture_dir, ignore_errors=True)
+        self.write_fixture(1, [{'name': 'Cavity', 'description': 'Tooth decay'}])
+
+    def write_fixture(self, version, conditions):
+        teeth = [{'number': 11, 'name': 'Upper Right Central Incisor', 'quadrant': 1, 'position': 1}]
+        with open(os.path.join(self.fixture_dir, f'reference-{version:04d}.json'), 'w') as f:
+            json.dump({'teeth': teeth, 'conditions': conditions}, f)
+
+    def test_latest_version_is_applied(self):
+        """A new fixture version makes the seed incomplete until it is applied"""
+        seed_reference_data(log=quiet, fixture_dir=self.fixture_dir)
+        self.write_fixture(2, [
+            {'name': 'Cavity', 'description': 'Tooth decay'},
+            {'name': 'Chip', 'description': 'Chipped enamel'},
+        ])
+        
+        self.assertEqual(SeedVersion.objects.get(name=REFERENCE_SEED).version, 1)
+        self.assertFalse(seed_is_complete(fixture_dir=self.fixture_dir))
+        
+        diff = seed_reference_data(log=quiet, fixture_dir=self.fixture_dir)
+        self.assertEqual([condition['name'] for condition in diff.conditions], ['Chip'])
+        self.assertEqual(SeedVersion.objects.get(name=REFERENCE_SEED).version, 2)
+
+    def test_unpadded_file_names_are_ignored(self):
+        """Only reference-NNNN.json files count as fixture versions"""
+        for name in ('reference-2.json', 'reference-00003.json'):
+            with open(os.path.join(self.fixture_dir, name), 'w') as f:
+                json.dump({'teeth': [], 'conditions': []}, f)
+        
+        self.assertEqual(fixture_versions(self.fixture_dir), [1])
+        self.assertEqual(load_reference_fixture(fixture_dir=self.fixture_dir).version, 1)
+
+    def test_unknown_version_is_rejected(self):
+        """Asking for a fixture version that does not exist raises ValueError"""
+        with self.assertRaises(ValueError):
+            seed_reference_data(version=5, log=quiet, fixture_dir=self.fixture_dir)
+
+
+class LegacyTeethMigrationTest(TestCase):
+    def test_legacy_numbers_are_converted(self):
+        """Teeth numbered 1-32 by the old init_db.py get their two-digit numbers"""
+        migration = import_module('app.migrations.0011_reference_unique_seedversion')
+        # The old layout counted quadrant 1 from the third molar
+        legacy = Tooth.objects.create(number=1, name='Upper Right Third Molar', quadrant=1, position=1)
+        lower_left = Tooth.objects.create(number=24, name='Lower Left Central Incisor', quadrant=3, position=8)
+        current = Tooth.objects.create(number=8, name='Upper Right Central Incisor', quadrant=1, position=1)
+        
+        migration.renumber_legacy_teeth(apps, None)
+        
+        legacy.refresh_from_db()
+        lower_left.refresh_from_db()
+        self.assertEqual((legacy.number, legacy.position), (18, 8))
+        self.assertEqual((lower_left.number, lower_left.position), (31, 1))
+        # Legacy number for this name, so it moves too
+        current.refresh_from_db()
+        self.assertEqual(current.number, 11)
+
+
+class DuplicateReferenceMigrationTest(TransactionTestCase):
+    before = [('app', '0010_composite_indexes')]
+
+    def setUp(self):
+        # Go back to before the unique constraints so duplicates can exist
+        self.migration = import_module('app.migrations.0011_reference_unique_seedversion')
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        executor.loader.build_graph()
+        self.old_apps = executor.loader.project_state(self.before).apps
+
+    def tearDown(self):
+        # Leftover duplicates would stop the migration back to the latest state
+        for model in ('Treatment', 'Tooth', 'ToothCondition'):
+            self.old_apps.get_model('app', model).objects.all().delete()
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_identical_rows_are_merged(self):
+        """Duplicates that agree on everything are merged into the oldest row"""
+        Tooth = self.old_apps.get_model('app', 'Tooth')
+        Patient = self.old_apps.get_model('app', 'Patient')
+        Treatment = self.old_apps.get_model('app', 'Treatment')
+        ToothCondition = self.old_apps.get_model('app', 'ToothCondition')
+        keep = Tooth.objects.create(number=11, name='Upper Right Central Incisor', quadrant=1, position=1)
+        extra = Tooth.objects.create(number=11, name='Upper Right Central Incisor', quadrant=1, position=1)
+        condition = ToothCondition.objects.create(name='Cavity', description='Tooth decay')
+        ToothCondition.objects.create(name='Cavity', description='Tooth decay')
+        patient = Patient.objects.create(name='Merge Patient', age=30, gender='F', phone='5550006601')
+        treatment = Treatment.objects.create(patient=patient, tooth=extra, condition=condition, description='Filling')
+        
+        self.migration.merge_duplicate_reference_data(self.old_apps, None)
+        
+        self.assertEqual(list(Tooth.objects.values_list('pk', flat=True)), [keep.pk])
+        self.assertEqual(ToothCondition.objects.count(), 1)
+        self.assertEqual(Treatment.objects.get(pk=treatment.pk).tooth_id, keep.pk)
+
+    def test_conflicting_rows_stop_the_migration(self):
+        """Duplicates that differ in name, quadrant or position are left for a person to fix"""
+        Tooth = self.old_apps.get_model('app', 'Tooth')
+        first = Tooth.objects.create(number=11, name='Upper Right Central Incisor', quadrant=1, position=1)
+        second = Tooth.objects.create(number=11, name='Upper Left Central Incisor', quadrant=2, position=1)
+        
+        with self.assertRaisesMessage(RuntimeError, f"number 11 (ids {first.pk}, {second.pk})"):
+            self.migration.merge_duplicate_reference_data(self.old_apps, None)
+        self.assertEqual(Tooth.objects.count(), 2)
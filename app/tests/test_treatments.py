@@ -0,0 +1,355 @@
+from datetime import date, time
+from decimal import Decimal
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from django.contrib.auth.models import User
+from app.models import UserProfile, Patient, Appointment, Tooth, ToothCondition, Treatment, TreatmentHistory
+from app.caching import get_version, patient_scope
+from app.reference import get_reference_data
+from app.treatments import (
+    InvalidTransition, InvalidTreatmentPlan, PatientMismatch, PlanItem, add_treatments, can_transition, parse_plan,
+    transition_treatments,
+)
+import json
+import uuid
+
+
+class AddTreatmentsTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.dentist = User.objects.create_user(
+            username=f'dentist_{uuid.uuid4().hex[:8]}',
+            password='password123',
+            first_name='Plan',
+            last_name='Dentist'
+        )
+        profile = UserProfile.objects.get(user=self.dentist)
+        profile.role = 'dentist'
+        profile.save()
+        self.client.login(username=self.dentist.username, password='password123')
+
+        self.patient = Patient.objects.create(name='Plan Patient', age=50, gender='M', phone='5550007701')
+        self.teeth = [
+            Tooth.objects.create(number=quadrant * 10 + position, name=f'Tooth {quadrant}{position}',
+                                 quadrant=quadrant, position=position)
+            for quadrant in range(1, 5)
+            for position in range(1, 9)
+        ]
+        self.cavity = ToothCondition.objects.create(name='Cavity', description='Tooth decay')
+        self.crown = ToothCondition.objects.create(name='Crown', description='Crown needed')
+        self.appointment = Appointment.objects.create(
+            patient=self.patient,
+            dentist=self.dentist,
+            date=date.today(),
+            start_time=time(10, 0),
+            end_time=time(11, 0),
+            status='scheduled'
+        )
+        self.url = reverse('add_treatment', kwargs={'patient_id': self.patient.id})
+
+    def plan(self, teeth, condition=None, status='planned', cost=Decimal('100.00')):
+        return PlanItem(
+            tooth_ids=[tooth.id for tooth in teeth],
+            condition_id=(condition or self.cavity).id,
+            description='Plan item',
+            status=status,
+            cost=cost,
+        )
+
+    def test_full_mouth_plan_uses_fixed_queries(self):
+        """Test that a 32 tooth plan is written with a fixed number of queries"""
+        get_reference_data()
+        with CaptureQueriesContext(connection) as queries:
+            result = add_treatments(
+                self.patient,
+                [self.plan(self.teeth[:16]), self.plan(self.teeth[16:], condition=self.crown)],
+                self.dentist,
+                appointment=self.appointment
+            )
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 2)
+        self.assertLessEqual(len(queries), 6)
+        self.assertEqual(len(result.treatments), 32)
+        self.assertEqual(Treatment.objects.filter(patient=self.patient).count(), 32)
+        self.assertEqual(TreatmentHistory.objects.filter(treatment__patient=self.patient).count(), 32)
+        self.assertEqual(Treatment.objects.filter(condition=self.crown).count(), 16)
+
+    def test_history_rows_match_treatments(self):
+        """Test that each treatment gets an initial history row"""
+        result = add_treatments(self.patient, [self.plan(self.teeth[:2], status='in_progress')], self.dentist)
+        for treatment in result.treatments:
+            history = TreatmentHistory.objects.get(treatment=treatment)
+            self.assertIsNone(history.previous_status)
+            self.assertEqual(history.new_status, 'in_progress')
+            self.assertEqual(history.dentist, self.dentist)
+            self.assertIn('In Progress', history.notes)
+
+    def test_unknown_teeth_are_skipped(self):
+        """Test that unknown tooth ids are reported instead of saved"""
+        item = self.plan(self.teeth[:1])._replace(tooth_ids=[self.teeth[0].id, 999999])
+        result = add_treatments(self.patient, [item], self.dentist)
+        self.assertEqual(len(result.treatments), 1)
+        self.assertEqual(result.skipped_tooth_ids, [999999])
+
+    def test_invalid_plan_saves_nothing(self):
+        """Test that one invalid item rejects the whole plan"""
+        with self.assertRaises(InvalidTreatmentPlan):
+            add_treatments(
+                self.patient,
+                [self.plan(self.teeth[:4]), self.plan(self.teeth[4:8], status='unknown')],
+                self.dentist
+            )
+        self.assertFalse(Treatment.objects.exists())
+
+    def test_patient_version_is_bumped(self):
+        """Test that bulk creation invalidates the patient's cached fragments"""
+        before = get_version(patient_scope(self.patient.pk))
+        add_treatments(self.patient, [self.plan(self.teeth[:1])], self.dentist)
+        self.assertNotEqual(get_version(patient_scope(self.patient.pk)), before)
+
+    def test_parse_plan_rejects_bad_items(self):
+        """Test that malformed JSON items are rejected"""
+        for items in ([], [{'tooth_ids': [], 'condition': 1}], [{'tooth_ids': ['x'], 'condition': 1}],
+                      [{'tooth_ids': [1], 'condition': 1, 'cost': 'free'}]):
+            with self.assertRaises(InvalidTreatmentPlan):
+                parse_plan(items)
+
+    def test_json_payload(self):
+        """Test that a JSON plan with several conditions is saved in one request"""
+        payload = {
+            'appointment': self.appointment.id,
+            'items': [
+                {'tooth_ids': [t.id for t in self.teeth[:8]], 'condition': self.cavity.id,
+                 'status': 'planned', 'cost': '80.00', 'description': 'Fillings'},
+                {'tooth_ids': [t.id for t in self.teeth[8:10]] + [999999], 'condition': self.crown.id,
+                 'status': 'planned', 'cost': 600},
+            ],
+        }
+        response = self.client.post(self.url, json.dumps(payload), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['created'], 10)
+        self.assertEqual(len(data['treatment_ids']), 10)
+        self.assertEqual(data['skipped_tooth_ids'], [999999])
+        self.assertEqual(Treatment.objects.filter(appointment=self.appointment).count(), 10)
+        self.assertEqual(Treatment.objects.get(id=data['treatment_ids'][-1]).cost, Decimal('600.00'))
+
+    def test_json_payload_errors(self):
+        """Test that invalid JSON plans return 400 and save nothing"""
+        response = self.client.post(self.url, 'not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        payload = {'items': [{'tooth_ids': [self.teeth[0].id], 'condition': 999999, 'status': 'planned'}]}
+        response = self.client.post(self.url, json.dumps(payload), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+        self.assertFalse(Treatment.objects.exists())
+
+    def test_form_post_creates_treatments(self):
+        """Test that the chart form still creates one treatment per selected tooth"""
+        response = self.client.post(self.url, {
+            'tooth_ids': ','.join(str(t.id) for t in self.teeth[:3]),
+            'condition': self.cavity.id,
+            'description': 'Sealants',
+            'status': 'planned',
+            'cost': ''
+        })
+        self.assertRedirects(response, reverse('dental_chart', kwargs={'patient_id': self.patient.id}))
+        self.assertEqual(Treatment.objects.filter(patient=self.patient, cost=0).count(), 3)
+
+
+class TransitionTreatmentsTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.dentist = User.objects.create_user(
+            username=f'dentist_{uuid.uuid4().hex[:8]}',
+            password='password123',
+            first_name='Status',
+            last_name='Dentist'
+        )
+        profile = UserProfile.objects.get(user=self.dentist)
+        profile.role = 'dentist'
+        profile.save()
+        self.client.login(username=self.dentist.username, password='password123')
+
+        self.patient = Patient.objects.create(name='Status Patient', age=35, gender='F', phone='5550007702')
+        self.condition = ToothCondition.objects.create(name='Cavity', description='Tooth decay')
+        self.teeth = [
+            Tooth.objects.create(number=10 + position, name=f'Tooth 1{position}', quadrant=1, position=position)
+            for position in range(1, 9)
+        ]
+        self.appointment = Appointment.objects.create(
+            patient=self.patient,
+            dentist=self.dentist,
+            date=date.today(),
+            start_time=time(14, 0),
+            end_time=time(15, 0),
+            status='scheduled'
+        )
+        self.treatments = [
+            Treatment.objects.create(
+                patient=self.patient,
+                tooth=tooth,
+                condition=self.condition,
+                appointment=self.appointment,
+                description='Filling',
+                status='planned',
+                cost=Decimal('90.00')
+            )
+            for tooth in self.teeth
+        ]
+        self.url = reverse('treatment_bulk_status')
+
+    def post(self, payload):
+        return self.client.post(self.url, json.dumps(payload), content_type='application/json')
+
+    def test_transition_table(self):
+        """Test that the transition table allows reopening but not skipping back"""
+        self.assertTrue(can_transition('planned', 'completed'))
+        self.assertTrue(can_transition('cancelled', 'planned'))
+        self.assertFalse(can_transition('completed', 'planned'))
+        self.assertFalse(can_transition('cancelled', 'completed'))
+
+    def test_bulk_transition_uses_one_update(self):
+        """Test that many treatments move with one UPDATE and one history insert"""
+        with CaptureQueriesContext(connection) as queries:
+            result = transition_treatments(
+                Treatment.objects.filter(appointment=self.appointment), 'completed', self.dentist
+            )
+        statements = [q['sql'].split()[0] for q in queries.captured_queries]
+        self.assertEqual(statements.count('UPDATE'), 1)
+        self.assertEqual(statements.count('INSERT'), 1)
+        self.assertEqual(len(result.updated_ids), 8)
+        self.assertEqual(Treatment.objects.filter(status='completed').count(), 8)
+        history = TreatmentHistory.objects.filter(new_status='completed')
+        self.assertEqual(history.count(), 8)
+        self.assertTrue(all(h.previous_status == 'planned' and h.appointment_id == self.appointment.id for h in history))
+
+    def test_disallowed_transition_changes_nothing(self):
+        """Test that one disallowed move rejects the whole batch"""
+        self.treatments[0].status = 'completed'
+        self.treatments[0].save()
+        with self.assertRaises(InvalidTransition) as raised:
+            transition_treatments(Treatment.objects.filter(patient=self.patient), 'planned', self.dentist)
+        self.assertEqual(raised.exception.rejected, [(self.treatments[0].id, 'completed')])
+        self.assertEqual(Treatment.objects.filter(status='planned').count(), 7)
+        self.assertFalse(TreatmentHistory.objects.exists())
+
+    def test_unchanged_treatments_get_no_history(self):
+        """Test that treatments already in the target status are left alone"""
+        self.treatments[0].status = 'in_progress'
+        self.treatments[0].save()
+        result = transition_treatments(Treatment.objects.filter(patient=self.patient), 'in_progress', self.dentist)
+        self.assertEqual(result.unchanged_ids, [self.treatments[0].id])
+        self.assertEqual(TreatmentHistory.objects.count(), 7)
+
+    def test_api_completes_planned_treatments_of_appointment(self):
+        """Test that the API completes all planned treatments of an appointment"""
+        self.treatments[0].status = 'cancelled'
+        self.treatments[0].save()
+        before = get_version(patient_scope(self.patient.pk))
+        response = self.post({'appointment': self.appointment.id, 'from_status': 'planned', 'status': 'completed'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['updated_ids']), 7)
+        self.assertEqual(Treatment.objects.get(pk=self.treatments[0].pk).status, 'cancelled')
+        self.assertNotEqual(get_version(patient_scope(self.patient.pk)), before)
+
+    def test_api_by_ids(self):
+        """Test that the API moves listed treatments and reports missing ids"""
+        ids = [t.id for t in self.treatments[:3]]
+        response = self.post({'treatment_ids': ids + [999999], 'status': 'in_progress'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(sorted(data['updated_ids']), sorted(ids))
+        self.assertEqual(data['missing_ids'], [999999])
+
+    def test_api_rejects_invalid_requests(self):
+        """Test that invalid requests return 400 and change nothing"""
+        Treatment.objects.filter(pk=self.treatments[0].pk).update(status='completed')
+        response = self.post({'treatment_ids': [self.treatments[0].id], 'status': 'cancelled'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['rejected'], [{'id': self.treatments[0].id, 'status': 'completed'}])
+
+        self.assertEqual(self.post({'treatment_ids': [1], 'status': 'done'}).status_code, 400)
+        self.assertEqual(self.post({'status': 'completed'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        self.assertFalse(TreatmentHistory.objects.exists())
+
+    def test_api_rejects_treatments_of_other_patient(self):
+        """Test that treatments of another patient cannot be recorded against an appointment"""
+        other_patient = Patient.objects.create(name='Other Patient', age=50, gender='M', phone='5550007703')
+        foreign = Treatment.objects.create(
+            patient=other_patient,
+            tooth=self.teeth[0],
+            condition=self.condition,
+            description='Crown',
+            status='planned',
+            cost=Decimal('300.00')
+        )
+        response = self.post({
+            'treatment_ids': [self.treatments[0].id, foreign.id],
+            'appointment': self.appointment.id,
+            'status': 'in_progress',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['other_patient_ids'], [foreign.id])
+        self.assertEqual(Treatment.objects.filter(status='in_progress').count(), 0)
+        foreign.refresh_from_db()
+        self.assertIsNone(foreign.appointment_id)
+        self.assertFalse(TreatmentHistory.objects.exists())
+
+        with self.assertRaises(PatientMismatch):
+            transition_treatments(Treatment.objects.filter(pk=foreign.pk), 'completed', self.dentist, self.appointment)
+
+    def test_update_records_referer_appointment(self):
+        """Test that a status change from an appointment page is recorded against that appointment"""
+        other = Appointment.objects.create(
+            patient=self.patient,
+            dentist=self.dentist,
+            date=date.today(),
+            start_time=time(16, 0),
+            end_time=time(16, 30),
+            status='scheduled'
+        )
+        referer = reverse('appointment_detail', kwargs={'pk': other.id})
+        response = self.client.post(reverse('treatment_update', kwargs={'pk': self.treatments[0].pk}), {
+            'status': 'in_progress',
+            'description': 'Started',
+            'cost': '90.00',
+            'referer': referer,
+        })
+        self.assertRedirects(response, referer)
+        history = TreatmentHistory.objects.get(treatment=self.treatments[0])
+        self.assertEqual(history.appointment, other)
+
+    def test_update_rejects_disallowed_transition(self):
+        """Test that the single update form refuses a disallowed status change"""
+        Treatment.objects.filter(pk=self.treatments[0].pk).update(status='completed')
+        self.client.post(reverse('treatment_update', kwargs={'pk': self.treatments[0].pk}), {
+            'status': 'cancelled',
+            'description': 'Filling',
+            'cost': '90.00',
+        })
+        self.assertEqual(Treatment.objects.get(pk=self.treatments[0].pk).status, 'completed')
+        self.assertFalse(TreatmentHistory.objects.exists())
+
+    def test_update_form_offers_allowed_moves_only(self):
+        """Test that the update form lists the current status and the ones it may move to"""
+        Treatment.objects.filter(pk=self.treatments[0].pk).update(status='completed')
+        response = self.client.get(reverse('treatment_update', kwargs={'pk': self.treatments[0].pk}))
+        self.assertEqual([value for value, label in response.context['status_choices']], ['in_progress', 'completed'])
+        self.assertContains(response, '<option value="completed" selected>Completed</option>', html=True)
+        self.assertNotContains(response, 'value="planned"')
+        self.assertNotContains(response, 'value="cancelled"')
+
+    def test_update_ignores_external_referer(self):
+        """Test that the update view does not redirect to another site"""
+        response = self.client.post(reverse('treatment_update', kwargs={'pk': self.treatments[0].pk}), {
+            'status': 'in_progress',
+            'description': 'Filling',
+            'cost': '90.00',
+            'referer': 'https://example.com/phish',
+        })
+        self.assertRedirects(response, reverse('appointment_detail', kwargs={'pk': self.appointment.id}))
@@ -0,0 +1,235 @@
+"""
+Batch creation and status changes of treatments.
+
+A treatment plan is a list of PlanItems, each applying one condition,
+description, status and cost to a set of teeth. add_treatments validates the
+whole plan against the reference data (no queries once it is loaded), then
+writes every Treatment and its initial TreatmentHistory row with two
+bulk_create calls inside one transaction: either the whole plan is recorded
+or nothing is.
+
+transition_treatments moves many treatments to a new status at once: one
+UPDATE for the treatments and one bulk_create for their history rows, in the
+same transaction. Every move is checked against ALLOWED_TRANSITIONS first and
+a single disallowed one rejects the whole batch.
+
+Neither update() nor bulk_create sends post_save, so the patients' cached
+fragments are invalidated here rather than by app.signals.
+"""
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.utils import timezone
+from .caching import invalidate_patients
+from .models import Treatment, TreatmentHistory
+from .reference import get_reference_data
+
+STATUS_DISPLAY = dict(Treatment.STATUS_CHOICES)
+
+# Statuses each status may move to. Completed and cancelled treatments can
+# only be reopened.
+ALLOWED_TRANSITIONS = {
+    'planned': ('in_progress', 'completed', 'cancelled'),
+    'in_progress': ('planned', 'completed', 'cancelled'),
+    'completed': ('in_progress',),
+    'cancelled': ('planned',),
+}
+
+PlanItem = namedtuple('PlanItem', ['tooth_ids', 'condition_id', 'description', 'status', 'cost'])
+
+# treatments: the created Treatment objects, in plan order
+# skipped_tooth_ids: requested tooth ids that matched no tooth
+BatchResult = namedtuple('BatchResult', ['treatments', 'skipped_tooth_ids'])
+
+# updated_ids: treatments moved to the new status
+# unchanged_ids: treatments that already had it
+TransitionResult = namedtuple('TransitionResult', ['updated_ids', 'unchanged_ids'])
+
+
+class InvalidTreatmentPlan(ValueError):
+    """Raised when a treatment plan cannot be recorded; nothing is saved."""
+
+
+class InvalidTransition(ValueError):
+    """Raised when a status change is not allowed; nothing is saved."""
+
+    def __init__(self, new_status, rejected=()):
+        # rejected is a list of (treatment_id, current_status)
+        self.new_status = new_status
+        self.rejected = list(rejected)
+        if new_status not in STATUS_DISPLAY:
+            message = f'Unknown status: {new_status}'
+        else:
+            moves = ', '.join(
+                f'#{treatment_id} from {STATUS_DISPLAY.get(status, status)}' for treatment_id, status in self.rejected
+            )
+            message = f'Cannot move treatments to {STATUS_DISPLAY[new_status]}: {moves}'
+        super().__init__(message)
+
+
+class PatientMismatch(ValueError):
+    """Raised when treatments of another patient are recorded against an appointment; nothing is saved."""
+
+    def __init__(self, appointment, treatment_ids):
+        self.appointment = appointment
+        self.treatment_ids = list(treatment_ids)
+        ids = ', '.join(f'#{treatment_id}' for treatment_id in self.treatment_ids)
+        super().__init__(f'Treatments {ids} do not belong to the patient of appointment #{appointment.pk}')
+
+
+def can_transition(current_status, new_status):
+    """Return whether a treatment may move from current_status to new_status."""
+    return new_status in ALLOWED_TRANSITIONS.get(current_status, ())
+
+
+def parse_cost(value):
+    """Convert a submitted cost to Decimal, raising InvalidTreatmentPlan if it is not a valid amount."""
+    if value is None or str(value).strip() == '':
+        return Decimal('0')
+    try:
+        cost = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise InvalidTreatmentPlan(f'Invalid cost: {value!r}')
+    if not cost.is_finite() or cost < 0:
+        raise InvalidTreatmentPlan(f'Invalid cost: {value!r}')
+    return cost.quantize(Decimal('0.01'))
+
+
+def parse_plan(items):
+    """
+    Build PlanItems from decoded JSON.
+
+    Each item is a dict with 'tooth_ids' (list of ids), 'condition' (id),
+    'status' and optional 'description' and 'cost'.
+    """
+    if not isinstance(items, list) or not items:
+        raise InvalidTreatmentPlan('items must be a non-empty list')
+
+    plan = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise InvalidTreatmentPlan(f'items[{index}] must be an object')
+        tooth_ids = item.get('tooth_ids')
+        if not isinstance(tooth_ids, list) or not tooth_ids:
+            raise InvalidTreatmentPlan(f'items[{index}].tooth_ids must be a non-empty list')
+        try:
+            tooth_ids = [int(tooth_id) for tooth_id in tooth_ids]
+            condition_id = int(item.get('condition'))
+        except (TypeError, ValueError):
+            raise InvalidTreatmentPlan(f'items[{index}] has an invalid tooth or condition id')
+        plan.append(PlanItem(
+            tooth_ids=tooth_ids,
+            condition_id=condition_id,
+            description=str(item.get('description') or ''),
+            status=item.get('status', 'planned'),
+            cost=parse_cost(item.get('cost')),
+        ))
+    return plan
+
+
+def add_treatments(patient, plan, dentist, appointment=None):
+    """
+    Record a treatment plan for a patient and return a BatchResult.
+
+    Unknown tooth ids are skipped and reported; an unknown condition or
+    status raises InvalidTreatmentPlan before anything is written.
+    """
+    reference = get_reference_data()
+
+    for item in plan:
+        if item.condition_id not in reference.conditions_by_id:
+            raise InvalidTreatmentPlan(f'Unknown condition: {item.condition_id}')
+        if item.status not in STATUS_DISPLAY:
+            raise InvalidTreatmentPlan(f'Unknown status: {item.status}')
+
+    treatments = []
+    skipped_tooth_ids = []
+    for item in plan:
+        for tooth_id in item.tooth_ids:
+            if tooth_id not in reference.teeth_by_id:
+                skipped_tooth_ids.append(tooth_id)
+                continue
+            treatments.append(Treatment(
+                patient=patient,
+                tooth_id=tooth_id,
+                condition_id=item.condition_id,
+                appointment=appointment,
+                description=item.description,
+                status=item.status,
+                cost=item.cost,
+            ))
+
+    if not treatments:
+        return BatchResult([], skipped_tooth_ids)
+
+    created_by = dentist.get_full_name() or dentist.username
+    with transaction.atomic():
+        Treatment.objects.bulk_create(treatments)
+        TreatmentHistory.objects.bulk_create([
+            TreatmentHistory(
+                treatment=treatment,
+                previous_status=None,
+                new_status=treatment.status,
+                appointment=appointment,
+                dentist=dentist,
+                notes=f"Treatment created with status {STATUS_DISPLAY[treatment.status]} by {created_by}"
+            )
+            for treatment in treatments
+        ])
+        invalidate_patients({patient.pk})
+
+    return BatchResult(treatments, skipped_tooth_ids)
+
+
+def transition_treatments(treatments, new_status, dentist, appointment=None):
+    """
+    Move every treatment in a queryset to new_status and return a TransitionResult.
+
+    Each change gets a TreatmentHistory row recorded against appointment, or
+    the treatment's own appointment if none is given; with an appointment,
+    the moved treatments are also attached to it. Raises InvalidTransition,
+    saving nothing, if any move is not in ALLOWED_TRANSITIONS, and
+    PatientMismatch if any treatment belongs to another patient than the
+    appointment.
+    """
+    if new_status not in STATUS_DISPLAY:
+        raise InvalidTransition(new_status)
+
+    with transaction.atomic():
+        # Lock the rows (where the database supports it) so the statuses
+        # checked below are the ones the UPDATE replaces
+        rows = list(
+            treatments.select_for_update().order_by('id').values_list('id', 'status', 'patient_id', 'appointment_id')
+        )
+        if appointment is not None:
+            foreign_ids = [row[0] for row in rows if row[2] != appointment.patient_id]
+            if foreign_ids:
+                raise PatientMismatch(appointment, foreign_ids)
+        changes = [row for row in rows if row[1] != new_status]
+        rejected = [(row[0], row[1]) for row in changes if not can_transition(row[1], new_status)]
+        if rejected:
+            raise InvalidTransition(new_status, rejected)
+        if not changes:
+            return TransitionResult([], [row[0] for row in rows])
+
+        updated_ids = [row[0] for row in changes]
+        fields = {'status': new_status, 'updated_at': timezone.now()}
+        if appointment is not None:
+            fields['appointment'] = appointment
+        Treatment.objects.filter(id__in=updated_ids).update(**fields)
+
+        changed_by = dentist.get_full_name() or dentist.username
+        TreatmentHistory.objects.bulk_create([
+            TreatmentHistory(
+                treatment_id=treatment_id,
+                previous_status=status,
+                new_status=new_status,
+                appointment_id=appointment.pk if appointment is not None else appointment_id,
+                dentist=dentist,
+                notes=f"Status updated from {STATUS_DISPLAY.get(status)} to {STATUS_DISPLAY[new_status]} by {changed_by}"
+            )
+            for treatment_id, status, patient_id, appointment_id in changes
+        ])
+        invalidate_patients({row[2] for row in changes})
+
+    return TransitionResult(updated_ids, [row[0] for row in rows if row[1] == new_status])
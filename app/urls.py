@@ -1,10 +1,11 @@
 from django.urls import path
 from . import views
-from .health import health_check
+from .health import health_check, cache_stats
 
 urlpatterns = [
     # Health check endpoint
     path('health/', health_check, name='health_check'),
+    path('health/cache/', cache_stats, name='cache_stats'),
     
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
@@ -29,6 +30,7 @@ urlpatterns = [
     # Dental Chart and Treatment URLs
     path('patients/<int:patient_id>/dental-chart/', views.dental_chart, name='dental_chart'),
     path('patients/<int:patient_id>/add-treatment/', views.add_treatment, name='add_treatment'),
+    path('treatments/tooth/', views.get_tooth_treatments, name='get_teeth_treatments'),
     path('treatments/tooth/<int:tooth_id>/', views.get_tooth_treatments, name='get_tooth_treatments'),
     path('treatments/<int:pk>/', views.treatment_detail, name='treatment_detail'),
     path('treatments/<int:pk>/update/', views.treatment_update, name='treatment_update'),
@@ -42,6 +44,10 @@ urlpatterns = [
     path('api/patients/<int:patient_id>/balance/', views.get_patient_balance, name='get_patient_balance'),
     
     # API Endpoints
+    path('api/patients/search/', views.patient_search_api, name='patient_search_api'),
     path('api/patient/<int:patient_id>/complaints/', views.get_patient_complaints, name='get_patient_complaints'),
     path('api/time-slots/', views.get_time_slots, name='get_time_slots'),
+    path('api/availability/', views.availability_search, name='availability_search'),
+    path('api/calendar/', views.calendar_feed, name='calendar_feed'),
+    path('api/treatments/status/', views.treatment_bulk_status, name='treatment_bulk_status'),
 ] 
\ No newline at end of file
@@ -1,21 +1,46 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect, aget_object_or_404, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.auth.models import User
-from .models import UserProfile, Patient, Appointment, Treatment, Tooth, ToothCondition, TreatmentHistory, Payment, PaymentItem
+from .models import UserProfile, Patient, Appointment, Treatment, ToothCondition, TreatmentHistory, Payment, PaymentItem
 from .forms import PatientForm, AppointmentForm, TreatmentForm, PaymentForm, PaymentItemFormSet
+from .agenda import (
+    CALENDAR_VIEWS, AppointmentFilters, get_appointment_page, get_calendar_dentists,
+    get_feed, get_feed_etag, get_range, get_range_appointments, group_by_day,
+    group_by_dentist, split_weeks, step_anchor,
+)
+from .availability import aget_day_slots, build_slots, find_free_slots, get_day_slots
+from .booking import BookingConflict, book_appointment
+from .caching import REFERENCE_SCOPE, get_versions, patient_scope
+from .charting import get_chart_teeth
+from .dashboard import get_dentist_widgets, get_totals
+from .ledger import PatientFinancials
+from .pagination import InvalidCursor, keyset_paginate
+from .reference import get_conditions, get_reference_data
+from .search import SEARCH_MODES, search_patients
+from .treatments import (
+    InvalidTransition, InvalidTreatmentPlan, PatientMismatch, PlanItem, add_treatments, can_transition, parse_cost,
+    parse_plan, transition_treatments,
+)
 from datetime import date, datetime, timedelta
-from django.db.models import Q, Sum
-from django.http import JsonResponse, HttpResponse
-from django.urls import reverse
+from django.db import transaction
+from django.db.models import Q, Prefetch
+from django.http import Http404, JsonResponse, HttpResponse
+from django.urls import Resolver404, resolve, reverse
 from django.template.loader import render_to_string
-import re
 from decimal import Decimal
 from django.core.paginator import Paginator
 from django.utils import timezone
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+from django.utils.cache import patch_cache_control
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.http import condition
 from django.forms import inlineformset_factory
 import json
+from urllib.parse import urlparse
+from asgiref.sync import sync_to_async
 
 # Create your views here.
 def login_view(request):
@@ -42,47 +67,46 @@ def dashboard(request):
     role = user_profile.role
     
     # Common data for all roles
-    today_appointments = Appointment.objects.filter(date=date.today())
+    today = date.today()
+    today_appointments = Appointment.objects.filter(date=today).select_related('patient', 'dentist')
     
     context = {
         'role': role,
         'today_appointments': today_appointments,
     }
     
-    # Role-specific data
+    # Role-specific data, cached (see app.dashboard)
     if role == 'admin':
-        context['total_patients'] = Patient.objects.count()
-        context['total_appointments'] = Appointment.objects.count()
-        context['total_treatments'] = Treatment.objects.count()
+        context.update(get_totals())
     elif role == 'dentist':
-        context['my_appointments'] = Appointment.objects.filter(dentist=request.user)
-        context['my_patients'] = Patient.objects.filter(appointments__dentist=request.user).distinct()
+        context['my_appointments'], context['my_patients'] = get_dentist_widgets(request.user, today)
     
     return render(request, 'app/dashboard.html', context)
 
 # Patient Management Views
+PATIENT_PAGE_SIZE = 25
+
 @login_required
 def patient_list(request):
-    patients = Patient.objects.all().order_by('-created_at')
-    
-    # Search functionality
+    # Search across name, phone, and ID (if numeric)
     search_query = request.GET.get('search', '')
-    if search_query:
-        # Check if search query is a number (could be ID or phone)
-        is_numeric = search_query.isdigit()
-        
-        # Create a query that searches across name, phone, and ID (if numeric)
-        query = Q(name__icontains=search_query) | Q(phone__icontains=search_query)
-        
-        # Add ID search if the query is numeric
-        if is_numeric:
-            query |= Q(id=search_query)
-            
-        patients = patients.filter(query)
+    search_mode = request.GET.get('mode', 'contains')
+    patients = search_patients(search_query, mode=search_mode)
+    
+    # Show one page at a time, newest patients first
+    cursor = request.GET.get('after')
+    try:
+        page = keyset_paginate(patients, ('-created_at', '-id'), cursor=cursor, page_size=PATIENT_PAGE_SIZE)
+    except InvalidCursor:
+        page = keyset_paginate(patients, ('-created_at', '-id'), page_size=PATIENT_PAGE_SIZE)
+        cursor = None
     
     context = {
-        'patients': patients,
+        'patients': page,
         'search_query': search_query,
+        'search_mode': search_mode,
+        'next_cursor': page.next_cursor,
+        'is_first_page': not cursor,
     }
     return render(request, 'app/patient_list.html', context)
 
@@ -106,57 +130,37 @@ def patient_create(request):
 @login_required
 def patient_detail(request, pk):
     patient = get_object_or_404(Patient, pk=pk)
-    appointments = Appointment.objects.filter(patient=patient).order_by('-date', '-start_time')
-    treatments = Treatment.objects.filter(patient=patient).order_by('-created_at')
+    appointments = Appointment.objects.filter(patient=patient).select_related('dentist').order_by('-date', '-start_time')
+    treatments = Treatment.objects.filter(patient=patient).select_related('tooth', 'condition').order_by('-created_at')
     
     # Get payment information
     payments = Payment.objects.filter(patient=patient).order_by('-payment_date')
     recent_payments = payments[:5]  # Get the 5 most recent payments
     
-    # Calculate totals
-    total_treatment_cost = payments.aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-    total_paid = payments.aggregate(Sum('amount_paid'))['amount_paid__sum'] or 0
-    balance_due = total_treatment_cost - total_paid
-    
-    # Get all teeth for the dental chart
-    teeth = Tooth.objects.all().order_by('quadrant', 'position')
-    
-    # Add treatment status properties to each tooth
-    for tooth in teeth:
-        # Get all treatments for this tooth
-        tooth_treatments = Treatment.objects.filter(patient=patient, tooth=tooth)
-        
-        # Check if the tooth has any treatments
-        tooth.has_treatments = tooth_treatments.exists()
-        
-        # Check if the tooth has planned treatments
-        tooth.has_planned_treatments = tooth_treatments.filter(status='planned').exists()
-        
-        # Check if the tooth has in-progress treatments
-        tooth.has_in_progress_treatments = tooth_treatments.filter(status='in_progress').exists()
-        
-        # Check if the tooth has completed treatments
-        tooth.has_completed_treatments = tooth_treatments.filter(status='completed').exists()
-        
-        # Count treatments by status
-        tooth.treatment_counts = {
-            'total': tooth_treatments.count(),
-            'planned': tooth_treatments.filter(status='planned').count(),
-            'in_progress': tooth_treatments.filter(status='in_progress').count(),
-            'completed': tooth_treatments.filter(status='completed').count(),
-            'cancelled': tooth_treatments.filter(status='cancelled').count(),
-        }
+    # The sections are cached as template fragments keyed on the patient's
+    # version (bumped by app.signals), so the billing totals and the chart
+    # are only loaded when a fragment has to be rendered again. A bump only
+    # reaches every worker through a shared cache, so on locmem the sections
+    # are always rendered.
+    financials = SimpleLazyObject(lambda: PatientFinancials.for_patient(patient))
+    teeth = SimpleLazyObject(lambda: get_chart_teeth(patient))
     
     context = {
         'patient': patient,
         'appointments': appointments,
         'treatments': treatments,
         'recent_payments': recent_payments,
-        'total_treatment_cost': total_treatment_cost,
-        'total_paid': total_paid,
-        'balance_due': balance_due,
+        'financials': financials,
         'teeth': teeth,
+        'cache_fragments': getattr(settings, 'CACHE_SHARED', False),
     }
+    if context['cache_fragments']:
+        versions = get_versions([patient_scope(patient.pk), REFERENCE_SCOPE])
+        context.update({
+            'patient_version': versions[patient_scope(patient.pk)],
+            'reference_version': versions[REFERENCE_SCOPE],
+            'fragment_timeout': getattr(settings, 'PATIENT_FRAGMENT_TIMEOUT', 600),
+        })
     return render(request, 'app/patient_detail.html', context)
 
 @login_required
@@ -216,86 +220,105 @@ def patient_create_ajax(request):
         }) if request.headers.get('X-Requested-With') == 'XMLHttpRequest' else HttpResponse(html)
 
 # Appointment Management Views
+APPOINTMENT_PAGE_SIZE = 50
+
 @login_required
 def appointment_list(request):
-    # Get filter parameters
-    date_filter = request.GET.get('date')
-    dentist_filter = request.GET.get('dentist')
-    status_filter = request.GET.get('status')
-    
-    # Set default filters if none provided
+    # Get filter parameters, with defaults for any that are missing
     today = date.today()
+    filters = AppointmentFilters.from_request(request, today)
     
-    # Default to today's date if no date filter
-    if not date_filter:
-        date_filter = today.strftime('%Y-%m-%d')
-    
-    # Default to logged-in user if they are a dentist and no dentist filter
-    if not dentist_filter and hasattr(request.user, 'profile') and request.user.profile.role == 'dentist':
-        dentist_filter = str(request.user.id)
-    
-    # Default to scheduled appointments if no status filter
-    if not status_filter:
-        status_filter = 'scheduled'
-    
-    # Base queryset
-    appointments = Appointment.objects.all().order_by('date', 'start_time')
-    
-    # Apply filters
-    if date_filter:
-        appointments = appointments.filter(date=date_filter)
-    if dentist_filter:
-        appointments = appointments.filter(dentist_id=dentist_filter)
-    if status_filter:
-        appointments = appointments.filter(status=status_filter)
+    # Show one page at a time, in schedule order
+    cursor = request.GET.get('after')
+    try:
+        page = get_appointment_page(filters, cursor=cursor, page_size=APPOINTMENT_PAGE_SIZE)
+    except InvalidCursor:
+        page = get_appointment_page(filters, page_size=APPOINTMENT_PAGE_SIZE)
+        cursor = None
     
     # Get list of dentists for filter dropdown
-    dentists = User.objects.filter(profile__role='dentist')
+    dentists = User.objects.filter(profile__role='dentist').only('id', 'username', 'first_name', 'last_name')
     
     context = {
-        'appointments': appointments,
+        'appointments': page,
         'dentists': dentists,
         'status_choices': Appointment.STATUS_CHOICES,
-        'current_date': date_filter,
+        'filters': filters,
+        'filter_query': filters.querystring(),
+        'next_cursor': page.next_cursor,
+        'is_first_page': not cursor,
+        'current_date': filters.date_from.strftime('%Y-%m-%d') if filters.date_from else '',
         'default_date': today.strftime('%Y-%m-%d'),
-        'default_dentist': dentist_filter,
-        'default_status': status_filter,
+        'default_dentist': str(filters.dentist_id or ''),
+        'default_status': filters.status or '',
     }
     return render(request, 'app/appointment_list.html', context)
 
 @login_required
 def appointment_calendar(request):
-    # Get the week start date (default to current week)
-    week_start_str = request.GET.get('week_start')
-    if week_start_str:
-        week_start = datetime.strptime(week_start_str, '%Y-%m-%d').date()
-    else:
-        week_start = date.today() - timedelta(days=date.today().weekday())
+    view = request.GET.get('view', 'week')
+    if view not in CALENDAR_VIEWS:
+        view = 'week'
     
-    # Calculate week end
-    week_end = week_start + timedelta(days=6)
-    
-    # Get all appointments for the week
-    appointments = Appointment.objects.filter(
-        date__range=[week_start, week_end]
-    ).order_by('date', 'start_time')
+    # Get the date to show (default to today); week_start is still accepted
+    # for old links
+    today = date.today()
+    date_str = request.GET.get('date') or request.GET.get('week_start')
+    try:
+        current_date = datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else today
+    except ValueError:
+        current_date = today
     
-    # Organize appointments by day
-    calendar_data = {}
-    current_date = week_start
-    while current_date <= week_end:
-        calendar_data[current_date] = appointments.filter(date=current_date)
-        current_date += timedelta(days=1)
+    # Get all appointments in range with one query and group them in memory
+    range_start, range_end = get_range(view, current_date)
+    appointments = get_range_appointments(range_start, range_end)
+    days = group_by_day(appointments, range_start, range_end)
     
     context = {
-        'calendar_data': calendar_data,
-        'week_start': week_start,
-        'week_end': week_end,
-        'prev_week': week_start - timedelta(days=7),
-        'next_week': week_start + timedelta(days=7),
+        'view': view,
+        'today': today,
+        'current_date': current_date,
+        'range_start': range_start,
+        'range_end': range_end,
+        'calendar_data': split_weeks(days),
+        'prev_date': step_anchor(view, current_date, -1),
+        'next_date': step_anchor(view, current_date, 1),
+        'week_start': range_start,
+        'week_end': range_end,
     }
+    if view == 'dentists':
+        dentists = get_calendar_dentists(appointments)
+        context['dentists'] = dentists
+        context['dentist_rows'] = group_by_dentist(days, dentists)
     return render(request, 'app/appointment_calendar.html', context)
 
+def _build_time_slots(selected_date, dentist_id, exclude_id=None, selected_time=None):
+    """Build the time slot list for the appointment form"""
+    try:
+        selected_date_obj = datetime.strptime(selected_date, '%Y-%m-%d').date() if selected_date else None
+    except (ValueError, TypeError):
+        # Handle invalid date format
+        selected_date_obj = None
+    
+    if selected_date_obj and dentist_id:
+        try:
+            slots = get_day_slots(dentist_id, selected_date_obj, exclude_id=exclude_id)
+        except (ValueError, TypeError):
+            slots = build_slots([])
+    else:
+        slots = build_slots([])
+    
+    selected = selected_time.strftime('%H:%M') if selected_time else None
+    return [
+        {
+            'time': slot.start,
+            'display': slot.start.strftime('%I:%M %p'),
+            'available': slot.available,
+            'selected': slot.start.strftime('%H:%M') == selected,
+        }
+        for slot in slots
+    ]
+
 @login_required
 def appointment_create(request):
     if request.method == 'POST':
@@ -319,9 +342,14 @@ def appointment_create(request):
                     patient.chief_complaint = chief_complaint
                     patient.save()
             
-            appointment.save()
-            messages.success(request, 'Appointment scheduled successfully!')
-            return redirect('appointment_detail', pk=appointment.pk)
+            try:
+                book_appointment(appointment)
+            except BookingConflict as e:
+                # Someone else booked the slot after the form was validated
+                form.add_error(None, str(e))
+            else:
+                messages.success(request, 'Appointment scheduled successfully!')
+                return redirect('appointment_detail', pk=appointment.pk)
     else:
         # Pre-fill patient if provided in GET parameters
         initial = {}
@@ -352,9 +380,6 @@ def appointment_create(request):
             
         form = AppointmentForm(initial=initial)
     
-    # Get all patients for the dropdown
-    patients = Patient.objects.all().order_by('name')
-    
     # Get all dentists for the dropdown
     dentists = User.objects.filter(profile__role='dentist')
     
@@ -366,50 +391,11 @@ def appointment_create(request):
     if not selected_dentist_id and hasattr(request.user, 'profile') and request.user.profile.role == 'dentist':
         selected_dentist_id = request.user.id
         
-    # Generate time slots from 9 AM to 5 PM in 30-minute intervals
-    time_slots = []
-    start_hour = 9  # 9 AM
-    end_hour = 17   # 5 PM
-    
-    current_time = datetime.combine(date.today(), datetime.min.time()) + timedelta(hours=start_hour)
-    end_time = datetime.combine(date.today(), datetime.min.time()) + timedelta(hours=end_hour)
-    
-    while current_time < end_time:
-        time_slots.append({
-            'time': current_time.time(),
-            'display': current_time.strftime('%I:%M %p'),
-            'available': True,
-            'selected': False
-        })
-        current_time += timedelta(minutes=30)
-    
-    # Mark booked slots as unavailable
-    if selected_date and selected_dentist_id:
-        try:
-            selected_date_obj = datetime.strptime(selected_date, '%Y-%m-%d').date()
-            booked_appointments = Appointment.objects.filter(
-                dentist_id=selected_dentist_id,
-                date=selected_date_obj,
-                status='scheduled'
-            )
-            
-            for appointment in booked_appointments:
-                # Mark all slots that overlap with this appointment as unavailable
-                for slot in time_slots:
-                    slot_start = datetime.combine(selected_date_obj, slot['time'])
-                    slot_end = slot_start + timedelta(minutes=30)
-                    appointment_start = datetime.combine(selected_date_obj, appointment.start_time)
-                    appointment_end = datetime.combine(selected_date_obj, appointment.end_time)
-                    
-                    if (slot_start < appointment_end and slot_end > appointment_start):
-                        slot['available'] = False
-        except (ValueError, TypeError):
-            # Handle invalid date format
-            pass
+    # Build the day's time slots, marking booked ones as unavailable
+    time_slots = _build_time_slots(selected_date, selected_dentist_id)
     
     context = {
         'form': form,
-        'patients': patients,
         'dentists': dentists,
         'time_slots': time_slots,
         'selected_date': selected_date,
@@ -436,45 +422,14 @@ def appointment_detail(request, pk):
     payments = Payment.objects.filter(patient=patient).order_by('-payment_date')
     recent_payments = payments[:5]  # Get the 5 most recent payments
     
-    # Calculate totals
-    total_treatment_cost = payments.aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-    total_paid = payments.aggregate(Sum('amount_paid'))['amount_paid__sum'] or 0
-    balance_due = total_treatment_cost - total_paid
-    
-    # Get all teeth for the dental chart
-    teeth = Tooth.objects.all().order_by('quadrant', 'position')
+    # Get the patient's billing totals in one query
+    financials = PatientFinancials.for_patient(patient)
+    total_treatment_cost = financials.total_billed
+    total_paid = financials.total_paid
+    balance_due = financials.balance_due
     
-    # Add treatment status properties to each tooth
-    for tooth in teeth:
-        # Get all treatments for this tooth from this patient
-        tooth_treatments = Treatment.objects.filter(patient=patient, tooth=tooth)
-        
-        # Check if the tooth has any treatments
-        tooth.has_treatments = tooth_treatments.exists()
-        
-        # Check if the tooth has planned treatments
-        tooth.has_planned_treatments = tooth_treatments.filter(status='planned').exists()
-        
-        # Check if the tooth has in-progress treatments
-        tooth.has_in_progress_treatments = tooth_treatments.filter(status='in_progress').exists()
-        
-        # Check if the tooth has completed treatments
-        tooth.has_completed_treatments = tooth_treatments.filter(status='completed').exists()
-        
-        # Count treatments by status
-        tooth.treatment_counts = {
-            'total': tooth_treatments.count(),
-            'planned': tooth_treatments.filter(status='planned').count(),
-            'in_progress': tooth_treatments.filter(status='in_progress').count(),
-            'completed': tooth_treatments.filter(status='completed').count(),
-            'cancelled': tooth_treatments.filter(status='cancelled').count(),
-        }
-        
-        # Highlight teeth with treatments for this specific appointment
-        tooth.has_appointment_treatments = Treatment.objects.filter(
-            appointment=appointment, 
-            tooth=tooth
-        ).exists()
+    # Get all teeth for the dental chart, highlighting this appointment's treatments
+    teeth = get_chart_teeth(patient, highlight_appointment=appointment)
     
     context = {
         'appointment': appointment,
@@ -526,9 +481,14 @@ def appointment_update(request, pk):
                     patient.chief_complaint = chief_complaint
                     patient.save()
             
-            updated_appointment.save()
-            messages.success(request, 'Appointment updated successfully!')
-            return redirect('appointment_detail', pk=appointment.pk)
+            try:
+                book_appointment(updated_appointment)
+            except BookingConflict as e:
+                # Someone else booked the slot after the form was validated
+                form.add_error(None, str(e))
+            else:
+                messages.success(request, 'Appointment updated successfully!')
+                return redirect('appointment_detail', pk=appointment.pk)
     else:
         # Extract chief complaint from notes if it exists
         chief_complaint = ""
@@ -568,9 +528,6 @@ def appointment_update(request, pk):
             
         form = AppointmentForm(instance=appointment, initial=initial)
     
-    # Get all patients for the dropdown
-    patients = Patient.objects.all().order_by('name')
-    
     # Get all dentists for the dropdown
     dentists = User.objects.filter(profile__role='dentist')
     
@@ -578,57 +535,17 @@ def appointment_update(request, pk):
     selected_date = request.GET.get('date', appointment.date.strftime('%Y-%m-%d'))
     selected_dentist_id = request.GET.get('dentist', str(appointment.dentist.id))
     
-    # Generate time slots from 9 AM to 5 PM in 30-minute intervals
-    time_slots = []
-    start_hour = 9  # 9 AM
-    end_hour = 17   # 5 PM
-    
-    current_time = datetime.combine(date.today(), datetime.min.time()) + timedelta(hours=start_hour)
-    end_time = datetime.combine(date.today(), datetime.min.time()) + timedelta(hours=end_hour)
-    
-    while current_time < end_time:
-        time_slot = {
-            'time': current_time.time(),
-            'display': current_time.strftime('%I:%M %p'),
-            'available': True,
-            'selected': False
-        }
-        
-        # Check if this is the current appointment's time
-        if current_time.time().strftime('%H:%M') == appointment.start_time.strftime('%H:%M'):
-            time_slot['selected'] = True
-            
-        time_slots.append(time_slot)
-        current_time += timedelta(minutes=30)
-    
-    # Mark booked slots as unavailable (except for this appointment's slot)
-    if selected_date and selected_dentist_id:
-        try:
-            selected_date_obj = datetime.strptime(selected_date, '%Y-%m-%d').date()
-            booked_appointments = Appointment.objects.filter(
-                dentist_id=selected_dentist_id,
-                date=selected_date_obj,
-                status='scheduled'
-            ).exclude(pk=appointment.pk)  # Exclude current appointment
-            
-            for booked_appointment in booked_appointments:
-                # Mark all slots that overlap with this appointment as unavailable
-                for slot in time_slots:
-                    slot_start = datetime.combine(selected_date_obj, slot['time'])
-                    slot_end = slot_start + timedelta(minutes=30)
-                    appointment_start = datetime.combine(selected_date_obj, booked_appointment.start_time)
-                    appointment_end = datetime.combine(selected_date_obj, booked_appointment.end_time)
-                    
-                    if (slot_start < appointment_end and slot_end > appointment_start):
-                        slot['available'] = False
-        except (ValueError, TypeError):
-            # Handle invalid date format
-            pass
+    # Build the day's time slots (except for this appointment's own booking)
+    time_slots = _build_time_slots(
+        selected_date,
+        selected_dentist_id,
+        exclude_id=appointment.pk,
+        selected_time=appointment.start_time,
+    )
     
     context = {
         'form': form,
         'appointment': appointment,
-        'patients': patients,
         'dentists': dentists,
         'time_slots': time_slots,
         'selected_date': selected_date,
@@ -661,8 +578,13 @@ def appointment_status_update(request, pk):
         new_status = request.POST.get('status')
         if new_status in dict(Appointment.STATUS_CHOICES):
             appointment.status = new_status
-            appointment.save()
-            messages.success(request, f'Appointment status updated to {appointment.get_status_display()}!')
+            try:
+                # Rescheduling a cancelled appointment must not double-book the dentist
+                book_appointment(appointment)
+            except BookingConflict as e:
+                messages.error(request, str(e))
+            else:
+                messages.success(request, f'Appointment status updated to {appointment.get_status_display()}!')
         else:
             messages.error(request, 'Invalid status provided!')
         return redirect('appointment_detail', pk=appointment.pk)
@@ -694,34 +616,11 @@ def dental_chart(request, patient_id):
         messages.warning(request, 'No appointment found for this patient.')
         return redirect('patient_detail', pk=patient_id)
     
-    # Get all teeth
-    teeth = Tooth.objects.all().order_by('quadrant', 'position')
-    
-    # Add treatment status properties to each tooth
-    for tooth in teeth:
-        # Filter treatments based on whether an appointment is selected
-        tooth_treatments = Treatment.objects.filter(
-            patient=patient, 
-            tooth=tooth,
-            appointment=appointment
-        )
-        
-        # Add properties to tooth object
-        tooth.has_treatments = tooth_treatments.exists()
-        tooth.has_planned_treatments = tooth_treatments.filter(status='planned').exists()
-        tooth.has_in_progress_treatments = tooth_treatments.filter(status='in_progress').exists()
-        tooth.has_completed_treatments = tooth_treatments.filter(status='completed').exists()
-        
-        tooth.treatment_counts = {
-            'total': tooth_treatments.count(),
-            'planned': tooth_treatments.filter(status='planned').count(),
-            'in_progress': tooth_treatments.filter(status='in_progress').count(),
-            'completed': tooth_treatments.filter(status='completed').count(),
-            'cancelled': tooth_treatments.filter(status='cancelled').count(),
-        }
+    # Get all teeth with the treatment state for the selected appointment
+    teeth = get_chart_teeth(patient, appointment=appointment)
     
     # Get all tooth conditions for the dropdown
-    conditions = ToothCondition.objects.all()
+    conditions = get_conditions()
     
     # Get patient's appointments for the dropdown
     appointments = Appointment.objects.filter(patient=patient)
@@ -739,136 +638,199 @@ def dental_chart(request, patient_id):
 
 @login_required
 def add_treatment(request, patient_id):
+    """
+    Add treatments for the teeth selected on the dental chart.
+    
+    The chart form posts one condition for a comma-separated tooth_ids list.
+    A JSON body ({"appointment": id, "items": [{"tooth_ids": [...],
+    "condition": id, "status": ..., "description": ..., "cost": ...}]})
+    records a whole plan with several conditions in one request and gets a
+    JSON result back. Either way the plan is saved in one transaction.
+    """
     patient = get_object_or_404(Patient, id=patient_id)
     
-    if request.method == 'POST':
-        # Get the comma-separated list of tooth IDs
-        tooth_ids_str = request.POST.get('tooth_ids', '')
-        
-        if not tooth_ids_str:
-            messages.error(request, 'No teeth selected for treatment')
-            return redirect('dental_chart', patient_id=patient.id)
-        
-        # Split the string into a list of tooth IDs
-        tooth_ids = [int(id) for id in tooth_ids_str.split(',') if id.strip()]
-        
-        # Get other form data
-        condition_id = request.POST.get('condition')
-        appointment_id = request.POST.get('appointment')
-        description = request.POST.get('description')
-        status = request.POST.get('status')
-        cost = request.POST.get('cost')
-        
-        # Handle empty cost value
+    if request.method != 'POST':
+        # If not POST, redirect back to dental chart
+        return redirect('dental_chart', patient_id=patient.id)
+    
+    if request.content_type == 'application/json':
+        return _add_treatment_json(request, patient)
+    
+    # Get the comma-separated list of tooth IDs
+    tooth_ids_str = request.POST.get('tooth_ids', '')
+    
+    if not tooth_ids_str:
+        messages.error(request, 'No teeth selected for treatment')
+        return redirect('dental_chart', patient_id=patient.id)
+    
+    # Split the string into a list of tooth IDs
+    tooth_ids = [int(id) for id in tooth_ids_str.split(',') if id.strip()]
+    
+    # Get the related objects
+    condition = get_object_or_404(ToothCondition, id=request.POST.get('condition'))
+    appointment = None
+    appointment_id = request.POST.get('appointment')
+    if appointment_id:
+        appointment = get_object_or_404(Appointment, id=appointment_id)
+    
+    # Handle an empty or invalid cost value
+    try:
+        cost = parse_cost(request.POST.get('cost'))
+    except InvalidTreatmentPlan:
+        cost = Decimal('0')
+    
+    plan = [PlanItem(
+        tooth_ids=tooth_ids,
+        condition_id=condition.id,
+        description=request.POST.get('description') or '',
+        status=request.POST.get('status') or 'planned',
+        cost=cost,
+    )]
+    
+    try:
+        result = add_treatments(patient, plan, request.user, appointment=appointment)
+    except InvalidTreatmentPlan as e:
+        messages.error(request, str(e))
+        result = None
+    
+    if result and result.treatments:
+        messages.success(request, f'Treatment added for {len(result.treatments)} teeth')
+    elif result is not None:
+        messages.error(request, 'No treatments were created')
+    
+    # Redirect to appointment detail if appointment was specified
+    if appointment:
+        return redirect('appointment_detail', pk=appointment.id)
+    else:
+        return redirect('dental_chart', patient_id=patient.id)
+
+def _add_treatment_json(request, patient):
+    try:
+        payload = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({'error': 'Expected a JSON object'}, status=400)
+    
+    appointment = None
+    if payload.get('appointment'):
         try:
-            cost = float(cost) if cost and cost.strip() else 0
-        except ValueError:
-            cost = 0
-        
-        # Get the related objects
-        condition = get_object_or_404(ToothCondition, id=condition_id)
-        appointment = None
-        if appointment_id:
-            appointment = get_object_or_404(Appointment, id=appointment_id)
-        
-        # Create a treatment for each selected tooth
-        treatments_created = 0
-        for tooth_id in tooth_ids:
-            try:
-                tooth = Tooth.objects.get(id=tooth_id)
-                treatment = Treatment.objects.create(
-                    patient=patient,
-                    tooth=tooth,
-                    condition=condition,
-                    appointment=appointment,
-                    description=description,
-                    status=status,
-                    cost=cost
-                )
-                
-                # Create initial treatment history record
-                TreatmentHistory.objects.create(
-                    treatment=treatment,
-                    previous_status=None,
-                    new_status=status,
-                    appointment=appointment,
-                    dentist=request.user,
-                    notes=f"Treatment created with status {dict(Treatment.STATUS_CHOICES).get(status)} by {request.user.get_full_name() or request.user.username}"
-                )
-                
-                treatments_created += 1
-            except Tooth.DoesNotExist:
-                continue
-        
-        if treatments_created > 0:
-            messages.success(request, f'Treatment added for {treatments_created} teeth')
-        else:
-            messages.error(request, 'No treatments were created')
-        
-        # Redirect to appointment detail if appointment was specified
-        if appointment:
-            return redirect('appointment_detail', pk=appointment.id)
-        else:
-            return redirect('dental_chart', patient_id=patient.id)
+            appointment = Appointment.objects.get(id=int(payload['appointment']), patient=patient)
+        except (TypeError, ValueError, Appointment.DoesNotExist):
+            return JsonResponse({'error': 'Unknown appointment for this patient'}, status=400)
     
-    # If not POST, redirect back to dental chart
-    return redirect('dental_chart', patient_id=patient.id)
+    try:
+        plan = parse_plan(payload.get('items'))
+        result = add_treatments(patient, plan, request.user, appointment=appointment)
+    except InvalidTreatmentPlan as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse({
+        'created': len(result.treatments),
+        'treatment_ids': [treatment.id for treatment in result.treatments],
+        'skipped_tooth_ids': result.skipped_tooth_ids,
+    }, status=201 if result.treatments else 200)
+
+# Display labels for treatment statuses, built once for all serialized rows
+TREATMENT_STATUS_DISPLAY = dict(Treatment.STATUS_CHOICES)
+
+def _serialize_treatment_history(h):
+    dentist_name = 'Unknown'
+    if h.dentist:
+        dentist_name = h.dentist.get_full_name() or h.dentist.username
+    
+    return {
+        'date': h.created_at.strftime('%Y-%m-%d %H:%M'),
+        'previous_status': h.previous_status,
+        'previous_status_display': TREATMENT_STATUS_DISPLAY.get(h.previous_status, 'Unknown'),
+        'new_status': h.new_status,
+        'new_status_display': TREATMENT_STATUS_DISPLAY.get(h.new_status, 'Unknown'),
+        'dentist': dentist_name,
+        'appointment_date': h.appointment.date.strftime('%Y-%m-%d') if h.appointment else None,
+        'appointment_id': h.appointment_id,
+        'notes': h.notes
+    }
+
+def _serialize_treatment(treatment, conditions_by_id):
+    # Conditions come from the reference snapshot; one added since it was
+    # loaded is not there, and loading it here would be a sync query from
+    # the async view
+    condition = conditions_by_id.get(treatment.condition_id)
+    
+    return {
+        'id': treatment.id,
+        'condition_name': condition.name if condition else 'Unknown',
+        'description': treatment.description,
+        'status': treatment.status,
+        'status_display': TREATMENT_STATUS_DISPLAY.get(treatment.status, 'Unknown'),
+        'cost': float(treatment.cost),
+        'created_at': treatment.created_at.strftime('%Y-%m-%d'),
+        'appointment_date': treatment.appointment.date.strftime('%Y-%m-%d') if treatment.appointment else None,
+        'appointment_id': treatment.appointment_id,
+        'history': [_serialize_treatment_history(h) for h in treatment.history.all()]
+    }
 
 @login_required
-def get_tooth_treatments(request, tooth_id):
-    tooth = get_object_or_404(Tooth, number=tooth_id)
+async def get_tooth_treatments(request, tooth_id=None):
+    """
+    API endpoint to get the treatments and their history for one or more teeth.
     
-    # Get patient_id from query parameters if provided
-    patient_id = request.GET.get('patient_id')
+    Either a single tooth number is given in the URL, or several are passed
+    as ?teeth=11,12,13. Uses a fixed number of queries however many teeth,
+    treatments or history rows are involved.
+    """
+    reference = await sync_to_async(get_reference_data)()
     
-    if patient_id:
-        # Get treatments for this tooth and patient
-        treatments = Treatment.objects.filter(
-            tooth=tooth,
-            patient_id=patient_id
-        ).order_by('-created_at')
+    if tooth_id is not None:
+        numbers = [tooth_id]
     else:
-        # Get all treatments for this tooth
-        treatments = Treatment.objects.filter(tooth=tooth).order_by('-created_at')
-    
-    # Prepare treatment data
-    treatment_data = []
-    for treatment in treatments:
-        # Get treatment history
-        history = TreatmentHistory.objects.filter(treatment=treatment).order_by('-created_at')
-        history_data = []
-        
-        for h in history:
-            history_data.append({
-                'date': h.created_at.strftime('%Y-%m-%d %H:%M'),
-                'previous_status': h.previous_status,
-                'previous_status_display': dict(Treatment.STATUS_CHOICES).get(h.previous_status, 'Unknown'),
-                'new_status': h.new_status,
-                'new_status_display': dict(Treatment.STATUS_CHOICES).get(h.new_status, 'Unknown'),
-                'dentist': h.dentist.get_full_name() if h.dentist and h.dentist.get_full_name() else (h.dentist.username if h.dentist else 'Unknown'),
-                'appointment_date': h.appointment.date.strftime('%Y-%m-%d') if h.appointment else None,
-                'appointment_id': h.appointment.id if h.appointment else None,
-                'notes': h.notes
-            })
-        
-        treatment_data.append({
-            'id': treatment.id,
-            'condition_name': treatment.condition.name,
-            'description': treatment.description,
-            'status': treatment.status,
-            'status_display': treatment.get_status_display(),
-            'cost': float(treatment.cost),
-            'created_at': treatment.created_at.strftime('%Y-%m-%d'),
-            'appointment_date': treatment.appointment.date.strftime('%Y-%m-%d') if treatment.appointment else None,
-            'appointment_id': treatment.appointment.id if treatment.appointment else None,
-            'history': history_data
+        try:
+            numbers = [int(n) for n in request.GET.get('teeth', '').split(',') if n.strip()]
+        except ValueError:
+            return JsonResponse({'error': 'Invalid tooth numbers'}, status=400)
+        if not numbers:
+            return JsonResponse({'error': 'Missing required parameters'}, status=400)
+    teeth = [reference.teeth_by_number.get(number) for number in dict.fromkeys(numbers)]
+    if None in teeth:
+        raise Http404('No tooth matches the given number.')
+    
+    # Get the treatments for these teeth, optionally for one patient only
+    treatments = Treatment.objects.filter(
+        tooth_id__in=[tooth.id for tooth in teeth]
+    ).select_related('appointment').prefetch_related(
+        Prefetch(
+            'history',
+            queryset=TreatmentHistory.objects.select_related('dentist', 'appointment').order_by('-created_at')
+        )
+    ).order_by('-created_at')
+    
+    patient_id = request.GET.get('patient_id')
+    if patient_id:
+        treatments = treatments.filter(patient_id=patient_id)
+    
+    # Group the serialized treatments by tooth
+    treatment_data = {tooth.id: [] for tooth in teeth}
+    async for treatment in treatments:
+        treatment_data[treatment.tooth_id].append(
+            _serialize_treatment(treatment, reference.conditions_by_id)
+        )
+    
+    if tooth_id is not None:
+        return JsonResponse({
+            'tooth_id': tooth_id,
+            'tooth_name': teeth[0].name,
+            'treatments': treatment_data[teeth[0].id]
         })
     
-    # Return JSON response
     return JsonResponse({
-        'tooth_id': tooth_id,
-        'tooth_name': tooth.name,
-        'treatments': treatment_data
+        'teeth': [
+            {
+                'tooth_id': tooth.number,
+                'tooth_name': tooth.name,
+                'treatments': treatment_data[tooth.id]
+            }
+            for tooth in teeth
+        ]
     })
 
 @login_required
@@ -885,6 +847,26 @@ def treatment_detail(request, pk):
     }
     return render(request, 'app/treatment_detail.html', context)
 
+def _safe_referer(request, referer):
+    """Return the posted referer if it points back into this site, else ''."""
+    if referer and url_has_allowed_host_and_scheme(
+        referer, allowed_hosts={request.get_host()}, require_https=request.is_secure()
+    ):
+        return referer
+    return ''
+
+def _referer_appointment(referer):
+    """Return the appointment whose detail page the referer is, if any."""
+    if not referer:
+        return None
+    try:
+        match = resolve(urlparse(referer).path)
+    except Resolver404:
+        return None
+    if match.url_name != 'appointment_detail':
+        return None
+    return Appointment.objects.filter(pk=match.kwargs.get('pk')).first()
+
 @login_required
 def treatment_update(request, pk):
     treatment = get_object_or_404(Treatment, pk=pk)
@@ -894,6 +876,7 @@ def treatment_update(request, pk):
         description = request.POST.get('description')
         cost = request.POST.get('cost', 0)
         appointment_id = request.POST.get('appointment')
+        referer = _safe_referer(request, request.POST.get('referer', ''))
         
         # Handle empty cost value
         try:
@@ -903,6 +886,9 @@ def treatment_update(request, pk):
         
         # Store the previous status for history logging
         previous_status = treatment.status
+        if status != previous_status and not can_transition(previous_status, status):
+            messages.error(request, str(InvalidTransition(status, [(treatment.id, previous_status)])))
+            return redirect(referer or reverse('treatment_update', args=[treatment.id]))
         
         # Update the treatment
         treatment.status = status
@@ -919,52 +905,42 @@ def treatment_update(request, pk):
                 # Update the treatment's appointment to the current one when status changes
                 if previous_status != status:
                     treatment.appointment = current_appointment
-            except Appointment.DoesNotExist:
+            except (Appointment.DoesNotExist, ValueError):
                 pass
         # If no current appointment specified but appointment_id is provided, use that
         elif appointment_id:
             try:
                 appointment = Appointment.objects.get(pk=appointment_id)
                 treatment.appointment = appointment
-            except Appointment.DoesNotExist:
+            except (Appointment.DoesNotExist, ValueError):
                 pass
         
-        treatment.save()
+        # Record the change against the appointment being worked on: the one
+        # posted, else the appointment page the form came from, else the
+        # treatment's own appointment
+        if not current_appointment:
+            current_appointment = _referer_appointment(referer) or treatment.appointment
         
-        # Log the treatment history if status has changed
-        if previous_status != status:
-            # Get the dentist's full name
-            dentist_name = request.user.get_full_name() if request.user.get_full_name() else request.user.username
-            
-            # Use the current appointment for the history record
-            if not current_appointment:
-                # Try to get the appointment ID from the referer URL
-                referer = request.POST.get('referer', '')
-                if 'appointment_detail' in referer:
-                    try:
-                        # Extract appointment ID from referer URL
-                        appointment_id_match = re.search(r'/appointments/(\d+)/', referer)
-                        if appointment_id_match:
-                            appointment_id = appointment_id_match.group(1)
-                            current_appointment = Appointment.objects.get(pk=appointment_id)
-                    except (Appointment.DoesNotExist, Exception):
-                        current_appointment = treatment.appointment
-                else:
-                    current_appointment = treatment.appointment
+        with transaction.atomic():
+            treatment.save()
             
-            TreatmentHistory.objects.create(
-                treatment=treatment,
-                previous_status=previous_status,
-                new_status=status,
-                appointment=current_appointment,
-                dentist=request.user,
-                notes=f"Status updated from {dict(Treatment.STATUS_CHOICES).get(previous_status)} to {dict(Treatment.STATUS_CHOICES).get(status)} by {dentist_name}"
-            )
+            # Log the treatment history if status has changed
+            if previous_status != status:
+                # Get the dentist's full name
+                dentist_name = request.user.get_full_name() if request.user.get_full_name() else request.user.username
+                
+                TreatmentHistory.objects.create(
+                    treatment=treatment,
+                    previous_status=previous_status,
+                    new_status=status,
+                    appointment=current_appointment,
+                    dentist=request.user,
+                    notes=f"Status updated from {TREATMENT_STATUS_DISPLAY.get(previous_status)} to {TREATMENT_STATUS_DISPLAY.get(status)} by {dentist_name}"
+                )
         
         messages.success(request, 'Treatment updated successfully')
         
         # Redirect based on where the user came from
-        referer = request.POST.get('referer', '')
         if referer:
             return redirect(referer)
         elif treatment.appointment:
@@ -975,19 +951,129 @@ def treatment_update(request, pk):
     # Get the referer URL for the cancel button
     referer = request.META.get('HTTP_REFERER', '')
     
+    # Only offer the statuses the treatment may move to, and its own
+    status_choices = [
+        (value, label) for value, label in Treatment.STATUS_CHOICES
+        if value == treatment.status or can_transition(treatment.status, value)
+    ]
+    
     context = {
         'treatment': treatment,
         'patient': treatment.patient,
         'referer': referer,
+        'status_choices': status_choices,
     }
     return render(request, 'app/treatment_update.html', context)
 
+TREATMENT_BULK_MAX = 500
+
+@login_required
+def treatment_bulk_status(request):
+    """
+    API endpoint to move many treatments to one status in a single transaction.
+    
+    The JSON body names the target "status" and either "treatment_ids" or an
+    "appointment", optionally narrowed by "from_status" (e.g. complete all
+    planned treatments of an appointment). With treatment_ids, an optional
+    "appointment" is the visit the change is recorded against; every listed
+    treatment must belong to its patient. If any move is not allowed nothing
+    is changed and the rejected treatments are listed.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    
+    try:
+        payload = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({'error': 'Expected a JSON object'}, status=400)
+    if not isinstance(payload.get('status'), str):
+        return JsonResponse({'error': 'status is required'}, status=400)
+    
+    appointment = None
+    if payload.get('appointment'):
+        try:
+            appointment = Appointment.objects.get(pk=int(payload['appointment']))
+        except (TypeError, ValueError, Appointment.DoesNotExist):
+            return JsonResponse({'error': 'Unknown appointment'}, status=400)
+    
+    treatment_ids = payload.get('treatment_ids')
+    if treatment_ids is not None:
+        if not isinstance(treatment_ids, list) or not treatment_ids:
+            return JsonResponse({'error': 'treatment_ids must be a non-empty list'}, status=400)
+        if len(treatment_ids) > TREATMENT_BULK_MAX:
+            return JsonResponse({'error': f'At most {TREATMENT_BULK_MAX} treatments can be updated at once'}, status=400)
+        try:
+            treatment_ids = {int(treatment_id) for treatment_id in treatment_ids}
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'Invalid treatment id'}, status=400)
+        treatments = Treatment.objects.filter(id__in=treatment_ids)
+    elif appointment is not None:
+        treatments = Treatment.objects.filter(appointment=appointment)
+    else:
+        return JsonResponse({'error': 'Give treatment_ids or an appointment'}, status=400)
+    
+    from_status = payload.get('from_status')
+    if from_status:
+        if not isinstance(from_status, str) or from_status not in TREATMENT_STATUS_DISPLAY:
+            return JsonResponse({'error': f'Unknown status: {from_status}'}, status=400)
+        treatments = treatments.filter(status=from_status)
+    
+    try:
+        result = transition_treatments(treatments, payload.get('status'), request.user, appointment=appointment)
+    except InvalidTransition as e:
+        return JsonResponse({
+            'error': str(e),
+            'rejected': [{'id': treatment_id, 'status': status} for treatment_id, status in e.rejected],
+        }, status=400)
+    except PatientMismatch as e:
+        return JsonResponse({'error': str(e), 'other_patient_ids': e.treatment_ids}, status=400)
+    
+    found = set(result.updated_ids) | set(result.unchanged_ids)
+    return JsonResponse({
+        'status': payload['status'],
+        'updated_ids': result.updated_ids,
+        'unchanged_ids': result.unchanged_ids,
+        'missing_ids': sorted(treatment_ids - found) if treatment_ids is not None else [],
+    })
+
 # API Endpoints
+PATIENT_SEARCH_DEFAULT_LIMIT = 10
+PATIENT_SEARCH_MAX_LIMIT = 50
+
 @login_required
-def get_patient_complaints(request, patient_id):
+def patient_search_api(request):
+    """API endpoint for patient autocomplete, returning matches in name order"""
+    mode = request.GET.get('mode', 'contains')
+    if mode not in SEARCH_MODES:
+        return JsonResponse({'error': 'Invalid search mode'}, status=400)
+    
+    try:
+        limit = int(request.GET.get('limit', PATIENT_SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid limit'}, status=400)
+    limit = max(1, min(limit, PATIENT_SEARCH_MAX_LIMIT))
+    
+    patients = search_patients(request.GET.get('q', ''), mode=mode).only('id', 'name', 'phone', 'age')
+    try:
+        page = keyset_paginate(patients, ('name', 'id'), cursor=request.GET.get('cursor'), page_size=limit)
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    
+    return JsonResponse({
+        'results': [
+            {'id': p.id, 'name': p.name, 'phone': p.phone, 'age': p.age}
+            for p in page
+        ],
+        'next_cursor': page.next_cursor,
+    })
+
+@login_required
+async def get_patient_complaints(request, patient_id):
     """API endpoint to get previous chief complaints for a patient"""
     try:
-        patient = Patient.objects.get(pk=patient_id)
+        patient = await Patient.objects.aget(pk=patient_id)
         
         # Get all non-empty chief complaints for this patient
         complaints = []
@@ -1000,7 +1086,7 @@ def get_patient_complaints(request, patient_id):
             notes__icontains='chief complaint'
         ).values_list('notes', flat=True)
         
-        for note in appointment_complaints:
+        async for note in appointment_complaints:
             if note and note.strip():
                 complaints.append(note)
         
@@ -1014,7 +1100,7 @@ def get_patient_complaints(request, patient_id):
         return JsonResponse({'error': str(e)}, status=500)
 
 @login_required
-def get_time_slots(request):
+async def get_time_slots(request):
     """API endpoint to get available time slots for a dentist on a specific date"""
     try:
         dentist_id = request.GET.get('dentist')
@@ -1027,46 +1113,19 @@ def get_time_slots(request):
         # Parse the date
         selected_date = datetime.strptime(date_str, '%Y-%m-%d').date()
         
-        # Generate time slots from 9 AM to 5 PM in 30-minute intervals
-        time_slots = []
-        start_hour = 9  # 9 AM
-        end_hour = 17   # 5 PM
-        
-        current_time = datetime.combine(date.today(), datetime.min.time()) + timedelta(hours=start_hour)
-        end_time = datetime.combine(date.today(), datetime.min.time()) + timedelta(hours=end_hour)
-        
-        while current_time < end_time:
-            time_slots.append({
-                'time': current_time.time().strftime('%H:%M'),
-                'display': current_time.strftime('%I:%M %p'),
-                'available': True,
-                'selected': current_time.time().strftime('%H:%M') == selected_time
-            })
-            current_time += timedelta(minutes=30)
-        
-        # Mark booked slots as unavailable
-        booked_appointments = Appointment.objects.filter(
-            dentist_id=dentist_id,
-            date=selected_date,
-            status='scheduled'
-        )
-        
-        # If we're editing an existing appointment, exclude it from the booked appointments
+        # Build the day's slots; if we're editing an existing appointment, its own booking is ignored
         appointment_id = request.GET.get('appointment_id')
-        if appointment_id:
-            booked_appointments = booked_appointments.exclude(pk=appointment_id)
+        slots = await aget_day_slots(dentist_id, selected_date, exclude_id=appointment_id or None)
         
-        for appointment in booked_appointments:
-            # Mark all slots that overlap with this appointment as unavailable
-            for slot in time_slots:
-                slot_time = datetime.strptime(slot['time'], '%H:%M').time()
-                slot_start = datetime.combine(selected_date, slot_time)
-                slot_end = slot_start + timedelta(minutes=30)
-                appointment_start = datetime.combine(selected_date, appointment.start_time)
-                appointment_end = datetime.combine(selected_date, appointment.end_time)
-                
-                if (slot_start < appointment_end and slot_end > appointment_start):
-                    slot['available'] = False
+        time_slots = [
+            {
+                'time': slot.start.strftime('%H:%M'),
+                'display': slot.start.strftime('%I:%M %p'),
+                'available': slot.available,
+                'selected': slot.start.strftime('%H:%M') == selected_time
+            }
+            for slot in slots
+        ]
         
         return JsonResponse({'time_slots': time_slots})
     except ValueError:
@@ -1074,6 +1133,101 @@ def get_time_slots(request):
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+CALENDAR_FEED_MAX_DAYS = 62
+
+def _calendar_feed_params(request):
+    """Parse start, end and dentist filters for the calendar feed; raises ValueError"""
+    start = datetime.strptime(request.GET['start'], '%Y-%m-%d').date()
+    end = datetime.strptime(request.GET['end'], '%Y-%m-%d').date()
+    if end < start or (end - start).days >= CALENDAR_FEED_MAX_DAYS:
+        raise ValueError('Invalid date range')
+    dentist_ids = sorted({int(d) for d in request.GET.getlist('dentist') if d})
+    return start, end, dentist_ids
+
+def _calendar_feed_etag(request):
+    try:
+        return get_feed_etag(*_calendar_feed_params(request))
+    except (KeyError, ValueError):
+        # Let the view report the bad request
+        return None
+
+@login_required
+@condition(etag_func=_calendar_feed_etag)
+def calendar_feed(request):
+    """API endpoint returning the appointments in a date range as compact tuples"""
+    try:
+        start, end, dentist_ids = _calendar_feed_params(request)
+    except KeyError:
+        return JsonResponse({'error': 'Missing required parameters'}, status=400)
+    except ValueError:
+        return JsonResponse({'error': f'Invalid date range (use YYYY-MM-DD, at most {CALENDAR_FEED_MAX_DAYS} days)'}, status=400)
+    
+    response = JsonResponse(get_feed(start, end, dentist_ids))
+    # Clients must revalidate every time, which is cheap thanks to the ETag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+AVAILABILITY_DEFAULT_LIMIT = 10
+AVAILABILITY_MAX_LIMIT = 50
+AVAILABILITY_MAX_DAYS = 31
+
+@login_required
+def availability_search(request):
+    """API endpoint returning the earliest free slots across dentists and days"""
+    try:
+        start_date = datetime.strptime(request.GET.get('start') or date.today().isoformat(), '%Y-%m-%d').date()
+        end_str = request.GET.get('end')
+        end_date = datetime.strptime(end_str, '%Y-%m-%d').date() if end_str else start_date + timedelta(days=6)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid date format'}, status=400)
+    if end_date < start_date:
+        return JsonResponse({'error': 'End date is before start date'}, status=400)
+    if (end_date - start_date).days >= AVAILABILITY_MAX_DAYS:
+        return JsonResponse({'error': f'Date range is limited to {AVAILABILITY_MAX_DAYS} days'}, status=400)
+    
+    try:
+        duration = int(request.GET.get('duration') or 0) or None
+        limit = int(request.GET.get('limit', AVAILABILITY_DEFAULT_LIMIT))
+        requested_dentists = [int(d) for d in request.GET.getlist('dentist') if d]
+    except ValueError:
+        return JsonResponse({'error': 'Invalid parameters'}, status=400)
+    if duration is not None and duration < 0:
+        return JsonResponse({'error': 'Invalid duration'}, status=400)
+    limit = max(1, min(limit, AVAILABILITY_MAX_LIMIT))
+    
+    # Get the dentists to search, all of them by default
+    dentists = User.objects.filter(profile__role='dentist')
+    if requested_dentists:
+        dentists = dentists.filter(pk__in=requested_dentists)
+    names = {
+        dentist_id: f'{first_name} {last_name}'.strip() or username
+        for dentist_id, first_name, last_name, username
+        in dentists.values_list('id', 'first_name', 'last_name', 'username')
+    }
+    
+    slots = find_free_slots(
+        start_date,
+        end_date,
+        names,
+        duration=duration,
+        limit=limit,
+        not_before=timezone.localtime().replace(tzinfo=None),
+    )
+    
+    return JsonResponse({
+        'slots': [
+            {
+                'dentist_id': slot.dentist_id,
+                'dentist_name': names[slot.dentist_id],
+                'date': slot.date.strftime('%Y-%m-%d'),
+                'start': slot.start.strftime('%H:%M'),
+                'end': slot.end.strftime('%H:%M'),
+                'display': f"{slot.date.strftime('%a %b %d')}, {slot.start.strftime('%I:%M %p')}",
+            }
+            for slot in slots
+        ]
+    })
+
 def dental_chart_view(request, patient_id, tooth=None):
     patient = get_object_or_404(Patient, id=patient_id)
     # Get the latest appointment for this patient
@@ -1109,11 +1263,11 @@ def payment_list(request, patient_id):
     # Order by payment date (newest first)
     payments = payments.order_by('-payment_date', '-created_at')
     
-    # Calculate totals (using all payments, not just filtered ones for accurate totals)
-    all_payments = Payment.objects.filter(patient=patient)
-    total_treatment_cost = all_payments.aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-    total_paid = all_payments.aggregate(Sum('amount_paid'))['amount_paid__sum'] or 0
-    balance_due = total_treatment_cost - total_paid
+    # Get the patient's billing totals (covers all payments, not just filtered ones)
+    financials = PatientFinancials.for_patient(patient)
+    total_treatment_cost = financials.total_billed
+    total_paid = financials.total_paid
+    balance_due = financials.balance_due
     
     # Pagination
     paginator = Paginator(payments, 5)  # Show 5 payments per page
@@ -1204,17 +1358,15 @@ def payment_detail(request, payment_id):
     return render(request, 'app/payment_detail.html', context)
 
 @login_required
-def get_patient_balance(request, patient_id):
+async def get_patient_balance(request, patient_id):
     """API endpoint to get a patient's balance"""
-    patient = get_object_or_404(Patient, id=patient_id)
+    patient = await aget_object_or_404(Patient, id=patient_id)
     
-    # Get payments for this patient
-    payments = Payment.objects.filter(patient=patient)
-    
-    # Calculate totals
-    total_treatment_cost = payments.aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-    total_paid = payments.aggregate(Sum('amount_paid'))['amount_paid__sum'] or 0
-    balance_due = total_treatment_cost - total_paid
+    # Get the patient's billing totals in one query
+    financials = await PatientFinancials.afor_patient(patient)
+    total_treatment_cost = financials.total_billed
+    total_paid = financials.total_paid
+    balance_due = financials.balance_due
     
     data = {
         'total_treatment_cost': float(total_treatment_cost),
@@ -1228,13 +1380,8 @@ def payment_balance(request, patient_id):
     """View to create a payment for the outstanding balance"""
     patient = get_object_or_404(Patient, id=patient_id)
     
-    # Get payments for this patient
-    payments = Payment.objects.filter(patient=patient)
-    
-    # Calculate the outstanding balance
-    total_amount_billed = payments.aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-    total_paid = payments.aggregate(Sum('amount_paid'))['amount_paid__sum'] or 0
-    balance_due = total_amount_billed - total_paid
+    # Get the outstanding balance
+    balance_due = PatientFinancials.for_patient(patient).balance_due
     
     if request.method == 'POST':
         # Create a copy of the POST data so we can modify it
@@ -0,0 +1,71 @@
+"""
+Compare slot generation in app.availability with the previous approach,
+which checked every slot against every appointment.
+
+Runs in memory (no database needed beyond Django setup):
+
+    python benchmarks/availability_benchmark.py
+"""
+import os
+import random
+import sys
+import timeit
+from datetime import date, datetime, time, timedelta
+
+# Set up Django environment
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+import django
+django.setup()
+
+from app.availability import build_slots, interval_minutes
+
+
+def nested_loop_slots(appointments, day, slot_minutes):
+    """The per-slot, per-appointment loop the views used before."""
+    time_slots = []
+    current_time = datetime.combine(day, time(0, 0))
+    end_time = datetime.combine(day, time(23, 59))
+    while current_time < end_time:
+        time_slots.append({'time': current_time.time(), 'available': True})
+        current_time += timedelta(minutes=slot_minutes)
+
+    for start, end in appointments:
+        for slot in time_slots:
+            slot_start = datetime.combine(day, slot['time'])
+            slot_end = slot_start + timedelta(minutes=slot_minutes)
+            if slot_start < datetime.combine(day, end) and slot_end > datetime.combine(day, start):
+                slot['available'] = False
+    return time_slots
+
+
+def random_appointments(count, rng):
+    appointments = []
+    for _ in range(count):
+        start = rng.randrange(0, 23 * 60, 5)
+        length = rng.choice((15, 30, 45, 60))
+        appointments.append((time(start // 60, start % 60), time((start + length) // 60, (start + length) % 60)))
+    return appointments
+
+
+def main():
+    rng = random.Random(42)
+    day = date(2030, 1, 1)
+    slot_minutes = 5
+    print(f"{'appointments':>12} {'nested loop (ms)':>18} {'sweep (ms)':>12} {'speedup':>8}")
+    for count in (10, 50, 100, 500, 1000):
+        appointments = random_appointments(count, rng)
+        runs = 5
+        old = timeit.timeit(lambda: nested_loop_slots(appointments, day, slot_minutes), number=runs) / runs
+        new = timeit.timeit(
+            lambda: build_slots(
+                [interval_minutes(start, end) for start, end in appointments],
+                day_start=time(0, 0), day_end=time(23, 59), slot_minutes=slot_minutes,
+            ),
+            number=runs,
+        ) / runs
+        print(f"{count:>12} {old * 1000:>18.2f} {new * 1000:>12.2f} {old / new:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Measure database connection churn under concurrent requests.
+
+Each simulated request goes through the same connection handling as a real
+one (request_started / request_finished, which close obsolete or unusable
+connections) and runs one small query. The run reports how many database
+connections were opened and, on PostgreSQL, how many distinct server
+backends served the requests, alongside the request latency.
+
+Run it against the database configured by DATABASE_URL with the pooling
+settings to compare, e.g.:
+
+    DB_POOL=off DB_CONN_MAX_AGE=0   python benchmarks/connection_churn.py
+    DB_POOL=off DB_CONN_MAX_AGE=600 python benchmarks/connection_churn.py
+    DB_POOL=on                      python benchmarks/connection_churn.py --threads 32
+
+With DB_CONN_MAX_AGE=0 every request opens a connection; persistent
+connections open one per thread; the pool opens at most DB_POOL_MAX_SIZE
+however many threads there are.
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Set up Django environment
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+import django
+django.setup()
+
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+_lock = threading.Lock()
+_opened = 0
+
+
+def count_connection(sender, **kwargs):
+    global _opened
+    with _lock:
+        _opened += 1
+
+
+def simulated_request():
+    """Run one request's worth of connection handling; return (seconds, backend pid)."""
+    started = time.perf_counter()
+    request_started.send(sender=None)
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_backend_pid()')
+                backend = cursor.fetchone()[0]
+            else:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+                backend = None
+    finally:
+        request_finished.send(sender=None)
+    return time.perf_counter() - started, backend
+
+
+def run(threads, requests):
+    global _opened
+    _opened = 0
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        started = time.perf_counter()
+        results = list(executor.map(lambda _: simulated_request(), range(requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(seconds * 1000 for seconds, _ in results)
+    backends = {backend for _, backend in results if backend is not None}
+    return {
+        'threads': threads,
+        'requests': requests,
+        'opened': _opened,
+        'backends': len(backends) if backends else None,
+        'rps': requests / elapsed,
+        'p50': statistics.median(latencies),
+        'p95': latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    settings_dict = connection.settings_dict
+    pool = settings_dict.get('OPTIONS', {}).get('pool')
+    print(
+        f"vendor={connection.vendor} CONN_MAX_AGE={settings_dict['CONN_MAX_AGE']} "
+        f"CONN_HEALTH_CHECKS={settings_dict['CONN_HEALTH_CHECKS']} pool={pool or 'off'}"
+    )
+
+    connection_created.connect(count_connection)
+    print(f"{'threads':>7} {'requests':>8} {'opened':>7} {'backends':>8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for threads in args.threads:
+        result = run(threads, args.requests)
+        backends = result['backends'] if result['backends'] is not None else '-'
+        print(
+            f"{result['threads']:>7} {result['requests']:>8} {result['opened']:>7} {backends:>8} "
+            f"{result['rps']:>9.0f} {result['p50']:>8.2f} {result['p95']:>8.2f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
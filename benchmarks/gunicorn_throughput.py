@@ -0,0 +1,65 @@
+"""
+Compare page throughput of gunicorn's defaults with gunicorn.conf.py.
+
+Recipe (same code and database for both servers):
+
+    # 1. Baseline: gunicorn's defaults, one sync worker
+    gunicorn core.wsgi:application --bind 127.0.0.1:8001
+
+    # 2. Tuned: workers and threads from gunicorn.conf.py, which needs a
+    #    cache shared by the workers
+    CACHE_BACKEND=file GUNICORN_BIND=127.0.0.1:8002 gunicorn --config gunicorn.conf.py core.wsgi:application
+
+    # 3. Load both with the same clients
+    python benchmarks/gunicorn_throughput.py --baseline http://127.0.0.1:8001 \\
+        --tuned http://127.0.0.1:8002 --username dentist --password dentist123 --patient 1
+
+The patient list, patient detail, appointment list and calendar pages are
+each hit with --concurrency clients for --requests requests per server, and
+the tuned/baseline ratio of requests per second is printed. The tuned
+server logs its per-worker timings when it is stopped.
+"""
+import argparse
+
+from wsgi_vs_asgi import load, login
+
+
+def pages(patient_id):
+    return {
+        'patient_list': '/app/patients/',
+        'patient_detail': f'/app/patients/{patient_id}/',
+        'appointment_list': '/app/appointments/',
+        'appointment_calendar': '/app/appointments/calendar/',
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--baseline', required=True, help='base URL of the server with default settings')
+    parser.add_argument('--tuned', required=True, help='base URL of the server using gunicorn.conf.py')
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--patient', type=int, required=True, help='patient id for the detail page')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    servers = {'baseline': args.baseline, 'tuned': args.tuned}
+    cookies = {name: login(url, args.username, args.password) for name, url in servers.items()}
+
+    print(f"concurrency={args.concurrency} requests={args.requests}")
+    print(f"{'page':<22} {'server':<9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'gain':>6}")
+    for name, path in pages(args.patient).items():
+        results = {}
+        for server, url in servers.items():
+            results[server] = load(url, path, cookies[server], args.concurrency, args.requests)
+        for server, result in results.items():
+            gain = f"{result['rps'] / results['baseline']['rps']:.2f}x" if server == 'tuned' else ''
+            print(
+                f"{name:<22} {server:<9} {result['rps']:>8.0f} {result['p50']:>8.2f} "
+                f"{result['p99']:>8.2f} {result['errors']:>7} {gain:>6}"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Compare requests per second and latency of the JSON endpoints under WSGI
+and ASGI.
+
+Start the same code twice against the same database, one server per mode:
+
+    gunicorn core.wsgi:application --bind 127.0.0.1:8001 --workers 2
+    gunicorn core.asgi:application --bind 127.0.0.1:8002 --workers 2 \\
+        --worker-class uvicorn.workers.UvicornWorker
+
+then run:
+
+    python benchmarks/wsgi_vs_asgi.py --wsgi http://127.0.0.1:8001 \\
+        --asgi http://127.0.0.1:8002 --username dentist --password dentist123 \\
+        --patient 1 --dentist 2
+
+Each endpoint is hit with --concurrency parallel clients for --requests
+requests per server. Only the standard library is used, and no Django setup
+is needed on the client side.
+"""
+import argparse
+import http.client
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlparse
+
+
+def _connection(base_url):
+    url = urlparse(base_url)
+    connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+    return connection_class(url.hostname, url.port, timeout=30)
+
+
+def _cookies(response, cookies):
+    for header in response.headers.get_all('Set-Cookie') or []:
+        for name, morsel in SimpleCookie(header).items():
+            cookies[name] = morsel.value
+
+
+def login(base_url, username, password):
+    """Log in through the login form and return the Cookie header to send."""
+    cookies = {}
+    connection = _connection(base_url)
+    connection.request('GET', '/app/login/')
+    response = connection.getresponse()
+    response.read()
+    _cookies(response, cookies)
+
+    body = urlencode({
+        'username': username,
+        'password': password,
+        'csrfmiddlewaretoken': cookies.get('csrftoken', ''),
+    })
+    connection.request('POST', '/app/login/', body=body, headers={
+        'Content-Type': 'application/x-www-form-urlencoded',
+        'Cookie': '; '.join(f'{name}={value}' for name, value in cookies.items()),
+        'Referer': base_url.rstrip('/') + '/app/login/',
+    })
+    response = connection.getresponse()
+    response.read()
+    _cookies(response, cookies)
+    connection.close()
+    if 'sessionid' not in cookies:
+        sys.exit(f'Login to {base_url} failed; check --username and --password')
+    return '; '.join(f'{name}={value}' for name, value in cookies.items())
+
+
+def endpoints(args):
+    day = (date.today() + timedelta(days=1)).isoformat()
+    return {
+        'health_check': '/app/health/',
+        'get_time_slots': f'/app/api/time-slots/?dentist={args.dentist}&date={day}',
+        'get_patient_balance': f'/app/api/patients/{args.patient}/balance/',
+        'get_patient_complaints': f'/app/api/patient/{args.patient}/complaints/',
+        'get_tooth_treatments': f'/app/treatments/tooth/?teeth=11,12,21,36&patient_id={args.patient}',
+    }
+
+
+def load(base_url, path, cookie, concurrency, requests):
+    """Issue requests GETs from concurrency keep-alive clients; return stats."""
+    local = threading.local()
+    errors = []
+
+    def fetch(_):
+        if not hasattr(local, 'connection'):
+            local.connection = _connection(base_url)
+        started = time.perf_counter()
+        try:
+            local.connection.request('GET', path, headers={'Cookie': cookie})
+            response = local.connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            local.connection.close()
+            del local.connection
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        # Warm up each server worker and client connection first
+        list(executor.map(fetch, range(concurrency)))
+        errors.clear()
+        started = time.perf_counter()
+        latencies = sorted(seconds * 1000 for seconds in executor.map(fetch, range(requests)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        'rps': requests / elapsed,
+        'p50': statistics.median(latencies),
+        'p99': latencies[max(int(len(latencies) * 0.99) - 1, 0)],
+        'errors': len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--wsgi', required=True, help='base URL of the WSGI server')
+    parser.add_argument('--asgi', required=True, help='base URL of the ASGI server')
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--patient', type=int, required=True, help='patient id to query')
+    parser.add_argument('--dentist', type=int, required=True, help='dentist user id to query')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    servers = {'wsgi': args.wsgi, 'asgi': args.asgi}
+    cookies = {mode: login(url, args.username, args.password) for mode, url in servers.items()}
+
+    print(f"concurrency={args.concurrency} requests={args.requests}")
+    print(f"{'endpoint':<24} {'mode':<5} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for name, path in endpoints(args).items():
+        for mode, url in servers.items():
+            result = load(url, path, cookies[mode], args.concurrency, args.requests)
+            print(
+                f"{name:<24} {mode:<5} {result['rps']:>9.0f} {result['p50']:>8.2f} "
+                f"{result['p99']:>8.2f} {result['errors']:>7}"
+            )
+
+
+if __name__ == '__main__':
+    main()
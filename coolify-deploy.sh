@@ -3,17 +3,10 @@
 # This script is used for deploying to Coolify
 # It ensures that static files are properly collected and served
 
-# Apply database migrations
-echo "Applying database migrations..."
-python manage.py migrate
-
-# Collect static files
-echo "Collecting static files..."
-python manage.py collectstatic --noinput --clear
-
-# Initialize database with basic data
-echo "Initializing database with basic data..."
-python init_db.py
+# Apply migrations, collect static files and seed initial data; each step
+# is skipped when it is already applied
+echo "Running release steps..."
+python manage.py release || exit 1
 
 # Start the application with Gunicorn
 echo "Starting the application..."
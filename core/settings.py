@@ -10,9 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+from datetime import time
+from importlib.util import find_spec
 from pathlib import Path
 import os
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -49,6 +52,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'app.middleware.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -61,7 +65,8 @@ ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # The Django backend, timing renders for the request metrics
+        'BACKEND': 'app.metrics.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -84,10 +89,76 @@ WSGI_APPLICATION = 'core.wsgi.application'
 DATABASES = {
     'default': dj_database_url.config(
         default='sqlite:///' + str(BASE_DIR / 'db.sqlite3'),
-        conn_max_age=600
+        conn_max_age=int(os.environ.get('DB_CONN_MAX_AGE', '600')),
+        # Test persistent connections before reusing them, so a connection
+        # broken by a database restart or failover is replaced instead of
+        # failing the next request
+        conn_health_checks=True,
     )
 }
 
+# Connection pooling (PostgreSQL only)
+# DB_POOL selects how PostgreSQL connections are shared:
+#   auto - use psycopg 3's pool when psycopg and psycopg_pool are installed,
+#          otherwise persistent per-thread connections (default)
+#   on   - require the pool
+#   off  - persistent per-thread connections (DB_CONN_MAX_AGE seconds)
+# Each gunicorn worker process has its own pool of DB_POOL_MIN_SIZE to
+# DB_POOL_MAX_SIZE connections; a request waits up to DB_POOL_TIMEOUT
+# seconds for a free one.
+DB_POOL = os.environ.get('DB_POOL', 'auto')
+if DB_POOL not in ('auto', 'on', 'off'):
+    raise ImproperlyConfigured(f"DB_POOL must be one of auto, on, off, not {DB_POOL!r}")
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql' and DB_POOL != 'off':
+    if find_spec('psycopg') and find_spec('psycopg_pool'):
+        DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+        }
+        # Pooled connections are returned to the pool after each request
+        # instead of being kept open by Django
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+    elif DB_POOL == 'on':
+        raise ImproperlyConfigured('DB_POOL=on needs psycopg 3 with psycopg_pool (pip install "psycopg[binary,pool]")')
+
+
+# Cache
+# CACHE_BACKEND selects where cached data lives; none of them needs an
+# external service:
+#   locmem - per-process memory (default with DEBUG); each gunicorn worker
+#            has its own, so a version bump in one worker never reaches the
+#            others. Only suitable for a single process.
+#   file   - files under CACHE_LOCATION, shared by all workers on the host
+#   db     - the database table CACHE_LOCATION, shared by every instance
+#            (default without DEBUG; `manage.py release` creates the table)
+# gunicorn.conf.py refuses to start several workers on locmem.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem' if DEBUG else 'db')
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'dentchartzz'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / '.cache')),
+    'db': ('django.core.cache.backends.db.DatabaseCache', 'django_cache'),
+}
+if CACHE_BACKEND not in CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        f"CACHE_BACKEND must be one of {', '.join(CACHE_BACKENDS)}, not {CACHE_BACKEND!r}"
+    )
+# Whether every worker sees the same cache, so version bumps reach them all
+CACHE_SHARED = CACHE_BACKEND != 'locmem'
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.environ.get('CACHE_LOCATION', CACHE_BACKENDS[CACHE_BACKEND][1]),
+        'TIMEOUT': int(os.environ.get('CACHE_TIMEOUT', '300')),
+        'KEY_PREFIX': os.environ.get('CACHE_KEY_PREFIX', 'dentchartzz'),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', '10000')),
+        },
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -145,5 +216,46 @@ LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'login'
 
-# For efficient static file serving
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# For efficient static file serving. STATICFILES_STORAGE is no longer read
+# by Django 5.1, so the storage is set through STORAGES
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+}
+
+# Appointment scheduling
+CLINIC_DAY_START = time(9, 0)
+CLINIC_DAY_END = time(17, 0)
+APPOINTMENT_SLOT_MINUTES = int(os.environ.get('APPOINTMENT_SLOT_MINUTES', '30'))
+# Seconds to cache each dentist-day's bookings for the availability search
+AVAILABILITY_CACHE_TIMEOUT = 600
+
+# Dashboard
+DASHBOARD_COUNT_TIMEOUT = 60
+DASHBOARD_ESTIMATE_THRESHOLD = 100000
+DASHBOARD_UPCOMING_DAYS = 7
+DASHBOARD_WIDGET_LIMIT = 10
+# Seconds to keep a dentist's widgets; saving one of their appointments drops them
+DASHBOARD_WIDGET_TIMEOUT = 300
+
+# Seconds a worker serves its reference data snapshot (app.reference) before
+# checking the shared version again; a change made in the worker itself is
+# seen at once
+REFERENCE_VERSION_CHECK_SECONDS = 5
+
+# Seconds to keep the rendered patient_detail sections; they are also
+# dropped whenever one of the patient's records changes. The sections are
+# only cached when CACHE_SHARED is true.
+PATIENT_FRAGMENT_TIMEOUT = 600
+
+# Request metrics (app.middleware.RequestMetricsMiddleware), exported per
+# worker process at /metrics/ in the Prometheus text format. Scrapers send
+# "Authorization: Bearer $METRICS_TOKEN"; without a token only admins can
+# read them. Requests at least METRICS_SLOW_REQUEST_MS long or running at
+# least METRICS_SLOW_REQUEST_QUERIES queries are logged with their
+# METRICS_TOP_SQL most expensive statements
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True') == 'True'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_SLOW_REQUEST_MS = int(os.environ.get('METRICS_SLOW_REQUEST_MS', '500'))
+METRICS_SLOW_REQUEST_QUERIES = int(os.environ.get('METRICS_SLOW_REQUEST_QUERIES', '50'))
+METRICS_TOP_SQL = 5
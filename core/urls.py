@@ -19,6 +19,7 @@ from django.urls import path, include
 from django.shortcuts import redirect
 from django.conf import settings
 from django.conf.urls.static import static
+from app.health import metrics
 
 def redirect_to_dashboard(request):
     return redirect('dashboard')
@@ -27,6 +28,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('', redirect_to_dashboard, name='home'),
     path('app/', include('app.urls')),
+    path('metrics/', metrics, name='metrics'),
 ]
 
 # Serve static files in development
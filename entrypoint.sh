@@ -7,18 +7,27 @@ while ! nc -z db 5432; do
 done
 echo "PostgreSQL is up and running!"
 
-# Apply database migrations
-echo "Applying database migrations..."
-python manage.py migrate
+# `entrypoint.sh release` runs the one-shot release job: migrations,
+# static files and initial data, each skipped when already applied
+if [ "$1" = "release" ]; then
+  exec python manage.py release
+fi
 
-# Collect static files
-echo "Collecting static files..."
-python manage.py collectstatic --noinput --clear
-
-# Initialize database with basic data
-echo "Initializing database with basic data..."
-python init_db.py
+# Single-container deployments release on boot; with a separate release
+# job (see docker-compose.prod.yml) set RELEASE_ON_BOOT=0
+if [ "${RELEASE_ON_BOOT:-1}" != "0" ]; then
+  echo "Running release steps..."
+  python manage.py release || exit 1
+fi
 
 # Start the application
-echo "Starting the application..."
-gunicorn core.wsgi:application --bind 0.0.0.0:8000 
\ No newline at end of file
+# Workers, threads, recycling and preloading come from gunicorn.conf.py.
+# SERVER_MODE=asgi serves core.asgi with uvicorn workers, so the async JSON
+# endpoints do not hold a worker while they wait on the database
+if [ "$SERVER_MODE" = "asgi" ]; then
+  echo "Starting the application (ASGI)..."
+  gunicorn --config gunicorn.conf.py core.asgi:application
+else
+  echo "Starting the application (WSGI)..."
+  gunicorn --config gunicorn.conf.py core.wsgi:application
+fi
@@ -0,0 +1,131 @@
+"""
+Gunicorn configuration for production.
+
+Every setting can be overridden from the environment:
+
+    GUNICORN_BIND          address to listen on (default 0.0.0.0:8000)
+    GUNICORN_WORKERS       worker processes (default 2 * CPUs + 1, at most
+                           GUNICORN_MAX_WORKERS, default 12); WEB_CONCURRENCY
+                           is honoured too
+    GUNICORN_THREADS       threads per WSGI worker (default 4); more than one
+                           selects the gthread worker
+    GUNICORN_MAX_REQUESTS  requests before a worker is recycled (default
+                           1000, 0 disables), spread by
+                           GUNICORN_MAX_REQUESTS_JITTER (default 10%)
+    GUNICORN_PRELOAD       load Django once in the master so workers share it
+                           copy-on-write (default true)
+    GUNICORN_TIMEOUT       seconds before a silent worker is restarted
+    GUNICORN_SLOW_REQUEST_MS  requests slower than this are logged (default 1000)
+
+SERVER_MODE=asgi switches to uvicorn workers (see entrypoint.sh); those run
+one event loop per worker, so GUNICORN_THREADS does not apply and the
+request timing hooks below, which gunicorn only calls for its own workers,
+are skipped.
+
+With DB_POOL enabled every worker has its own pool, so DB_POOL_MAX_SIZE
+should be at least GUNICORN_THREADS.
+
+The cache versions that invalidate cached pages, slots and reference data
+only work across workers with a shared CACHE_BACKEND, so starting more than
+one worker on locmem is refused.
+"""
+import multiprocessing
+import os
+import threading
+import time
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+workers = _env_int(
+    'GUNICORN_WORKERS',
+    os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, _env_int('GUNICORN_MAX_WORKERS', 12)))
+)
+
+if os.environ.get('SERVER_MODE') == 'asgi':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    threads = 1
+else:
+    threads = _env_int('GUNICORN_THREADS', 4)
+    worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Recycle workers to bound memory growth; the jitter keeps them from all
+# restarting at the same moment
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10)
+
+preload_app = _env_bool('GUNICORN_PRELOAD', True)
+
+timeout = _env_int('GUNICORN_TIMEOUT', 60)
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', None)
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+SLOW_REQUEST_MS = _env_int('GUNICORN_SLOW_REQUEST_MS', 1000)
+
+# Per-worker request timings, reported when the worker exits
+_timings = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'slow': 0}
+_timings_lock = threading.Lock()
+
+
+def on_starting(server):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    from django.conf import settings
+    if server.cfg.workers > 1 and not settings.CACHE_SHARED:
+        raise RuntimeError(
+            f'CACHE_BACKEND={settings.CACHE_BACKEND} gives each of the {server.cfg.workers} workers its own '
+            'cache, so invalidations would not reach the others; use CACHE_BACKEND=db or file, '
+            'or GUNICORN_WORKERS=1'
+        )
+
+
+def pre_fork(server, worker):
+    # A connection opened while preloading must not be inherited and shared
+    # by the workers; each worker opens its own
+    if not server.cfg.preload_app:
+        return
+    from django.db import connections
+    connections.close_all()
+
+
+def post_fork(server, worker):
+    _timings.update(count=0, total_ms=0.0, max_ms=0.0, slow=0)
+
+
+def pre_request(worker, req):
+    req.started_at = time.perf_counter()
+
+
+def post_request(worker, req, environ, resp):
+    started_at = getattr(req, 'started_at', None)
+    if started_at is None:
+        return
+    elapsed_ms = (time.perf_counter() - started_at) * 1000
+    with _timings_lock:
+        _timings['count'] += 1
+        _timings['total_ms'] += elapsed_ms
+        _timings['max_ms'] = max(_timings['max_ms'], elapsed_ms)
+        if elapsed_ms >= SLOW_REQUEST_MS:
+            _timings['slow'] += 1
+    if elapsed_ms >= SLOW_REQUEST_MS:
+        worker.log.warning('slow request: %s %s %.0f ms (worker %s)', req.method, req.path, elapsed_ms, worker.pid)
+
+
+def worker_exit(server, worker):
+    count = _timings['count']
+    if count:
+        server.log.info(
+            'worker %s served %d requests: mean %.1f ms, max %.1f ms, %d slow',
+            worker.pid, count, _timings['total_ms'] / count, _timings['max_ms'], _timings['slow']
+        )